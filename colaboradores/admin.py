@@ -10,6 +10,7 @@ class ColaboradorAdmin(UserAdmin):
     """
     readonly_fields = ('username',)
     list_display = ('username', 'role_obj', 'phone')
+    list_select_related = ('role_obj',)
     fieldsets = (
         (None, {'fields': ('username', 'password')}),
         ('Información editable', {
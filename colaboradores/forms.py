@@ -21,4 +21,8 @@ class ColaboradorUpdateForm(forms.ModelForm):
         # Marcar con "*" los campos obligatorios
         for name, field in self.fields.items():
             if field.required:
-                field.label = f"{field.label} *"
\ No newline at end of file
+                field.label = f"{field.label} *"
+        # La etiqueta de cada permiso incluye su content type: se leen en la misma consulta
+        self.fields['user_permissions'].queryset = (
+            self.fields['user_permissions'].queryset.select_related('content_type')
+        )
@@ -1,3 +1,28 @@
 from django.test import TestCase
+from django.urls import reverse
 
-# Create your tests here.
+from inventario.consultas import PresupuestoConsultasMixin
+from usuarios.tests import create_users
+
+from .models import Colaborador
+
+
+class QueryBudgetTests(PresupuestoConsultasMixin, TestCase):
+    """The collaborator list shows each role without one query per row."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = create_users()
+        cls.colaborador = Colaborador.objects.get(username='user1')
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+
+    def test_list(self):
+        self.get_con_presupuesto(reverse('colaboradores:list'), 4)
+
+    def test_edit(self):
+        self.get_con_presupuesto(reverse('colaboradores:editar', args=[self.colaborador.pk]), 6)
+
+    def test_admin(self):
+        self.get_con_presupuesto(reverse('admin:colaboradores_colaborador_changelist'), 8)
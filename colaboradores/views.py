@@ -3,14 +3,17 @@ from django.urls import reverse_lazy
 from django.contrib import messages
 from django.contrib.auth import get_user_model
 
+from usuarios.directory import DirectoryListMixin
+
 from .forms import ColaboradorUpdateForm
 
 CustomUser = get_user_model()
 
-class ColaboradorListView(ListView):
+class ColaboradorListView(DirectoryListMixin, ListView):
     model = CustomUser
     template_name = 'colaboradores/list.html'
     context_object_name = 'colaboradores'
+    list_fields = ('id', 'username', 'first_name', 'paternal_last_name', 'phone')
 
 class ColaboradorUpdateView(UpdateView):
     model = CustomUser
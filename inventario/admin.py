@@ -1,12 +1,57 @@
 # C:\Users\acant\Documents\XPYME\inventario\admin.py
 
-from django.contrib import admin
-from .models import Producto, ImagenProducto, MovimientoStock, Proveedor
+from django.contrib import admin, messages
+from django.core.exceptions import ValidationError
+from django.shortcuts import redirect
+from django.template.response import TemplateResponse
+from django.urls import path
+from django.utils import timezone
+
+from .forms import ImportarProductosForm
+from .importar import ErrorImportacion, ImportadorProductos, leer_filas
+from .reservas import liberar
+from .ubicaciones import cambiar_principal
+from .models import (
+    AlertaStock, CodigoProducto, ComponenteKit, ExistenciaUbicacion, Producto, ImagenProducto, MovimientoStock,
+    Proveedor, Reserva, TrabajoMedia, Ubicacion,
+)
 
 class ImagenProductoInline(admin.TabularInline):
     model = ImagenProducto
     extra = 0
 
+    def get_queryset(self, request):
+        # el __str__ de cada imagen (fila "original" del inline) usa el producto
+        return super().get_queryset(request).select_related('producto')
+
+class CodigoProductoInline(admin.TabularInline):
+    # códigos alternos del producto; el de ``codigo_identificador`` se mantiene al guardar
+    model = CodigoProducto
+    extra = 0
+    fields = ('codigo', 'formato', 'clave', 'creado_en')
+    readonly_fields = ('formato', 'clave', 'creado_en')
+
+class ComponenteKitInline(admin.TabularInline):
+    # lista de materiales (solo productos de tipo Kit)
+    model = ComponenteKit
+    fk_name = 'kit'
+    extra = 0
+    autocomplete_fields = ('componente',)
+
+class ExistenciaUbicacionInline(admin.TabularInline):
+    model = ExistenciaUbicacion
+    extra = 0
+    fields = ('ubicacion', 'cantidad', 'actualizado_en')
+    readonly_fields = fields
+    can_delete = False
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('ubicacion')
+
+    def has_add_permission(self, request, obj=None):
+        # las existencias cambian solo con movimientos y transferencias
+        return False
+
 @admin.register(Producto)
 class ProductoAdmin(admin.ModelAdmin):
     list_display = (
@@ -28,15 +73,59 @@ class ProductoAdmin(admin.ModelAdmin):
         'tipo_producto',
         'visibilidad_online',
     )
-    inlines = [ImagenProductoInline]
+    inlines = [ImagenProductoInline, CodigoProductoInline, ComponenteKitInline, ExistenciaUbicacionInline]
+    # el stock cambia solo con movimientos (ajuste de stock), nunca editando el producto
     readonly_fields = (
         'internal_id',
+        'stock_actual',
+        'stock_reservado',
         'fecha_alta',
         'created_at',
         'updated_at',
         'created_by',
         'updated_by',
     )
+    change_list_template = 'admin/inventario/producto/change_list.html'
+
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        if change and 'ubicacion_principal' in form.changed_data:
+            # el stock sigue a la ubicación principal (misma transacción que el cambio)
+            cambiar_principal(obj, form.initial.get('ubicacion_principal'), request.user)
+
+    def get_urls(self):
+        urls = [
+            path('importar/', self.admin_site.admin_view(self.importar_view), name='inventario_producto_importar'),
+        ]
+        return urls + super().get_urls()
+
+    def importar_view(self, request):
+        if not self.has_add_permission(request):
+            return redirect('admin:inventario_producto_changelist')
+        resultado = None
+        form = ImportarProductosForm(request.POST or None, request.FILES or None)
+        if request.method == 'POST' and form.is_valid():
+            archivo = form.cleaned_data['archivo']
+            importador = ImportadorProductos(
+                usuario=request.user,
+                simulacion=form.cleaned_data['simulacion'],
+                crear_proveedores=form.cleaned_data['crear_proveedores'],
+            )
+            try:
+                resultado = importador.importar(leer_filas(archivo, archivo.name))
+            except ErrorImportacion as exc:
+                form.add_error('archivo', str(exc))
+            else:
+                nivel = messages.WARNING if resultado.errores else messages.SUCCESS
+                self.message_user(request, resultado.resumen(), nivel)
+        context = {
+            **self.admin_site.each_context(request),
+            'opts': self.model._meta,
+            'title': 'Importar productos',
+            'form': form,
+            'resultado': resultado,
+        }
+        return TemplateResponse(request, 'admin/inventario/producto/importar.html', context)
 
 @admin.register(Proveedor)
 class ProveedorAdmin(admin.ModelAdmin):
@@ -54,6 +143,8 @@ class MovimientoStockAdmin(admin.ModelAdmin):
         'tipo',
         'cantidad',
         'usuario',
+        'ubicacion_origen',
+        'ubicacion_destino',
         'ip',
         'creado_en',
     )
@@ -62,4 +153,112 @@ class MovimientoStockAdmin(admin.ModelAdmin):
         'producto__sku',
         'usuario__username',
     )
-    list_filter = ('tipo',)
\ No newline at end of file
+    list_filter = ('tipo',)
+    # producto y usuario (su __str__ incluye role_obj) en cada fila
+    list_select_related = ('producto', 'usuario', 'usuario__role_obj', 'ubicacion_origen', 'ubicacion_destino')
+
+@admin.register(Ubicacion)
+class UbicacionAdmin(admin.ModelAdmin):
+    list_display = (
+        'codigo',
+        'nombre',
+        'sucursal',
+        'activa',
+    )
+    search_fields = ('codigo', 'nombre')
+    list_filter = ('activa', 'sucursal')
+
+@admin.register(ExistenciaUbicacion)
+class ExistenciaUbicacionAdmin(admin.ModelAdmin):
+    list_display = (
+        'producto',
+        'ubicacion',
+        'cantidad',
+        'actualizado_en',
+    )
+    list_select_related = ('producto', 'ubicacion')
+    search_fields = ('producto__sku', 'producto__nombre', 'ubicacion__codigo')
+    readonly_fields = ('producto', 'ubicacion', 'cantidad', 'actualizado_en')
+
+    def has_add_permission(self, request):
+        return False
+
+@admin.register(Reserva)
+class ReservaAdmin(admin.ModelAdmin):
+    list_display = (
+        'producto',
+        'cantidad',
+        'estado',
+        'referencia',
+        'vence_en',
+        'cerrada_en',
+    )
+    list_filter = ('estado',)
+    list_select_related = ('producto',)
+    search_fields = ('referencia', 'producto__sku', 'producto__nombre')
+    readonly_fields = (
+        'producto', 'cantidad', 'estado', 'referencia', 'usuario', 'creada_en', 'vence_en', 'cerrada_en', 'movimiento',
+    )
+    actions = ['liberar_reservas']
+
+    def has_add_permission(self, request):
+        # se crean con inventario.reservas.reservar (mantiene Producto.stock_reservado)
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+    @admin.action(description='Liberar reservas activas seleccionadas')
+    def liberar_reservas(self, request, queryset):
+        liberadas = 0
+        for reserva in queryset.filter(estado=Reserva.EstadoReserva.ACTIVA):
+            try:
+                liberar(reserva)
+            except ValidationError:
+                continue  # se convirtió o venció mientras tanto
+            liberadas += 1
+        self.message_user(request, f'{liberadas} reserva(s) liberada(s).', messages.SUCCESS)
+
+@admin.register(AlertaStock)
+class AlertaStockAdmin(admin.ModelAdmin):
+    list_display = (
+        'producto',
+        'desde',
+        'notificada_en',
+    )
+    list_select_related = ('producto',)
+    search_fields = ('producto__nombre', 'producto__sku')
+    readonly_fields = ('producto', 'desde', 'notificada_en')
+
+    def has_add_permission(self, request):
+        return False
+
+@admin.register(TrabajoMedia)
+class TrabajoMediaAdmin(admin.ModelAdmin):
+    list_display = (
+        'modelo',
+        'objeto_id',
+        'campo',
+        'estado',
+        'intentos',
+        'disponible_en',
+        'actualizado_en',
+    )
+    list_filter = ('estado', 'modelo')
+    search_fields = ('objeto_id', 'nombre')
+    exclude = ('contenido',)
+    readonly_fields = (
+        'modelo', 'objeto_id', 'campo', 'nombre', 'estado', 'intentos',
+        'error', 'disponible_en', 'tomado_en', 'creado_en', 'actualizado_en',
+    )
+    actions = ['reintentar']
+
+    def has_add_permission(self, request):
+        return False
+
+    @admin.action(description='Reintentar trabajos fallidos')
+    def reintentar(self, request, queryset):
+        n = queryset.filter(estado=TrabajoMedia.Estado.FALLIDO).update(
+            estado=TrabajoMedia.Estado.PENDIENTE, intentos=0, disponible_en=timezone.now(),
+        )
+        self.message_user(request, f'{n} trabajo(s) de nuevo en cola.')
@@ -1,7 +1,13 @@
 # C:\Users\acant\Documents\XPYME\inventario\apps.py
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
 
 class InventarioConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'inventario'
-    verbose_name = 'Inventario'
\ No newline at end of file
+    verbose_name = 'Inventario'
+
+    def ready(self):
+        from . import signals  # noqa: F401
+        from .busqueda import asegurar_indice
+        post_migrate.connect(asegurar_indice, sender=self, dispatch_uid='inventario_busqueda_indice')
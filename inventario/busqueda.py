@@ -0,0 +1,278 @@
+"""
+Motor de búsqueda de productos.
+
+- PostgreSQL: columna ``search_vector`` (tsvector generada por la BD) con índice GIN
+  y índices de trigramas para coincidencias parciales de nombre y códigos.
+- SQLite: tabla sombra FTS5 (``inventario_producto_fts``) mantenida por triggers,
+  pensada para desarrollo y pruebas locales.
+- Cualquier otro motor (o SQLite sin FTS5) cae al filtro ``icontains`` original.
+
+En todos los casos los aciertos exactos de SKU / SKU proveedor / código van primero
+y el resto se ordena por relevancia. El código exacto se busca por su clave normalizada en
+``CodigoProducto`` (cualquier alias del producto, en cualquiera de sus formas).
+"""
+import re
+
+from django.db import connections
+from django.db.models import BooleanField, Case, FloatField, IntegerField, Q, Value, When
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import Cast, Coalesce
+
+from .codigos import normalizar
+from .models import CodigoProducto, Producto
+
+FTS_TABLA = 'inventario_producto_fts'
+CAMPOS_INDEXADOS = ['nombre', 'sku', 'sku_proveedor', 'codigo_identificador', 'palabras_clave']
+
+# pesos bm25 en el mismo orden que CAMPOS_INDEXADOS
+PESOS_FTS = (5.0, 10.0, 10.0, 10.0, 2.0)
+
+_TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+# alias de BD -> bool (¿existe la tabla FTS5?)
+_fts_disponible = {}
+
+
+def _tokens(q):
+    return _TOKEN_RE.findall(q)
+
+
+def _exactos(q):
+    # subconsulta sin correlación: una igualdad sobre el índice único de la clave
+    por_codigo = CodigoProducto.objects.filter(clave=normalizar(q)).values('producto_id')
+    return Q(sku=q) | Q(sku_proveedor=q) | Q(pk__in=por_codigo)
+
+
+def _con_orden(qs, q, relevancia):
+    # relevancia va al cursor de KeysetPaginator: en PostgreSQL ts_rank / similarity son float4
+    # y el float de Python no vuelve exacto contra esa columna; como double sí (fila límite estable)
+    return qs.annotate(
+        exacto=Case(When(_exactos(q), then=Value(1)), default=Value(0), output_field=IntegerField()),
+        relevancia=Cast(relevancia, FloatField()),
+    ).order_by('-exacto', '-relevancia', 'nombre', 'id')
+
+
+# --------------------------------------------------------------------------------------
+# PostgreSQL
+# --------------------------------------------------------------------------------------
+
+SQL_POSTGRES = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    """
+    ALTER TABLE inventario_producto ADD COLUMN IF NOT EXISTS search_vector tsvector
+    GENERATED ALWAYS AS (
+        setweight(to_tsvector('simple',
+            coalesce(sku, '') || ' ' || coalesce(sku_proveedor, '') || ' ' || coalesce(codigo_identificador, '')
+        ), 'A') ||
+        setweight(to_tsvector('spanish', coalesce(nombre, '')), 'B') ||
+        setweight(to_tsvector('spanish', coalesce(palabras_clave, '')), 'C')
+    ) STORED
+    """,
+    "CREATE INDEX IF NOT EXISTS inventario_producto_search_gin ON inventario_producto USING gin (search_vector)",
+    "CREATE INDEX IF NOT EXISTS inventario_producto_nombre_trgm ON inventario_producto USING gin (nombre gin_trgm_ops)",
+    "CREATE INDEX IF NOT EXISTS inventario_producto_sku_trgm ON inventario_producto USING gin (sku gin_trgm_ops)",
+    "CREATE INDEX IF NOT EXISTS inventario_producto_sku_prov_trgm "
+    "ON inventario_producto USING gin (sku_proveedor gin_trgm_ops)",
+    "CREATE INDEX IF NOT EXISTS inventario_producto_codigo_trgm "
+    "ON inventario_producto USING gin (codigo_identificador gin_trgm_ops)",
+]
+
+SQL_POSTGRES_REVERSO = [
+    "DROP INDEX IF EXISTS inventario_producto_codigo_trgm",
+    "DROP INDEX IF EXISTS inventario_producto_sku_prov_trgm",
+    "DROP INDEX IF EXISTS inventario_producto_sku_trgm",
+    "DROP INDEX IF EXISTS inventario_producto_nombre_trgm",
+    "DROP INDEX IF EXISTS inventario_producto_search_gin",
+    "ALTER TABLE inventario_producto DROP COLUMN IF EXISTS search_vector",
+]
+
+
+def _buscar_postgres(qs, q, connection):
+    tabla = connection.ops.quote_name(Producto._meta.db_table)
+    tokens = _tokens(q)
+    # prefijos para búsqueda mientras se escribe: "torn & m8" -> "torn:* & m8:*"
+    tsquery = ' & '.join(f'{t}:*' for t in tokens)
+    patron = f'%{connection.ops.prep_for_like_query(q)}%'
+
+    condiciones = [
+        f'{tabla}."nombre" ILIKE %s',
+        f'{tabla}."sku" ILIKE %s',
+        f'{tabla}."sku_proveedor" ILIKE %s',
+        f'{tabla}."codigo_identificador" ILIKE %s',
+    ]
+    params = [patron] * 4
+    if tsquery:
+        condiciones.insert(0, f"{tabla}.search_vector @@ to_tsquery('spanish', %s)")
+        params.insert(0, tsquery)
+        rank_sql = (
+            f"ts_rank({tabla}.search_vector, to_tsquery('spanish', %s)) "
+            f"+ greatest(similarity({tabla}.\"nombre\", %s), similarity({tabla}.\"sku\", %s))"
+        )
+        rank_params = [tsquery, q, q]
+    else:
+        rank_sql = f'greatest(similarity({tabla}."nombre", %s), similarity({tabla}."sku", %s))'
+        rank_params = [q, q]
+
+    coincide = RawSQL('(' + ' OR '.join(condiciones) + ')', params, output_field=BooleanField())
+    qs = qs.filter(coincide | _exactos(q))
+    return _con_orden(qs, q, RawSQL(rank_sql, rank_params, output_field=FloatField()))
+
+
+# --------------------------------------------------------------------------------------
+# SQLite (FTS5)
+# --------------------------------------------------------------------------------------
+
+def _sql_sqlite():
+    columnas = ', '.join(CAMPOS_INDEXADOS)
+    nuevos = ', '.join(f'new.{c}' for c in CAMPOS_INDEXADOS)
+    viejos = ', '.join(f'old.{c}' for c in CAMPOS_INDEXADOS)
+    return [
+        f"""
+        CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLA} USING fts5(
+            {columnas},
+            content='inventario_producto', content_rowid='id',
+            tokenize='unicode61 remove_diacritics 2'
+        )
+        """,
+        f"""
+        CREATE TRIGGER IF NOT EXISTS {FTS_TABLA}_ai AFTER INSERT ON inventario_producto BEGIN
+            INSERT INTO {FTS_TABLA}(rowid, {columnas}) VALUES (new.id, {nuevos});
+        END
+        """,
+        f"""
+        CREATE TRIGGER IF NOT EXISTS {FTS_TABLA}_ad AFTER DELETE ON inventario_producto BEGIN
+            INSERT INTO {FTS_TABLA}({FTS_TABLA}, rowid, {columnas}) VALUES ('delete', old.id, {viejos});
+        END
+        """,
+        f"""
+        CREATE TRIGGER IF NOT EXISTS {FTS_TABLA}_au AFTER UPDATE OF {columnas} ON inventario_producto BEGIN
+            INSERT INTO {FTS_TABLA}({FTS_TABLA}, rowid, {columnas}) VALUES ('delete', old.id, {viejos});
+            INSERT INTO {FTS_TABLA}(rowid, {columnas}) VALUES (new.id, {nuevos});
+        END
+        """,
+    ]
+
+
+SQL_SQLITE_REVERSO = [
+    f"DROP TRIGGER IF EXISTS {FTS_TABLA}_au",
+    f"DROP TRIGGER IF EXISTS {FTS_TABLA}_ad",
+    f"DROP TRIGGER IF EXISTS {FTS_TABLA}_ai",
+    f"DROP TABLE IF EXISTS {FTS_TABLA}",
+]
+
+
+def _triggers_sqlite(cursor):
+    cursor.execute(
+        "SELECT count(*) FROM sqlite_master WHERE type = 'trigger' AND name IN (%s, %s, %s)",
+        [f'{FTS_TABLA}_ai', f'{FTS_TABLA}_ad', f'{FTS_TABLA}_au'],
+    )
+    return cursor.fetchone()[0]
+
+
+def _buscar_sqlite(qs, q, connection):
+    tabla = connection.ops.quote_name(Producto._meta.db_table)
+    tokens = _tokens(q)
+    if not tokens:
+        return _con_orden(qs.filter(_exactos(q)), q, Value(0.0, output_field=FloatField()))
+
+    # cada token entre comillas (escapa la sintaxis FTS5) y como prefijo
+    consulta = ' '.join('"{}"*'.format(t.replace('"', '""')) for t in tokens)
+    pesos = ', '.join(str(p) for p in PESOS_FTS)
+
+    coincide = RawSQL(
+        f'{tabla}."id" IN (SELECT rowid FROM {FTS_TABLA} WHERE {FTS_TABLA} MATCH %s)',
+        [consulta], output_field=BooleanField(),
+    )
+    # bm25 devuelve valores negativos (más negativo = más relevante)
+    relevancia = RawSQL(
+        f'(SELECT -bm25({FTS_TABLA}, {pesos}) FROM {FTS_TABLA} '
+        f'WHERE {FTS_TABLA} MATCH %s AND rowid = {tabla}."id")',
+        [consulta], output_field=FloatField(),
+    )
+    qs = qs.filter(coincide | _exactos(q))
+    return _con_orden(qs, q, Coalesce(relevancia, Value(0.0), output_field=FloatField()))
+
+
+# --------------------------------------------------------------------------------------
+# Genérico
+# --------------------------------------------------------------------------------------
+
+def _buscar_basico(qs, q, connection):
+    qs = qs.filter(
+        Q(nombre__icontains=q) |
+        Q(sku__icontains=q) |
+        Q(sku_proveedor__icontains=q) |
+        Q(codigo_identificador__icontains=q) |
+        Q(palabras_clave__icontains=q)
+    )
+    return _con_orden(qs, q, Value(0.0, output_field=FloatField()))
+
+
+def instalar_indice(connection):
+    """Crea (o repara) la estructura de búsqueda para la conexión dada. Idempotente."""
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            for sql in SQL_POSTGRES:
+                cursor.execute(sql)
+    elif connection.vendor == 'sqlite':
+        with connection.cursor() as cursor:
+            try:
+                cursor.execute(
+                    "SELECT count(*) FROM sqlite_master WHERE type = 'table' AND name = %s", [FTS_TABLA]
+                )
+                existia = cursor.fetchone()[0]
+                completos = existia and _triggers_sqlite(cursor) == 3
+                for sql in _sql_sqlite():
+                    cursor.execute(sql)
+            except Exception:
+                # SQLite compilado sin FTS5: se usa el filtro básico
+                _fts_disponible[connection.alias] = False
+                return
+            if not completos:
+                # tabla nueva o triggers perdidos (p. ej. al reconstruir la tabla en una migración)
+                cursor.execute(f"INSERT INTO {FTS_TABLA}({FTS_TABLA}) VALUES ('rebuild')")
+        _fts_disponible[connection.alias] = True
+
+
+def desinstalar_indice(connection):
+    sentencias = {
+        'postgresql': SQL_POSTGRES_REVERSO,
+        'sqlite': SQL_SQLITE_REVERSO,
+    }.get(connection.vendor, [])
+    with connection.cursor() as cursor:
+        for sql in sentencias:
+            cursor.execute(sql)
+    _fts_disponible.pop(connection.alias, None)
+
+
+def _sqlite_con_fts(connection):
+    if connection.alias not in _fts_disponible:
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT count(*) FROM sqlite_master WHERE type = 'table' AND name = %s", [FTS_TABLA])
+            _fts_disponible[connection.alias] = bool(cursor.fetchone()[0])
+    return _fts_disponible[connection.alias]
+
+
+def buscar_productos(q, queryset=None):
+    """
+    Filtra y ordena productos por ``q``: primero aciertos exactos de código, luego relevancia.
+    Devuelve un QuerySet (se puede seguir encadenando / paginando).
+    """
+    qs = Producto.objects.all() if queryset is None else queryset
+    q = (q or '').strip()
+    if not q:
+        return qs.order_by('nombre', 'id')
+
+    connection = connections[qs.db]
+    if connection.vendor == 'postgresql':
+        return _buscar_postgres(qs, q, connection)
+    if connection.vendor == 'sqlite' and _sqlite_con_fts(connection):
+        return _buscar_sqlite(qs, q, connection)
+    return _buscar_basico(qs, q, connection)
+
+
+def asegurar_indice(sender, using='default', **kwargs):
+    """Receptor de ``post_migrate``: SQLite pierde los triggers al reconstruir la tabla."""
+    connection = connections[using]
+    if connection.vendor == 'sqlite':
+        instalar_indice(connection)
@@ -0,0 +1,147 @@
+"""
+Caché código escaneado -> Producto para ScanResultView.
+
+Las entradas van por la clave normalizada del código (``inventario/codigos.py``): el UPC-A y
+el EAN-13 del mismo artículo comparten entrada, y un fallo se resuelve con una igualdad
+sobre el índice único de ``CodigoProducto.clave``.
+
+Dos niveles:
+1. LRU local al proceso (tamaño acotado y TTL corto): sin red en los escaneos repetidos.
+2. Caché de Django (``CACHES``): compartida entre workers.
+
+También guarda los códigos inexistentes (caché negativa, TTL más corto). La invalidación
+la disparan las señales de ``Producto`` y ``CodigoProducto`` (ver ``inventario/signals.py``): borra la entrada
+compartida y la local de este proceso; las LRU de otros procesos expiran por TTL.
+
+Configuración opcional en settings::
+
+    INVENTARIO_CACHE_CODIGOS = {
+        'ALIAS': 'default',     # alias de CACHES
+        'MAXIMO': 4096,         # entradas en la LRU local
+        'TTL_LOCAL': 30,        # segundos
+        'TTL': 300,             # segundos en la caché compartida
+        'TTL_NEGATIVO': 10,     # segundos para códigos inexistentes
+    }
+"""
+import threading
+import time
+from collections import Counter, OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import router
+
+from .codigos import normalizar
+from .models import Producto
+from .replicas import en_primaria
+
+# columnas que necesitan la pantalla de escaneo y el registro de movimientos
+CAMPOS = ('id', 'internal_id', 'nombre', 'sku', 'codigo_identificador', 'ubicacion_principal', 'fragmentos_stock')
+# parte de la clave compartida: cambia con ``CAMPOS`` para no leer tuplas de otra forma
+VERSION = 3
+
+_NO_EXISTE = 0
+
+
+class CacheCodigos:
+
+    def __init__(self, alias='default', maximo=4096, ttl_local=30, ttl=300, ttl_negativo=10):
+        self.alias = alias
+        self.maximo = maximo
+        self.ttl_local = ttl_local
+        self.ttl = ttl
+        self.ttl_negativo = ttl_negativo
+        self._local = OrderedDict()
+        self._lock = threading.Lock()
+        self.estadisticas = Counter()
+
+    @classmethod
+    def desde_settings(cls):
+        conf = getattr(settings, 'INVENTARIO_CACHE_CODIGOS', {})
+        return cls(
+            alias=conf.get('ALIAS', 'default'),
+            maximo=conf.get('MAXIMO', 4096),
+            ttl_local=conf.get('TTL_LOCAL', 30),
+            ttl=conf.get('TTL', 300),
+            ttl_negativo=conf.get('TTL_NEGATIVO', 10),
+        )
+
+    @staticmethod
+    def _clave(clave):
+        return f'inventario:codigo:v{VERSION}:{clave}'
+
+    @staticmethod
+    def _cargar(clave):
+        # de la primaria: una réplica atrasada dejaría el dato viejo en la caché compartida
+        with en_primaria():
+            return (
+                Producto.objects.filter(codigos__clave=clave)
+                .values_list(*CAMPOS).first()
+            )
+
+    @staticmethod
+    def _instancia(valores):
+        if valores == _NO_EXISTE:
+            return None
+        # instancia nueva en cada acierto: nadie comparte (ni muta) el objeto cacheado
+        return Producto.from_db(router.db_for_read(Producto), CAMPOS, valores)
+
+    def _contar(self, evento):
+        with self._lock:
+            self.estadisticas[evento] += 1
+
+    def obtener(self, code):
+        code = normalizar(code)
+        if not code:
+            return None
+
+        ahora = time.monotonic()
+        with self._lock:
+            entrada = self._local.get(code)
+            if entrada and entrada[0] > ahora:
+                self._local.move_to_end(code)
+                self.estadisticas['acierto_local'] += 1
+                return self._instancia(entrada[1])
+
+        compartida = caches[self.alias]
+        valores = compartida.get(self._clave(code))
+        if valores is not None:
+            self._contar('acierto_compartido')
+        else:
+            self._contar('fallo')
+            valores = self._cargar(code)
+            if valores is None:
+                valores = _NO_EXISTE
+                self._contar('negativo')
+            compartida.set(self._clave(code), valores,
+                           self.ttl_negativo if valores == _NO_EXISTE else self.ttl)
+
+        ttl_local = min(self.ttl_local, self.ttl_negativo) if valores == _NO_EXISTE else self.ttl_local
+        with self._lock:
+            self._local[code] = (ahora + ttl_local, valores)
+            self._local.move_to_end(code)
+            while len(self._local) > self.maximo:
+                self._local.popitem(last=False)
+                self.estadisticas['desalojo'] += 1
+        return self._instancia(valores)
+
+    def invalidar(self, *codes):
+        codes = {normalizar(c) for c in codes} - {''}
+        if not codes:
+            return
+        caches[self.alias].delete_many([self._clave(c) for c in codes])
+        with self._lock:
+            for c in codes:
+                self._local.pop(c, None)
+            self.estadisticas['invalidacion'] += len(codes)
+
+    def limpiar(self):
+        with self._lock:
+            self._local.clear()
+
+    def tamano(self):
+        with self._lock:
+            return len(self._local)
+
+
+cache_codigos = CacheCodigos.desde_settings()
@@ -0,0 +1,198 @@
+"""
+Generador determinista de datos de carga (``manage.py generar_carga``).
+
+Con la misma ``semilla`` y los mismos volúmenes produce los mismos proveedores, usuarios,
+productos (SKU, códigos, precios, stock) y movimientos, para que las mediciones de
+``medir_rendimiento`` sean comparables entre corridas y entre máquinas. Todo se inserta con
+``bulk_create`` por bloques; el stock de cada producto es la suma de sus movimientos y queda
+completo en su ubicación principal.
+
+Los registros llevan el ``prefijo`` en SKU / usuario / proveedor: ``limpiar`` los borra sin
+tocar los datos reales. Las fechas de los movimientos (``creado_en``) son las de la carga.
+"""
+import random
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+
+from usuarios.models import Role
+
+from .codigos import digito_control
+from .models import (
+    CodigoProducto, ExistenciaUbicacion, MovimientoStock, Producto, Proveedor, Ubicacion, codigo_ubicacion,
+    sincronizar_alertas,
+)
+from .valuacion import reconstruir
+
+PIEZAS = [
+    'Tornillo', 'Tuerca', 'Rondana', 'Balero', 'Banda', 'Filtro', 'Bujía', 'Empaque', 'Retén',
+    'Manguera', 'Abrazadera', 'Cadena', 'Piñón', 'Resorte', 'Fusible', 'Relevador', 'Sensor',
+    'Bomba', 'Válvula', 'Carburador', 'Motor', 'Polea', 'Rodamiento', 'Cable', 'Interruptor',
+]
+CALIFICADORES = [
+    'hexagonal', 'reforzado', 'de acero', 'de latón', 'galvanizado', 'universal', 'de alta presión',
+    'de nylon', 'térmico', 'sellado', 'ajustable', 'doble', 'corto', 'largo', 'inoxidable',
+]
+MEDIDAS = ['M4', 'M6', 'M8', 'M10', 'M12', '1/4"', '3/8"', '1/2"', '5/8"', '3/4"', '6204', '6205', '6301']
+MARCAS = ['Truper', 'Bosch', 'SKF', 'Gates', 'NGK', 'Honda', 'Stihl', 'Kohler', 'Briggs', 'Husqvarna']
+ROLES = ['Administrador', 'Gerente', 'Almacén', 'Ventas', 'Técnico']
+
+Visibilidad = Producto.VisibilidadOnline
+Tipo = MovimientoStock.TipoMovimiento
+
+
+def codigo_carga(n):
+    # rango GS1 20-29 (uso interno): nunca coincide con un código de fabricante real
+    base = f'29{n:010d}'
+    return base + digito_control(base)
+
+
+def _bloques(total, tamano):
+    for inicio in range(0, total, tamano):
+        yield inicio, min(inicio + tamano, total)
+
+
+def _movimientos_de(rnd, cantidad):
+    """Cantidades con signo de ``cantidad`` movimientos que nunca dejan el stock negativo."""
+    cantidades, stock = [], 0
+    for i in range(cantidad):
+        if i == 0 or stock == 0 or rnd.random() < 0.55:
+            n = rnd.randint(1, 50 if i == 0 else 20)
+        else:
+            n = -rnd.randint(1, min(stock, 10))
+        cantidades.append(n)
+        stock += n
+    return cantidades, stock
+
+
+def generar_usuarios(n, prefijo, rnd, bloque):
+    User = get_user_model()
+    roles = [Role.objects.get_or_create(name=nombre)[0] for nombre in ROLES]
+    p = prefijo.lower()
+    for inicio, fin in _bloques(n, bloque):
+        User.objects.bulk_create([
+            User(
+                username=f'{p}{i:07d}', email=f'{p}{i:07d}@carga.invalid',
+                first_name=rnd.choice(['Ana', 'Luis', 'María', 'José', 'Carmen', 'Jorge', 'Lucía', 'Pedro']),
+                paternal_last_name=rnd.choice(['García', 'López', 'Hernández', 'Martínez', 'Pérez', 'Sánchez']),
+                role_obj=rnd.choice(roles),
+                password='!',  # contraseña inutilizable, sin el costo de hashear
+            )
+            for i in range(inicio, fin)
+        ], ignore_conflicts=True)
+    return list(User.objects.filter(username__startswith=p).order_by('pk').values_list('pk', flat=True))
+
+
+def generar_proveedores(n, prefijo):
+    Proveedor.objects.bulk_create(
+        [Proveedor(nombre=f'{prefijo} Proveedor {i:05d}') for i in range(n)], ignore_conflicts=True,
+    )
+    return list(
+        Proveedor.objects.filter(nombre__startswith=f'{prefijo} Proveedor ').order_by('pk').values_list('pk', flat=True)
+    )
+
+
+def _producto(rnd, ref, i, prefijo, proveedores, usuarios, stock):
+    pieza = rnd.choice(PIEZAS)
+    precio = Decimal(rnd.randint(500, 500000)) / 100
+    visibilidad = rnd.choices(list(Visibilidad), weights=(2, 3, 5))[0]
+    return Producto(
+        sku=f'{prefijo}-{i:08d}',
+        sku_proveedor=f'{prefijo}-P{i:08d}',
+        codigo_identificador=codigo_carga(i),
+        nombre=f'{pieza} {rnd.choice(CALIFICADORES)} {rnd.choice(MEDIDAS)}',
+        tipo_producto=rnd.choices(list(Producto.TipoProducto), weights=(3, 6, 1, 1))[0],
+        descripcion_corta=f'{pieza} para mantenimiento y reparación.',
+        palabras_clave=f'{pieza.lower()} {rnd.choice(MARCAS).lower()}',
+        ubicacion_principal=f'{rnd.choice("ABCDEFGH")}-{rnd.randint(1, 40):02d}-{rnd.randint(1, 6)}',
+        cantidad_inicial=0,
+        stock_actual=stock,
+        punto_reorden=rnd.choice([None, 2, 5, 10, 20]),
+        unidad_medida=Producto.UnidadMedida.PZA,
+        costo_unitario=(precio * Decimal('0.6')).quantize(Decimal('0.01')),
+        proveedor_principal_id=ref.choice(proveedores) if proveedores else None,
+        created_by_id=ref.choice(usuarios) if usuarios else None,
+        marca_fabricante=rnd.choice(MARCAS),
+        precio_publico=precio,
+        precio_vigente=precio if visibilidad == Visibilidad.VENTA else None,
+        visibilidad_online=visibilidad,
+    )
+
+
+def generar(productos, movimientos, usuarios=1000, proveedores=200, semilla=42, prefijo='CARGA',
+            bloque=5000, progreso=None):
+    """
+    Inserta el volumen pedido. ``progreso(modelo, hechos, total)`` se llama después de cada
+    bloque. Devuelve ``{'productos': n, 'movimientos': n, 'usuarios': n, 'proveedores': n}``.
+    """
+    # una secuencia por sección: los productos no cambian si solo cambia el número de usuarios
+    rnd = random.Random(f'{semilla}-productos')
+    ref = random.Random(f'{semilla}-referencias')  # proveedor / usuario de cada registro
+    progreso = progreso or (lambda *args: None)
+    ids_usuarios = generar_usuarios(usuarios, prefijo, random.Random(f'{semilla}-usuarios'), bloque)
+    progreso('usuarios', len(ids_usuarios), usuarios)
+    ids_proveedores = generar_proveedores(proveedores, prefijo)
+    progreso('proveedores', len(ids_proveedores), proveedores)
+
+    hechos_mov = 0
+    for inicio, fin in _bloques(productos, bloque):
+        nuevos, cantidades = [], []
+        for i in range(inicio, fin):
+            # reparto exacto: la suma de todos los productos da ``movimientos``
+            n = movimientos * (i + 1) // productos - movimientos * i // productos
+            cantidades_i, stock = _movimientos_de(rnd, n)
+            cantidades.append(cantidades_i)
+            nuevos.append(_producto(rnd, ref, i, prefijo, ids_proveedores, ids_usuarios, stock))
+        with transaction.atomic():
+            Producto.objects.bulk_create(nuevos)
+            CodigoProducto.objects.bulk_create([CodigoProducto.de(p.pk, p.codigo_identificador) for p in nuevos])
+            ubicaciones = Ubicacion.ids_por_codigo([p.ubicacion_principal for p in nuevos])
+            lote = []
+            for producto, cantidades_i in zip(nuevos, cantidades):
+                ubicacion = ubicaciones[codigo_ubicacion(producto.ubicacion_principal)]
+                for j, n in enumerate(cantidades_i):
+                    lote.append(MovimientoStock(
+                        producto_id=producto.pk,
+                        tipo=Tipo.ENTRADA if j == 0 or n > 0 else Tipo.SALIDA,
+                        cantidad=n,
+                        motivo='Carga inicial' if j == 0 else None,
+                        usuario_id=ref.choice(ids_usuarios) if ids_usuarios else None,
+                        ubicacion_origen_id=ubicacion if n < 0 else None,
+                        ubicacion_destino_id=ubicacion if n > 0 else None,
+                    ))
+            MovimientoStock.objects.bulk_create(lote, batch_size=bloque)
+            ExistenciaUbicacion.objects.bulk_create([
+                ExistenciaUbicacion(
+                    producto_id=p.pk, ubicacion_id=ubicaciones[codigo_ubicacion(p.ubicacion_principal)],
+                    cantidad=p.stock_actual,
+                )
+                for p in nuevos if p.stock_actual
+            ], batch_size=bloque)
+            sincronizar_alertas([p.pk for p in nuevos])
+        hechos_mov += len(lote)
+        progreso('productos', fin, productos)
+        progreso('movimientos', hechos_mov, movimientos)
+
+    reconstruir()
+    return {
+        'productos': productos, 'movimientos': hechos_mov,
+        'usuarios': len(ids_usuarios), 'proveedores': len(ids_proveedores),
+    }
+
+
+def limpiar(prefijo='CARGA', bloque=5000):
+    """Borra lo generado con ``prefijo`` (por bloques de productos) y recalcula la valuación."""
+    qs = Producto.objects.filter(sku__startswith=f'{prefijo}-').order_by('pk')
+    borrados = 0
+    while True:
+        ids = list(qs.values_list('pk', flat=True)[:bloque])
+        if not ids:
+            break
+        with transaction.atomic():
+            MovimientoStock.objects.filter(producto_id__in=ids).delete()
+            borrados += Producto.objects.filter(pk__in=ids).delete()[1].get(Producto._meta.label, 0)
+    get_user_model().objects.filter(username__startswith=prefijo.lower()).delete()
+    Proveedor.objects.filter(nombre__startswith=f'{prefijo} Proveedor ').delete()
+    reconstruir()
+    return borrados
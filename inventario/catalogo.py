@@ -0,0 +1,174 @@
+"""
+Catálogo público de solo lectura (JSON) para la tienda en línea.
+
+- Solo productos con ``visibilidad_online`` Venta o Catálogo; el precio solo se publica en Venta.
+- Lista blanca de campos (``CAMPOS``): nunca sale costo, proveedor, ubicación ni stock exacto.
+  ``?campos=sku,nombre,precio`` limita la respuesta y las columnas leídas (``.only()``).
+- Paginación por cursor (``KeysetPaginator``) e imágenes con un solo ``prefetch_related``.
+- ``firma()`` lee solo (id, updated_at) de la página pedida: con eso la vista arma un ETag
+  fuerte y puede responder 304 sin leer ni serializar los productos. No hay
+  ``Last-Modified``: la página cambia también cuando un producto sale de ella (deja de ser
+  visible, cambia de precio u orden) y eso no avanza ningún ``updated_at`` de la ventana.
+"""
+import decimal
+import hashlib
+
+from django.core.exceptions import ValidationError
+from django.db.models import Prefetch
+from django.utils.dateparse import parse_datetime
+
+from .models import PREFIJO_PENDIENTE, ImagenProducto, Producto
+from .paginacion import KeysetPaginator
+
+# cambia si cambia el formato de la respuesta (invalida los ETag anteriores)
+VERSION = 1
+
+Visibilidad = Producto.VisibilidadOnline
+VISIBLES = (Visibilidad.VENTA, Visibilidad.CATALOGO)
+
+
+def _decimal(valor):
+    return None if valor is None else str(valor)
+
+
+def _precio(p, valor):
+    return _decimal(valor) if p.visibilidad_online == Visibilidad.VENTA else None
+
+
+def _url(archivo):
+    return archivo.url if archivo else None
+
+
+def _imagenes(p):
+    # las variantes se suben en trabajos propios: la que sigue en la cola sale como None
+    return [
+        {
+            'secuencia': img.secuencia,
+            'url': img.imagen.url,
+            'miniatura': _url(img.subido('miniatura')),
+            'icono': _url(img.subido('icono')),
+        }
+        for img in p.imagenes_catalogo
+    ]
+
+
+# nombre público -> (columnas de Producto que necesita, valor)
+CAMPOS = {
+    'id': (('internal_id',), lambda p: str(p.internal_id)),
+    'sku': (('sku',), lambda p: p.sku),
+    'nombre': (('nombre',), lambda p: p.nombre),
+    'descripcion': (('descripcion_corta',), lambda p: p.descripcion_corta),
+    'tipo': (('tipo_producto',), lambda p: p.tipo_producto),
+    'marca': (('marca_fabricante',), lambda p: p.marca_fabricante),
+    'modelo': (('modelo_fabricante',), lambda p: p.modelo_fabricante),
+    'compatible_con': (('compatible_con_modelos',), lambda p: p.compatible_con_modelos),
+    'unidad': (('unidad_medida',), lambda p: p.unidad_medida),
+    'visibilidad': (('visibilidad_online',), lambda p: p.visibilidad_online),
+    'precio': (('visibilidad_online', 'precio_vigente'), lambda p: _precio(p, p.precio_vigente)),
+    'precio_lista': (('visibilidad_online', 'precio_publico'), lambda p: _precio(p, p.precio_publico)),
+    'en_oferta': (
+        ('visibilidad_online', 'precio_vigente', 'precio_publico'),
+        lambda p: (p.visibilidad_online == Visibilidad.VENTA and p.precio_vigente is not None
+                   and p.precio_vigente != p.precio_publico),
+    ),
+    'disponible': (
+        ('estado', 'stock_actual', 'stock_reservado'),
+        lambda p: p.estado == Producto.Estado.DISPONIBLE and p.stock_actual > p.stock_reservado,
+    ),
+    'peso_kg': (('peso_kg',), lambda p: _decimal(p.peso_kg)),
+    'dimensiones_mm': (
+        ('largo_mm', 'ancho_mm', 'alto_mm'),
+        lambda p: {'largo': p.largo_mm, 'ancho': p.ancho_mm, 'alto': p.alto_mm},
+    ),
+    'imagenes': ((), _imagenes),
+    'actualizado': (('updated_at',), lambda p: p.updated_at.isoformat()),
+}
+
+ORDENES = {
+    'id': ('id',),
+    'precio': ('precio_vigente', 'id'),
+    '-precio': ('-precio_vigente', '-id'),
+    'actualizado': ('updated_at', 'id'),
+}
+
+
+class ConsultaCatalogo:
+    """Interpreta los parámetros GET; ``ValidationError`` si alguno no es válido."""
+
+    def __init__(self, params, por_pagina):
+        self.params = params
+        self.por_pagina = por_pagina
+        self.cursor = params.get('cursor') or None
+
+        pedidos = [c.strip() for c in params.get('campos', '').split(',') if c.strip()]
+        desconocidos = set(pedidos) - set(CAMPOS)
+        if desconocidos:
+            raise ValidationError(f'Campos desconocidos: {", ".join(sorted(desconocidos))}.')
+        self.campos = pedidos or list(CAMPOS)
+
+        self.orden = params.get('orden', 'id')
+        if self.orden not in ORDENES:
+            raise ValidationError(f'Orden inválido; usa uno de: {", ".join(ORDENES)}.')
+
+        qs = Producto.objects.filter(visibilidad_online__in=VISIBLES)
+        if params.get('visibilidad'):
+            if params['visibilidad'] not in VISIBLES:
+                raise ValidationError('Visibilidad inválida.')
+            qs = qs.filter(visibilidad_online=params['visibilidad'])
+        if params.get('tipo'):
+            qs = qs.filter(tipo_producto=params['tipo'])
+        if params.get('marca'):
+            qs = qs.filter(marca_fabricante=params['marca'])
+        for param, lookup in (('precio_min', 'gte'), ('precio_max', 'lte')):
+            if params.get(param):
+                try:
+                    valor = decimal.Decimal(params[param])
+                except decimal.InvalidOperation:
+                    raise ValidationError(f'{param} debe ser un número.')
+                # el precio solo es público en Venta
+                qs = qs.filter(visibilidad_online=Visibilidad.VENTA, **{f'precio_vigente__{lookup}': valor})
+        if params.get('modificado_desde'):
+            desde = parse_datetime(params['modificado_desde'])
+            if desde is None:
+                raise ValidationError('modificado_desde debe ser una fecha ISO 8601.')
+            qs = qs.filter(updated_at__gte=desde)
+        if self.orden in ('precio', '-precio'):
+            qs = qs.filter(visibilidad_online=Visibilidad.VENTA, precio_vigente__isnull=False)
+        self.queryset = qs.order_by(*ORDENES[self.orden])
+        self.paginator = KeysetPaginator(self.queryset, por_pagina, modo_conteo='ninguno')
+
+    def firma(self):
+        """Base del ETag de la página pedida, sin leer los productos."""
+        ventana = list(
+            self.paginator.filtrar(self.cursor).values_list('pk', 'updated_at')[:self.por_pagina + 1]
+        )
+        h = hashlib.sha256(f'v{VERSION}'.encode())
+        for clave in sorted(self.params):
+            h.update(f'|{clave}={",".join(self.params.getlist(clave))}'.encode())
+        for pk, actualizado in ventana:
+            h.update(f'|{pk}:{actualizado.isoformat()}'.encode())
+        return h.hexdigest()[:32]
+
+    def pagina(self):
+        columnas = {'id', 'updated_at'}
+        for campo in self.campos:
+            columnas.update(CAMPOS[campo][0])
+        columnas.update(c.lstrip('-') for c in ORDENES[self.orden])
+        qs = self.queryset.only(*columnas)
+        if 'imagenes' in self.campos:
+            qs = qs.prefetch_related(Prefetch(
+                'imagenes',
+                queryset=ImagenProducto.objects.exclude(imagen__startswith=PREFIJO_PENDIENTE)
+                .only('id', 'producto_id', 'secuencia', 'imagen', 'miniatura', 'icono').order_by('secuencia'),
+                to_attr='imagenes_catalogo',
+            ))
+        self.paginator.queryset = qs
+        return self.paginator.pagina(self.cursor)
+
+    def serializar(self, pagina):
+        return {
+            'resultados': [
+                {campo: CAMPOS[campo][1](p) for campo in self.campos} for p in pagina
+            ],
+            'siguiente': pagina.siguiente,
+        }
@@ -0,0 +1,100 @@
+"""
+Normalización de códigos de barras (lectores de Quagga: EAN-13, EAN-8, UPC-A, UPC-E, Code 128).
+
+El mismo artículo llega escrito de varias formas: UPC-A (12 dígitos) o el mismo código como
+EAN-13 con un cero delante, UPC-E (8 dígitos, comprimido) o su forma UPC-A expandida. Cada
+código con dígito verificador GS1 válido se guarda bajo su GTIN-14 (14 dígitos, ceros a la
+izquierda), así todas sus formas dan la misma ``clave``. Cualquier otro código (Code 128,
+QR, internos, o numéricos con dígito verificador inválido) se guarda tal cual, sin espacios
+en los extremos.
+
+Un código de 8 dígitos puede ser EAN-8 o UPC-E: si empieza con 0 o 1 y es un UPC-E válido
+se toma como UPC-E (los EAN-8 con esos prefijos son de uso restringido); si no, como EAN-8.
+
+Sin dependencias del modelo: la migración que puebla ``CodigoProducto`` usa las mismas funciones.
+"""
+
+EAN8, UPCE, UPCA, EAN13, GTIN14, OTRO = 'EAN8', 'UPCE', 'UPCA', 'EAN13', 'GTIN14', 'OTRO'
+
+FORMATOS = (
+    (EAN8, 'EAN-8'),
+    (UPCE, 'UPC-E'),
+    (UPCA, 'UPC-A'),
+    (EAN13, 'EAN-13'),
+    (GTIN14, 'GTIN-14'),
+    (OTRO, 'Otro'),
+)
+
+# longitudes GTIN donde un dígito verificador inválido es casi siempre un error de captura
+LONGITUDES_VERIFICADAS = (12, 13, 14)
+
+_POR_LONGITUD = {12: UPCA, 13: EAN13, 14: GTIN14}
+
+
+def digito_control(base):
+    """Dígito verificador GS1 de ``base`` (todos los dígitos menos el verificador)."""
+    suma = sum(int(d) * (3 if i % 2 == 0 else 1) for i, d in enumerate(reversed(base)))
+    return str((10 - suma % 10) % 10)
+
+
+def _verificado(codigo):
+    return digito_control(codigo[:-1]) == codigo[-1]
+
+
+def expandir_upce(codigo):
+    """UPC-A (12 dígitos) de un UPC-E de 8 dígitos; no revisa el dígito verificador."""
+    sistema, x, verificador = codigo[0], codigo[1:7], codigo[7]
+    ultimo = x[5]
+    if ultimo in '012':
+        cuerpo = x[0:2] + ultimo + '0000' + x[2:5]
+    elif ultimo == '3':
+        cuerpo = x[0:3] + '00000' + x[3:5]
+    elif ultimo == '4':
+        cuerpo = x[0:4] + '00000' + x[4]
+    else:
+        cuerpo = x[0:5] + '0000' + ultimo
+    return sistema + cuerpo + verificador
+
+
+def analizar(codigo):
+    """``(clave, formato)`` de ``codigo``; ``('', OTRO)`` si viene vacío."""
+    texto = (codigo or '').strip()
+    if not (texto.isascii() and texto.isdigit()):
+        return texto, OTRO
+    if len(texto) == 8:
+        if texto[0] in '01':
+            upca = expandir_upce(texto)
+            if _verificado(upca):
+                return upca.zfill(14), UPCE
+        if _verificado(texto):
+            return texto.zfill(14), EAN8
+    elif len(texto) in _POR_LONGITUD and _verificado(texto):
+        return texto.zfill(14), _POR_LONGITUD[len(texto)]
+    return texto, OTRO
+
+
+def normalizar(codigo):
+    """Clave canónica de ``codigo``: la misma para todas las formas de un GTIN."""
+    return analizar(codigo)[0]
+
+
+def verificador_invalido(codigo):
+    """``True`` si ``codigo`` tiene forma de UPC-A / EAN-13 / GTIN-14 pero su dígito verificador no cuadra."""
+    texto = (codigo or '').strip()
+    return (
+        texto.isascii() and texto.isdigit() and len(texto) in LONGITUDES_VERIFICADAS
+        and not _verificado(texto)
+    )
+
+
+def repetidos(filas):
+    """
+    Claves compartidas por más de un producto en ``filas`` (pares ``(producto_id, codigo)``):
+    ``{clave: [(producto_id, codigo), ...]}``, vacío si no hay ninguna.
+    """
+    por_clave = {}
+    for producto_id, codigo in filas:
+        clave = normalizar(codigo)
+        if clave:
+            por_clave.setdefault(clave, []).append((producto_id, codigo))
+    return {clave: grupo for clave, grupo in por_clave.items() if len({pk for pk, _ in grupo}) > 1}
@@ -0,0 +1,141 @@
+"""
+Instrumentación de consultas SQL por petición: número, tiempo total y consultas repetidas
+(misma "huella" = mismo SQL sin literales). Una huella repetida muchas veces en una petición
+es la firma de un N+1.
+
+- ``ConsultasMiddleware``: agrega ``Server-Timing: db;dur=..;desc="N consultas"`` y registra
+  un aviso (logger ``inventario.consultas``) si la petición supera el umbral o repite consultas.
+  Se activa en ``MIDDLEWARE`` (p. ej. después de ``AuthenticationMiddleware``)::
+
+      'inventario.consultas.ConsultasMiddleware',
+
+      INVENTARIO_CONSULTAS = {
+          'UMBRAL': 50,          # consultas por petición antes de avisar
+          'REPETICIONES': 5,     # veces que una misma huella puede repetirse
+      }
+
+- ``PresupuestoConsultasMixin``: para los ``TestCase`` (``assertPresupuesto``).
+"""
+import contextlib
+import logging
+import re
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+_LITERALES = [
+    (re.compile(r"'(?:[^']|'')*'"), '?'),                      # cadenas
+    (re.compile(r'\b\d+(?:\.\d+)?\b'), '?'),                     # números
+    (re.compile(r'\(\s*(?:\?|%s)(?:\s*,\s*(?:\?|%s))*\s*\)'), '(...)'),  # listas IN
+    (re.compile(r'\s+'), ' '),
+]
+# instrucciones de control de transacción: no cuentan como repeticiones
+_CONTROL = re.compile(r'^\s*(SAVEPOINT|RELEASE SAVEPOINT|ROLLBACK TO SAVEPOINT|BEGIN|COMMIT)', re.I)
+
+
+def huella(sql):
+    for patron, reemplazo in _LITERALES:
+        sql = patron.sub(reemplazo, sql)
+    return sql.strip()
+
+
+class RegistroConsultas:
+    """``execute_wrapper`` que acumula las consultas ejecutadas mientras está instalado."""
+
+    def __init__(self):
+        self.consultas = []  # [(alias, sql, segundos)]
+
+    def envoltura(self, alias):
+        def ejecutar(execute, sql, params, many, context):
+            inicio = time.perf_counter()
+            try:
+                return execute(sql, params, many, context)
+            finally:
+                self.consultas.append((alias, sql, time.perf_counter() - inicio))
+        return ejecutar
+
+    @property
+    def total(self):
+        return len(self.consultas)
+
+    @property
+    def tiempo(self):
+        return sum(s for _, _, s in self.consultas)
+
+    def repetidas(self, minimo=2):
+        """``[(huella, veces)]`` de las consultas que se repiten al menos ``minimo`` veces."""
+        conteo = Counter(huella(sql) for _, sql, _ in self.consultas if not _CONTROL.match(sql))
+        return [(h, n) for h, n in conteo.most_common() if n >= minimo]
+
+    def resumen(self, limite=3):
+        partes = [f'{self.total} consulta(s), {self.tiempo * 1000:.1f} ms']
+        for h, n in self.repetidas()[:limite]:
+            partes.append(f'{n}x {h[:200]}')
+        return '; '.join(partes)
+
+
+@contextlib.contextmanager
+def registrar_consultas(aliases=None):
+    """Registra las consultas de todas las conexiones (o de ``aliases``) dentro del bloque."""
+    registro = RegistroConsultas()
+    with contextlib.ExitStack() as pila:
+        for alias in aliases or connections:
+            pila.enter_context(connections[alias].execute_wrapper(registro.envoltura(alias)))
+        yield registro
+
+
+def _conf():
+    conf = getattr(settings, 'INVENTARIO_CONSULTAS', {})
+    return conf.get('UMBRAL', 50), conf.get('REPETICIONES', 5)
+
+
+class ConsultasMiddleware:
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.umbral, self.repeticiones = _conf()
+
+    def __call__(self, request):
+        with registrar_consultas() as registro:
+            response = self.get_response(request)
+        # en respuestas streaming las consultas de la iteración quedan fuera de la medición
+        response.headers['Server-Timing'] = (
+            f'db;dur={registro.tiempo * 1000:.1f};desc="{registro.total} consultas"'
+        )
+        if registro.total > self.umbral or registro.repetidas(self.repeticiones):
+            logger.warning('%s %s: %s', request.method, request.path, registro.resumen())
+        return response
+
+
+class PresupuestoConsultasMixin:
+    """
+    Para ``TestCase``: ``assertPresupuesto(maximo, repeticiones=...)`` falla si el bloque ejecuta
+    más de ``maximo`` consultas o si alguna huella se repite ``repeticiones`` veces o más
+    (N+1). Las respuestas streaming se consumen dentro del bloque.
+    """
+    repeticiones_max = 3
+
+    @contextlib.contextmanager
+    def assertPresupuesto(self, maximo, repeticiones=None):
+        repeticiones = repeticiones or self.repeticiones_max
+        with registrar_consultas() as registro:
+            yield registro
+        detalle = '\n'.join(f'  {sql}' for _, sql, _ in registro.consultas)
+        self.assertLessEqual(
+            registro.total, maximo,
+            f'{registro.total} consultas (presupuesto {maximo}):\n{detalle}',
+        )
+        repetidas = registro.repetidas(repeticiones)
+        self.assertFalse(repetidas, f'Consultas repetidas (posible N+1): {repetidas}')
+
+    def get_con_presupuesto(self, url, maximo, repeticiones=None, **kwargs):
+        with self.assertPresupuesto(maximo, repeticiones):
+            response = self.client.get(url, **kwargs)
+            if response.streaming:
+                b''.join(response.streaming_content)
+        self.assertLess(response.status_code, 400, f'{url} -> {response.status_code}')
+        return response
@@ -0,0 +1,161 @@
+"""
+Exportación en streaming (CSV / JSONL, opcionalmente gzip) de productos y movimientos.
+
+Las filas se leen con ``values_list().iterator(chunk_size)`` (cursor del lado del servidor en
+PostgreSQL) y se emiten por bloques, así la memoria no depende del número de filas.
+Lo usan las vistas ``ExportarProductosView`` / ``ExportarMovimientosView`` y los comandos
+``exportar_productos`` / ``exportar_movimientos``.
+"""
+import csv
+import datetime
+import decimal
+import json
+import uuid
+import zlib
+
+from .models import MovimientoStock, Producto
+
+CHUNK = 2000
+
+# el queryset de productos debe venir con ``con_stock_total()``: el stock exportado incluye
+# los contadores fragmentados aún sin plegar
+COLUMNAS_PRODUCTO = [
+    ('internal_id', 'internal_id'),
+    ('sku', 'sku'),
+    ('sku_proveedor', 'sku_proveedor'),
+    ('codigo_identificador', 'codigo_identificador'),
+    ('nombre', 'nombre'),
+    ('tipo_producto', 'tipo_producto'),
+    ('estado', 'estado'),
+    ('ubicacion_principal', 'ubicacion_principal'),
+    ('stock_actual', 'stock_total'),
+    ('unidad_medida', 'unidad_medida'),
+    ('proveedor', 'proveedor_principal__nombre'),
+    ('marca_fabricante', 'marca_fabricante'),
+    ('modelo_fabricante', 'modelo_fabricante'),
+    ('visibilidad_online', 'visibilidad_online'),
+    ('fecha_alta', 'fecha_alta'),
+    ('updated_at', 'updated_at'),
+]
+
+# solo para roles de gestión (ver forms.user_is_manager)
+COLUMNAS_PRODUCTO_SENSIBLES = [
+    ('costo_unitario', 'costo_unitario'),
+    ('precio_publico', 'precio_publico'),
+    ('precio_oferta', 'precio_oferta'),
+    ('oferta_inicio', 'oferta_inicio'),
+    ('oferta_fin', 'oferta_fin'),
+    ('precio_vigente', 'precio_vigente'),
+]
+
+COLUMNAS_MOVIMIENTO = [
+    ('id', 'id'),
+    ('creado_en', 'creado_en'),
+    ('sku', 'producto__sku'),
+    ('producto', 'producto__nombre'),
+    ('tipo', 'tipo'),
+    ('cantidad', 'cantidad'),
+    ('motivo', 'motivo'),
+    ('usuario', 'usuario__username'),
+    ('ip', 'ip'),
+    ('lote', 'lote'),
+    ('ubicacion_origen', 'ubicacion_origen__codigo'),
+    ('ubicacion_destino', 'ubicacion_destino__codigo'),
+]
+
+
+# modelo -> (campo de fecha para desde / hasta, campo del proveedor, campo del tipo)
+FILTROS = {
+    Producto: ('updated_at', 'proveedor_principal_id', 'tipo_producto'),
+    MovimientoStock: ('creado_en', 'producto__proveedor_principal_id', 'tipo'),
+}
+
+
+def filtrar(queryset, desde=None, hasta=None, proveedor=None, tipo=None):
+    """Aplica los filtros de exportación a un QuerySet de un modelo de ``FILTROS``, en orden de pk."""
+    fecha, campo_proveedor, campo_tipo = FILTROS[queryset.model]
+    qs = queryset.order_by('pk')
+    if desde:
+        qs = qs.filter(**{f'{fecha}__gte': desde})
+    if hasta:
+        qs = qs.filter(**{f'{fecha}__lt': hasta})
+    if proveedor:
+        qs = qs.filter(**{campo_proveedor: proveedor})
+    if tipo:
+        qs = qs.filter(**{campo_tipo: tipo})
+    return qs
+
+
+def productos(desde=None, hasta=None, proveedor=None, tipo=None):
+    """``desde`` / ``hasta`` filtran por ``updated_at`` (modificados en el rango)."""
+    return filtrar(Producto.objects.con_stock_total(), desde, hasta, proveedor, tipo)
+
+
+def movimientos(desde=None, hasta=None, proveedor=None, tipo=None):
+    """``desde`` / ``hasta`` filtran por ``creado_en``; ``proveedor`` por el del producto."""
+    return filtrar(MovimientoStock.objects.all(), desde, hasta, proveedor, tipo)
+
+
+def _plano(valor):
+    if isinstance(valor, datetime.datetime):
+        return valor.isoformat()
+    if isinstance(valor, (datetime.date, decimal.Decimal, uuid.UUID)):
+        return str(valor)
+    return valor
+
+
+class _Eco:
+    """Pseudo-archivo para csv.writer: devuelve lo escrito en lugar de guardarlo."""
+
+    def write(self, valor):
+        return valor
+
+
+def _filas(queryset, columnas, chunk):
+    return queryset.values_list(*[campo for _, campo in columnas]).iterator(chunk_size=chunk)
+
+
+def csv_stream(queryset, columnas, chunk=CHUNK):
+    writer = csv.writer(_Eco())
+    yield writer.writerow([nombre for nombre, _ in columnas])
+    bloque = []
+    for fila in _filas(queryset, columnas, chunk):
+        bloque.append(writer.writerow([_plano(v) for v in fila]))
+        if len(bloque) >= chunk:
+            yield ''.join(bloque)
+            bloque = []
+    if bloque:
+        yield ''.join(bloque)
+
+
+def jsonl_stream(queryset, columnas, chunk=CHUNK):
+    nombres = [nombre for nombre, _ in columnas]
+    bloque = []
+    for fila in _filas(queryset, columnas, chunk):
+        bloque.append(json.dumps(dict(zip(nombres, map(_plano, fila))), ensure_ascii=False) + '\n')
+        if len(bloque) >= chunk:
+            yield ''.join(bloque)
+            bloque = []
+    if bloque:
+        yield ''.join(bloque)
+
+
+def gzip_stream(partes):
+    compresor = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits=31: contenedor gzip
+    for parte in partes:
+        datos = compresor.compress(parte.encode('utf-8'))
+        if datos:
+            yield datos
+    yield compresor.flush()
+
+
+FORMATOS = {
+    'csv': (csv_stream, 'text/csv; charset=utf-8'),
+    'jsonl': (jsonl_stream, 'application/x-ndjson; charset=utf-8'),
+}
+
+
+def stream(queryset, columnas, formato='csv', comprimir=False, chunk=CHUNK):
+    """Iterador de ``str`` (o ``bytes`` si ``comprimir``) con el contenido exportado."""
+    generador = FORMATOS[formato][0](queryset, columnas, chunk)
+    return gzip_stream(generador) if comprimir else generador
@@ -1,17 +1,23 @@
 from django import forms
 from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import UploadedFile
 from django.core.validators import FileExtensionValidator
 from django.forms import inlineformset_factory
-from .models import Producto, ImagenProducto, Proveedor
-
-MANAGEMENT_ROLES = {'Administrador', 'Supervisor', 'Boss'}
-MAX_IMAGE_MB = 2  # límite recomendado por subida
+from usuarios.access import MANAGEMENT_ROLES, for_user  # noqa: F401 (MANAGEMENT_ROLES: reexportado)
+from . import imagenes, media
+from .models import ExistenciaUbicacion, Producto, ImagenProducto, Proveedor, Ubicacion
+
+CAMPOS_SENSIBLES = [
+    'costo_unitario', 'precio_publico', 'precio_oferta',
+    'oferta_inicio', 'oferta_fin', 'visibilidad_online',
+    'peso_kg', 'largo_mm', 'ancho_mm', 'alto_mm',
+]
+# campos que se quitan del formulario según el acceso (gestión o no), calculados una vez
+CAMPOS_OCULTOS = {True: frozenset(), False: frozenset(CAMPOS_SENSIBLES)}
 
 def user_is_manager(user):
-    try:
-        return bool(user.is_superuser or (getattr(user, 'role_obj', None) and user.role_obj.name in MANAGEMENT_ROLES))
-    except Exception:
-        return bool(user.is_superuser)
+    """Rol de gestión o superusuario, resuelto con ``usuarios.access`` (en caché)."""
+    return bool(user) and for_user(user).is_manager
 
 class ProductoCreateForm(forms.ModelForm):
     class Meta:
@@ -20,7 +26,7 @@ class ProductoCreateForm(forms.ModelForm):
             'codigo_identificador',
             'sku', 'sku_proveedor', 'nombre', 'tipo_producto',
             'descripcion_corta', 'palabras_clave', 'estado',
-            'ubicacion_principal', 'cantidad_inicial', 'unidad_medida',
+            'ubicacion_principal', 'cantidad_inicial', 'unidad_medida', 'punto_reorden',
             'costo_unitario',  # sensible
             'proveedor_principal',
             'marca_fabricante', 'modelo_fabricante', 'compatible_con_modelos',
@@ -44,11 +50,8 @@ class ProductoCreateForm(forms.ModelForm):
         super().__init__(*args, **kwargs)
 
         # oculta campos sensibles si el rol no corresponde
-        if not self.user or not user_is_manager(self.user):
-            for name in ['costo_unitario', 'precio_publico', 'precio_oferta',
-                         'oferta_inicio', 'oferta_fin', 'visibilidad_online',
-                         'peso_kg', 'largo_mm', 'ancho_mm', 'alto_mm']:
-                self.fields.pop(name, None)
+        for name in CAMPOS_OCULTOS[self.puede_ver_sensibles()]:
+            self.fields.pop(name, None)
 
         # validadores PDF
         if 'manual_tecnico_pdf' in self.fields:
@@ -56,6 +59,9 @@ class ProductoCreateForm(forms.ModelForm):
                 FileExtensionValidator(allowed_extensions=['pdf'])
             )
 
+    def puede_ver_sensibles(self):
+        return bool(self.user) and user_is_manager(self.user)
+
     def clean(self):
         cleaned = super().clean()
         tipo = cleaned.get('tipo_producto')
@@ -73,6 +79,34 @@ class ProductoUpdateForm(ProductoCreateForm):
         exclude = ['internal_id']
 
 
+class ProductoImportForm(ProductoCreateForm):
+    """
+    Valida una fila de la importación masiva con las mismas reglas que el alta manual.
+    La unicidad (sku / sku_proveedor / código) y el proveedor se resuelven por bloque en
+    inventario/importar.py, no fila por fila.
+    """
+    class Meta(ProductoCreateForm.Meta):
+        fields = [f for f in ProductoCreateForm.Meta.fields
+                  if f not in ('manual_tecnico_pdf', 'proveedor_principal')]
+        widgets = {}
+
+    def puede_ver_sensibles(self):
+        # sin usuario = comando de consola
+        return self.user is None or user_is_manager(self.user)
+
+    def validate_unique(self):
+        pass
+
+
+class ImportarProductosForm(forms.Form):
+    archivo = forms.FileField(
+        help_text='CSV (UTF-8) o XLSX con encabezados iguales a los campos del producto; '
+                  'el proveedor va en la columna "proveedor" (nombre).'
+    )
+    simulacion = forms.BooleanField(label='Solo validar (simulación)', required=False, initial=True)
+    crear_proveedores = forms.BooleanField(label='Crear proveedores inexistentes', required=False)
+
+
 class ImagenProductoForm(forms.ModelForm):
     class Meta:
         model = ImagenProducto
@@ -83,9 +117,28 @@ class ImagenProductoForm(forms.ModelForm):
 
     def clean_imagen(self):
         img = self.cleaned_data.get('imagen')
-        if img and img.size > MAX_IMAGE_MB * 1024 * 1024:
-            raise ValidationError(f'La imagen supera {MAX_IMAGE_MB}MB. Usa menor resolución o comprime.')
-        return img
+        self._variantes = {}
+        if not isinstance(img, UploadedFile):
+            return img  # sin cambios
+        max_mb = imagenes.configuracion()['max_mb_entrada']
+        if img.size > max_mb * 1024 * 1024:
+            raise ValidationError(f'La imagen supera {max_mb}MB.')
+        # se guarda normalizada (orientada, sin EXIF, redimensionada) en lugar de rechazarla por peso
+        principal, self._variantes = imagenes.normalizar(img)
+        return principal
+
+    def save(self, commit=True):
+        secuencia = self.cleaned_data.get('secuencia') or self.instance.secuencia
+        for campo, archivo in getattr(self, '_variantes', {}).items():
+            archivo.name = f'{secuencia}-{campo}.{archivo.name.rsplit(".", 1)[-1]}'
+            setattr(self.instance, campo, archivo)
+        if not commit:
+            return super().save(commit)
+        # la petición no espera a Cloudinary: el worker procesar_media sube los archivos
+        diferidos = media.diferir(self.instance, 'imagen', *imagenes.VARIANTES)
+        instancia = super().save(commit)
+        media.encolar(instancia, diferidos)
+        return instancia
 
 
 ImagenProductoFormSet = inlineformset_factory(
@@ -107,4 +160,85 @@ class AjusteStockForm(forms.Form):
     ]
     accion = forms.ChoiceField(choices=ACCION_CHOICES)
     cantidad = forms.IntegerField(min_value=1)
-    motivo = forms.CharField(max_length=200, required=False)
\ No newline at end of file
+    motivo = forms.CharField(max_length=200, required=False)
+
+
+class TransferenciaForm(forms.Form):
+    origen = forms.ModelChoiceField(queryset=Ubicacion.objects.none(), label='Desde')
+    destino = forms.CharField(label='Hacia (código de ubicación)', max_length=100)
+    cantidad = forms.IntegerField(min_value=1)
+    motivo = forms.CharField(max_length=200, required=False)
+
+    def __init__(self, *args, producto=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        # solo las ubicaciones donde hay existencias del producto (pocas), no todo el catálogo
+        self.fields['origen'].queryset = Ubicacion.objects.filter(
+            pk__in=ExistenciaUbicacion.objects.filter(producto=producto, cantidad__gt=0).values('ubicacion')
+        )
+
+    def clean_destino(self):
+        codigo = self.cleaned_data['destino'].strip()
+        destino = Ubicacion.objects.filter(codigo=codigo, activa=True).first()
+        if destino is None:
+            raise ValidationError('No existe una ubicación activa con ese código.')
+        return destino
+
+    def clean(self):
+        cleaned = super().clean()
+        if cleaned.get('origen') and cleaned.get('origen') == cleaned.get('destino'):
+            raise ValidationError('El origen y el destino deben ser distintos.')
+        return cleaned
+
+
+class MovimientoLoteForm(forms.Form):
+    ACCION_CHOICES = [
+        ('add', 'Recepción (entrada)'),
+        ('remove', 'Despacho (salida)'),
+    ]
+    accion = forms.ChoiceField(choices=ACCION_CHOICES)
+    codigos = forms.CharField(
+        label='Códigos',
+        widget=forms.Textarea(attrs={'rows': 12, 'autofocus': 'autofocus'}),
+        help_text='Un código (o SKU) por línea; opcional "código,cantidad". Los repetidos se suman.'
+    )
+    motivo = forms.CharField(max_length=200, required=False)
+
+    def clean_codigos(self):
+        cantidades = {}
+        for n, linea in enumerate(self.cleaned_data['codigos'].splitlines(), start=1):
+            linea = linea.strip()
+            if not linea:
+                continue
+            code, _, cant = linea.partition(',')
+            code = code.strip()
+            try:
+                cant = int(cant) if cant.strip() else 1
+            except ValueError:
+                raise ValidationError(f'Línea {n}: cantidad inválida "{cant.strip()}".')
+            if cant < 1:
+                raise ValidationError(f'Línea {n}: la cantidad debe ser mayor a cero.')
+            cantidades[code] = cantidades.get(code, 0) + cant
+        if not cantidades:
+            raise ValidationError('Captura al menos un código.')
+        return cantidades
+
+
+
+class ExportarForm(forms.Form):
+    FORMATO_CHOICES = [('csv', 'CSV'), ('jsonl', 'JSON Lines')]
+    formato = forms.ChoiceField(choices=FORMATO_CHOICES, required=False)
+    gzip = forms.BooleanField(required=False)
+    desde = forms.DateField(required=False)
+    hasta = forms.DateField(required=False)
+    proveedor = forms.IntegerField(required=False, min_value=1)
+    tipo = forms.CharField(max_length=20, required=False)
+
+    def clean_formato(self):
+        return self.cleaned_data.get('formato') or 'csv'
+
+    def clean(self):
+        cleaned = super().clean()
+        desde, hasta = cleaned.get('desde'), cleaned.get('hasta')
+        if desde and hasta and desde > hasta:
+            raise ValidationError('La fecha "desde" no puede ser posterior a "hasta".')
+        return cleaned
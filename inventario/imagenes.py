@@ -0,0 +1,107 @@
+"""
+Normalización de imágenes de producto en el servidor (Pillow).
+
+Cada subida se decodifica, se orienta según EXIF, se descartan los metadatos (EXIF/GPS),
+se reduce a ``LADO_MAX`` px por lado y se recodifica en ``FORMATO`` (WebP por defecto;
+JPEG como alternativa). Además se generan variantes de tamaño fijo (``VARIANTES``) que
+usan ``imagenes.html`` y los listados, así nunca se sirve el original a tamaño completo.
+
+Configuración opcional en settings::
+
+    INVENTARIO_IMAGENES = {
+        'LADO_MAX': 1600,        # px del lado mayor de la imagen principal
+        'FORMATO': 'WEBP',       # 'WEBP' o 'JPEG'
+        'CALIDAD': 82,
+        'MAX_MB_ENTRADA': 25,    # tope del archivo recibido (antes de normalizar)
+        'MAX_MEGAPIXELES': 50,   # tope de la imagen decodificada
+    }
+"""
+import io
+import os
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files.base import ContentFile
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+# nombre del campo -> lado mayor en px
+VARIANTES = {
+    'miniatura': 480,
+    'icono': 96,
+}
+
+_EXTENSIONES = {'WEBP': 'webp', 'JPEG': 'jpg'}
+
+
+def configuracion():
+    conf = getattr(settings, 'INVENTARIO_IMAGENES', {})
+    formato = conf.get('FORMATO', 'WEBP').upper()
+    if formato not in _EXTENSIONES:
+        formato = 'JPEG'
+    return {
+        'lado_max': conf.get('LADO_MAX', 1600),
+        'formato': formato,
+        'calidad': conf.get('CALIDAD', 82),
+        'max_mb_entrada': conf.get('MAX_MB_ENTRADA', 25),
+        'max_megapixeles': conf.get('MAX_MEGAPIXELES', 50),
+    }
+
+
+def abrir(archivo, max_megapixeles=None):
+    """Decodifica ``archivo`` ya orientado. ``ValidationError`` si no es una imagen válida."""
+    max_megapixeles = max_megapixeles or configuracion()['max_megapixeles']
+    if hasattr(archivo, 'seek'):
+        archivo.seek(0)
+    try:
+        imagen = Image.open(archivo)
+        if imagen.width * imagen.height > max_megapixeles * 1_000_000:
+            raise ValidationError(f'La imagen supera {max_megapixeles} megapíxeles.')
+        imagen.load()
+    except (UnidentifiedImageError, Image.DecompressionBombError, OSError) as exc:
+        raise ValidationError('El archivo no es una imagen válida.') from exc
+    # la orientación de la cámara pasa a los píxeles; el EXIF no se copia al recodificar
+    return ImageOps.exif_transpose(imagen)
+
+
+def _modo_compatible(imagen, formato):
+    transparente = imagen.mode in ('RGBA', 'LA') or (imagen.mode == 'P' and 'transparency' in imagen.info)
+    if formato == 'WEBP' and transparente:
+        return imagen.convert('RGBA')
+    if transparente:
+        # JPEG no admite alfa: se compone sobre blanco
+        fondo = Image.new('RGB', imagen.size, (255, 255, 255))
+        fondo.paste(imagen.convert('RGBA'), mask=imagen.convert('RGBA').getchannel('A'))
+        return fondo
+    return imagen.convert('RGB') if imagen.mode != 'RGB' else imagen
+
+
+def codificar(imagen, lado, formato, calidad, nombre):
+    """Copia de ``imagen`` reducida a ``lado`` px (lado mayor) como ``ContentFile``."""
+    copia = imagen.copy()
+    copia.thumbnail((lado, lado), Image.Resampling.LANCZOS)
+    copia = _modo_compatible(copia, formato)
+    salida = io.BytesIO()
+    opciones = {'quality': calidad}
+    if formato == 'WEBP':
+        opciones['method'] = 6
+    else:
+        opciones.update(optimize=True, progressive=True)
+    copia.save(salida, format=formato, **opciones)
+    base = os.path.splitext(os.path.basename(nombre or 'imagen'))[0] or 'imagen'
+    return ContentFile(salida.getvalue(), name=f'{base}.{_EXTENSIONES[formato]}')
+
+
+def normalizar(archivo):
+    """
+    Devuelve ``(principal, variantes)``: el ``ContentFile`` normalizado y un dict
+    ``{campo: ContentFile}`` con cada variante de ``VARIANTES``.
+    """
+    conf = configuracion()
+    imagen = abrir(archivo, conf['max_megapixeles'])
+    nombre = getattr(archivo, 'name', None)
+    principal = codificar(imagen, conf['lado_max'], conf['formato'], conf['calidad'], nombre)
+    variantes = {
+        campo: codificar(imagen, lado, conf['formato'], conf['calidad'], nombre)
+        for campo, lado in VARIANTES.items()
+    }
+    return principal, variantes
@@ -0,0 +1,294 @@
+"""
+Importación masiva de productos desde CSV / XLSX.
+
+- Cada fila se valida con ``ProductoImportForm`` (mismas reglas que ``ProductoCreateForm``).
+- La unicidad de ``sku`` / ``sku_proveedor`` / ``codigo_identificador`` se comprueba por bloque
+  con tres consultas ``__in`` más conjuntos en memoria (duplicados dentro del mismo archivo).
+  El código se compara por su clave normalizada contra ``CodigoProducto`` (un UPC-A choca con
+  el EAN-13 del mismo artículo).
+- Los proveedores (columna ``proveedor``, por nombre) se resuelven con una consulta por bloque.
+- Cada bloque válido se inserta con ``bulk_create`` en su propia transacción, junto con los
+  movimientos de la cantidad inicial (también en bloque).
+- ``simulacion=True`` solo valida y reporta. Con ``checkpoint`` se guarda la última fila
+  confirmada y una ejecución posterior puede reanudar desde ahí. El checkpoint guarda la
+  huella (``origen``, SHA-256) del archivo: no se reanuda sobre otro archivo ni sobre una
+  versión modificada. Se borra al terminar y la simulación no lo lee ni lo escribe.
+"""
+import csv
+import hashlib
+import io
+import json
+import os
+import uuid
+
+from django.db import connections, router, transaction
+
+from .codigos import normalizar
+from .forms import ProductoImportForm
+from .models import (
+    CodigoProducto, ExistenciaUbicacion, MovimientoStock, Producto, Proveedor, Ubicacion, codigo_ubicacion,
+    sincronizar_alertas, valuar_productos,
+)
+
+TAMANO_BLOQUE = 1000
+CAMPOS_UNICOS = ('sku', 'sku_proveedor', 'codigo_identificador')
+
+
+def _valor_unico(campo, valor):
+    # el código de barras es único por su clave normalizada, no por el texto
+    return normalizar(valor) if campo == 'codigo_identificador' and valor else valor
+
+
+class ErrorImportacion(Exception):
+    pass
+
+
+class ResultadoImportacion:
+
+    def __init__(self, simulacion):
+        self.simulacion = simulacion
+        self.leidas = 0
+        self.validas = 0
+        self.creadas = 0
+        self.omitidas = 0  # ya confirmadas en una ejecución anterior (checkpoint)
+        self.errores = []  # [(fila, [mensajes])]
+        self.lote = None
+
+    def agregar_error(self, fila, mensajes):
+        self.errores.append((fila, list(mensajes)))
+
+    def resumen(self):
+        modo = 'Simulación' if self.simulacion else 'Importación'
+        return (
+            f'{modo}: {self.leidas} fila(s) leída(s), {self.validas} válida(s), '
+            f'{self.creadas} creada(s), {len(self.errores)} con error, {self.omitidas} omitida(s).'
+        )
+
+
+def leer_filas(archivo, nombre):
+    """Itera ``dict`` por fila (encabezados en minúsculas) de un CSV o XLSX."""
+    if nombre.lower().endswith('.xlsx'):
+        try:
+            from openpyxl import load_workbook
+        except ImportError:
+            raise ErrorImportacion('Para importar XLSX instala openpyxl (pip install openpyxl).')
+        libro = load_workbook(archivo, read_only=True, data_only=True)
+        filas = libro.active.iter_rows(values_only=True)
+        encabezados = [str(h or '').strip().lower() for h in next(filas, [])]
+        for valores in filas:
+            if not any(v not in (None, '') for v in valores):
+                continue
+            yield {h: ('' if v is None else v) for h, v in zip(encabezados, valores) if h}
+        libro.close()
+        return
+
+    if isinstance(archivo, (str, os.PathLike)):
+        texto = open(archivo, encoding='utf-8-sig', newline='')
+    else:
+        texto = io.TextIOWrapper(archivo, encoding='utf-8-sig', newline='')
+    with texto:
+        for fila in csv.DictReader(texto):
+            yield {(k or '').strip().lower(): (v or '').strip() for k, v in fila.items()}
+
+
+def huella_archivo(ruta):
+    """SHA-256 del contenido de ``ruta``: identifica el archivo al que pertenece un checkpoint."""
+    digest = hashlib.sha256()
+    with open(ruta, 'rb') as f:
+        for trozo in iter(lambda: f.read(1 << 20), b''):
+            digest.update(trozo)
+    return digest.hexdigest()
+
+
+def _bloques(filas, tamano, desde_fila):
+    bloque = []
+    for numero, fila in enumerate(filas, start=2):  # fila 1 = encabezados
+        if numero <= desde_fila:
+            continue
+        bloque.append((numero, fila))
+        if len(bloque) >= tamano:
+            yield bloque
+            bloque = []
+    if bloque:
+        yield bloque
+
+
+class ImportadorProductos:
+
+    def __init__(self, usuario=None, simulacion=False, crear_proveedores=False,
+                 tamano_bloque=TAMANO_BLOQUE, checkpoint=None, origen=None):
+        self.usuario = usuario
+        self.simulacion = simulacion
+        self.crear_proveedores = crear_proveedores
+        self.tamano_bloque = tamano_bloque
+        self.checkpoint = checkpoint
+        self.origen = origen  # huella del archivo (``huella_archivo``) que se guarda en el checkpoint
+        self.resultado = ResultadoImportacion(simulacion)
+        self.resultado.lote = uuid.uuid4()
+        # valores únicos ya usados por filas anteriores del mismo archivo
+        self._vistos = {campo: set() for campo in CAMPOS_UNICOS}
+        self._proveedores = {}
+        # columnas ausentes del archivo toman el default del modelo (las vacías se validan tal cual)
+        campos_form = set(ProductoImportForm.base_fields)
+        self._defaults = {
+            f.name: f.get_default() for f in Producto._meta.fields
+            if f.name in campos_form and f.has_default() and not callable(f.default)
+        }
+
+    # ---- checkpoints ---------------------------------------------------------------
+
+    def _leer_checkpoint(self):
+        if not self.checkpoint or self.simulacion or not os.path.exists(self.checkpoint):
+            return 0
+        with open(self.checkpoint, encoding='utf-8') as f:
+            datos = json.load(f)
+        if datos.get('origen') != self.origen:
+            raise ErrorImportacion(
+                f'El checkpoint {self.checkpoint} es de otro archivo o de una versión anterior de este; '
+                'bórralo para importar desde el principio.'
+            )
+        self.resultado.lote = uuid.UUID(datos['lote'])
+        return datos['fila']
+
+    def _guardar_checkpoint(self, fila):
+        if not self.checkpoint or self.simulacion:
+            return
+        temporal = self.checkpoint + '.tmp'
+        with open(temporal, 'w', encoding='utf-8') as f:
+            json.dump({'fila': fila, 'lote': str(self.resultado.lote), 'origen': self.origen}, f)
+        os.replace(temporal, self.checkpoint)
+
+    def _borrar_checkpoint(self):
+        if self.checkpoint and not self.simulacion and os.path.exists(self.checkpoint):
+            os.remove(self.checkpoint)
+
+    # ---- validación ------------------------------------------------------------------
+
+    def _resolver_proveedores(self, nombres):
+        faltantes = {n for n in nombres if n and n not in self._proveedores}
+        if faltantes:
+            for pk, nombre in Proveedor.objects.filter(nombre__in=faltantes).values_list('pk', 'nombre'):
+                self._proveedores[nombre] = pk
+            nuevos = faltantes - set(self._proveedores)
+            if nuevos and self.crear_proveedores and not self.simulacion:
+                Proveedor.objects.bulk_create([Proveedor(nombre=n) for n in nuevos], ignore_conflicts=True)
+                for pk, nombre in Proveedor.objects.filter(nombre__in=nuevos).values_list('pk', 'nombre'):
+                    self._proveedores[nombre] = pk
+            elif nuevos and self.crear_proveedores:
+                for n in nuevos:
+                    self._proveedores[n] = None  # se crearía
+
+    def _existentes(self, valores_por_campo):
+        existentes = {}
+        for campo, valores in valores_por_campo.items():
+            valores = [v for v in valores if v]
+            if campo == 'codigo_identificador':
+                qs = CodigoProducto.objects.filter(clave__in=valores).values_list('clave', flat=True)
+            else:
+                qs = Producto.objects.filter(**{f'{campo}__in': valores}).values_list(campo, flat=True)
+            existentes[campo] = set(qs) if valores else set()
+        return existentes
+
+    def _validar_bloque(self, bloque):
+        validos = []
+        formularios = []
+        for numero, fila in bloque:
+            form = ProductoImportForm(data={**self._defaults, **fila}, user=self.usuario)
+            formularios.append((numero, fila, form))
+        self._resolver_proveedores({str(fila.get('proveedor') or '').strip() for _, fila, _ in formularios})
+
+        candidatos = {campo: set() for campo in CAMPOS_UNICOS}
+        for _, _, form in formularios:
+            if form.is_valid():
+                for campo in CAMPOS_UNICOS:
+                    candidatos[campo].add(_valor_unico(campo, form.cleaned_data.get(campo)))
+        existentes = self._existentes(candidatos)
+
+        for numero, fila, form in formularios:
+            self.resultado.leidas += 1
+            if not form.is_valid():
+                self.resultado.agregar_error(
+                    numero, [f'{campo}: {" ".join(msgs)}' for campo, msgs in form.errors.items()]
+                )
+                continue
+            errores = []
+            for campo in CAMPOS_UNICOS:
+                valor = form.cleaned_data.get(campo)
+                if not valor:
+                    continue
+                unico = _valor_unico(campo, valor)
+                if unico in existentes[campo]:
+                    errores.append(f'{campo}: "{valor}" ya existe.')
+                elif unico in self._vistos[campo]:
+                    errores.append(f'{campo}: "{valor}" está repetido en el archivo.')
+            proveedor = str(fila.get('proveedor') or '').strip()
+            if proveedor and proveedor not in self._proveedores:
+                errores.append(f'proveedor: "{proveedor}" no existe.')
+            if errores:
+                self.resultado.agregar_error(numero, errores)
+                continue
+            for campo in CAMPOS_UNICOS:
+                if form.cleaned_data.get(campo):
+                    self._vistos[campo].add(_valor_unico(campo, form.cleaned_data[campo]))
+
+            producto = form.save(commit=False)
+            producto.proveedor_principal_id = self._proveedores.get(proveedor) if proveedor else None
+            producto.created_by = self.usuario
+            producto.updated_by = self.usuario
+            producto.stock_actual = producto.cantidad_inicial or 0
+            producto.actualizar_precio_vigente()  # bulk_create no pasa por save()
+            validos.append(producto)
+        self.resultado.validas += len(validos)
+        return validos
+
+    # ---- escritura -------------------------------------------------------------------
+
+    def _insertar(self, productos):
+        using = router.db_for_write(Producto)
+        with transaction.atomic(using=using):
+            creados = Producto.objects.using(using).bulk_create(productos)
+            if not connections[using].features.can_return_rows_from_bulk_insert:
+                ids = dict(
+                    Producto.objects.using(using).filter(sku__in=[p.sku for p in productos])
+                    .values_list('sku', 'pk')
+                )
+                for p in creados:
+                    p.pk = ids[p.sku]
+            CodigoProducto.objects.using(using).bulk_create([
+                CodigoProducto.de(p.pk, p.codigo_identificador) for p in creados if p.codigo_identificador
+            ])
+            # el stock inicial queda en el libro de movimientos (y en la ubicación principal),
+            # igual que en el alta manual
+            con_stock = [p for p in creados if p.stock_actual > 0]
+            ubicaciones = Ubicacion.ids_por_codigo([p.ubicacion_principal for p in con_stock], using)
+            MovimientoStock.objects.using(using).bulk_create([
+                MovimientoStock(
+                    producto_id=p.pk, tipo=MovimientoStock.TipoMovimiento.ENTRADA,
+                    cantidad=p.stock_actual, motivo='Alta de producto (importación)',
+                    usuario=self.usuario, lote=self.resultado.lote,
+                    ubicacion_destino_id=ubicaciones[codigo_ubicacion(p.ubicacion_principal)],
+                )
+                for p in con_stock
+            ])
+            ExistenciaUbicacion.objects.using(using).bulk_create([
+                ExistenciaUbicacion(
+                    producto_id=p.pk, ubicacion_id=ubicaciones[codigo_ubicacion(p.ubicacion_principal)],
+                    cantidad=p.stock_actual,
+                )
+                for p in con_stock
+            ])
+            sincronizar_alertas([p.pk for p in creados], using=using)
+            valuar_productos(creados, 1, using)
+        return len(creados)
+
+    def importar(self, filas):
+        desde_fila = self._leer_checkpoint()
+        for bloque in _bloques(filas, self.tamano_bloque, desde_fila):
+            productos = self._validar_bloque(bloque)
+            if productos and not self.simulacion:
+                self.resultado.creadas += self._insertar(productos)
+            self._guardar_checkpoint(bloque[-1][0])
+        # terminado: otra ejecución sobre el mismo archivo empieza desde el principio
+        self._borrar_checkpoint()
+        self.resultado.omitidas = max(desde_fila - 1, 0)
+        return self.resultado
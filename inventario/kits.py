@@ -0,0 +1,208 @@
+"""
+Kits: lista de materiales (``ComponenteKit``) y disponibilidad calculada.
+
+- ``disponibles(ids)``: cuántas unidades de cada kit se pueden armar con el stock
+  disponible de sus componentes (contadores fragmentados incluidos, reservas descontadas):
+  el mínimo de ``stock // cantidad`` sobre los componentes finales, con los kits anidados
+  ya expandidos. Una sola consulta para todos los kits pedidos; el resultado queda en
+  caché por kit.
+- Un movimiento o una reserva de un componente (señal ``stock_cambiado``) borra, al
+  confirmar la transacción, la entrada de cada kit que lo contiene directa o
+  indirectamente. Cualquier cambio en una lista de materiales invalida todas las entradas
+  (versión global).
+- ``vender_kit``: un solo ``registrar_lote`` con la salida de cada componente; si falta
+  stock de alguno (``StockInsuficiente``) no se registra nada.
+- ``registrar_lote``: ``MovimientoStock.registrar_lote`` para listas que pueden traer kits
+  (lotes, escaneo): la salida de un kit es la de sus componentes, sin negativos, como en
+  ``vender_kit``; la entrada de un kit se rechaza.
+
+Configuración opcional en settings::
+
+    INVENTARIO_KITS_CACHE = 'default'  # alias de CACHES
+    INVENTARIO_KITS_TTL = 300          # segundos
+"""
+import time
+import uuid
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.exceptions import ValidationError
+from django.db import router, transaction
+
+from .models import ComponenteKit, MovimientoStock, Producto
+
+VERSION_KEY = 'inventario:kits:version'
+
+
+def _cache():
+    return caches[getattr(settings, 'INVENTARIO_KITS_CACHE', 'default')]
+
+
+def _ttl():
+    return getattr(settings, 'INVENTARIO_KITS_TTL', 300)
+
+
+def _version(cache):
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        cache.add(VERSION_KEY, time.time_ns(), None)
+        version = cache.get(VERSION_KEY)
+    return version
+
+
+def _clave(version, kit_id):
+    return f'inventario:kits:{version}:disponible:{kit_id}'
+
+
+def lista_materiales(version=None):
+    """``{kit_id: ((componente_id, cantidad), ...)}`` de todos los kits, en caché."""
+    cache = _cache()
+    clave = f'inventario:kits:{_version(cache) if version is None else version}:bom'
+    bom = cache.get(clave)
+    if bom is None:
+        bom = {}
+        for kit_id, componente_id, cantidad in ComponenteKit.objects.values_list('kit_id', 'componente_id', 'cantidad'):
+            bom.setdefault(kit_id, []).append((componente_id, cantidad))
+        bom = {kit_id: tuple(filas) for kit_id, filas in bom.items()}
+        cache.set(clave, bom, _ttl())
+    return bom
+
+
+def requerimientos(kit_id, bom=None):
+    """``{componente_id: unidades}`` de componentes finales para armar un kit (``{}`` si no tiene)."""
+    bom = lista_materiales() if bom is None else bom
+    total = {}
+
+    def expandir(producto_id, factor, camino):
+        for componente_id, cantidad in bom.get(producto_id, ()):
+            if componente_id in camino:
+                raise ValidationError(f'La lista de materiales del kit {kit_id} es circular.')
+            if componente_id in bom:
+                expandir(componente_id, factor * cantidad, camino | {componente_id})
+            else:
+                total[componente_id] = total.get(componente_id, 0) + factor * cantidad
+
+    expandir(kit_id, 1, frozenset({kit_id}))
+    return total
+
+
+def disponibles(ids):
+    """``{kit_id: unidades armables}`` de los kits de ``ids`` que tienen componentes."""
+    cache = _cache()
+    version = _version(cache)
+    claves = {pk: _clave(version, pk) for pk in set(ids)}
+    en_cache = cache.get_many(claves.values())
+    resultado = {pk: en_cache[clave] for pk, clave in claves.items() if clave in en_cache}
+    faltan = set(claves) - set(resultado)
+    if not faltan:
+        return resultado
+
+    bom = lista_materiales(version)
+    necesarios = {pk: requerimientos(pk, bom) for pk in faltan if pk in bom}
+    componentes = set().union(*necesarios.values())
+    stock = {
+        pk: total - reservado
+        for pk, total, reservado in Producto.objects.filter(pk__in=componentes).con_stock_total()
+        .values_list('pk', 'stock_total', 'stock_reservado')
+    } if componentes else {}
+    nuevos = {
+        pk: min(max(stock.get(componente_id) or 0, 0) // cantidad for componente_id, cantidad in filas.items())
+        for pk, filas in necesarios.items()
+    }
+    cache.set_many({claves[pk]: n for pk, n in nuevos.items()}, _ttl())
+    resultado.update(nuevos)
+    return resultado
+
+
+def con_componentes(ids):
+    """Los de ``ids`` que son kits con lista de materiales (su stock es el de sus componentes)."""
+    bom = lista_materiales()
+    return {pk for pk in ids if pk in bom}
+
+
+def kits_de(ids, bom):
+    """Ids de los kits que contienen (directa o indirectamente) a alguno de ``ids``."""
+    padres = {}
+    for kit_id, filas in bom.items():
+        for componente_id, _ in filas:
+            padres.setdefault(componente_id, set()).add(kit_id)
+    afectados, nivel = set(), set(ids)
+    while nivel:
+        nivel = set().union(*(padres.get(pk, ()) for pk in nivel)) - afectados
+        afectados |= nivel
+    return afectados
+
+
+def invalidar_componentes(ids):
+    """Borra la disponibilidad en caché de los kits que usan los productos ``ids``."""
+    cache = _cache()
+    version = _version(cache)
+    kits = kits_de(ids, lista_materiales(version))
+    if kits:
+        cache.delete_many([_clave(version, pk) for pk in kits])
+
+
+def invalidar_todo():
+    """Invalida la lista de materiales y toda la disponibilidad en caché."""
+    cache = _cache()
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        _version(cache)
+
+
+def vender_kit(kit, cantidad, usuario=None, ip=None, motivo=None, ubicacion=None):
+    """
+    Registra la salida de los componentes de ``cantidad`` kits en un solo lote (mismo
+    ``lote`` en todos los movimientos). Nunca deja un componente en negativo.
+    """
+    if cantidad <= 0:
+        raise ValidationError('La cantidad a vender debe ser mayor que cero.')
+    necesarios = requerimientos(kit.pk)
+    if not necesarios:
+        raise ValidationError(f'El kit {kit} no tiene componentes.')
+    return MovimientoStock.registrar_lote(
+        [(pk, -n * cantidad, MovimientoStock.TipoMovimiento.SALIDA) for pk, n in sorted(necesarios.items())],
+        usuario=usuario, ip=ip, motivo=motivo or f'Venta de kit {kit.sku}', permitir_negativo=False,
+        ubicacion=ubicacion,
+    )
+
+
+def registrar_lote(items, usuario=None, ip=None, motivo=None, lote=None):
+    """
+    ``MovimientoStock.registrar_lote`` de ``items`` (``(producto, cantidad_signed)``) donde
+    puede haber kits: la salida de un kit con componentes se registra como salida de sus
+    componentes, que no pueden quedar en negativo; la entrada de un kit es un
+    ``ValidationError``. Todo en una transacción y con el mismo ``lote``.
+    """
+    bom = lista_materiales()
+    simples, componentes = [], {}
+    for producto, cantidad in items:
+        pk = getattr(producto, 'pk', producto)
+        if pk not in bom:
+            simples.append((producto, cantidad))
+        elif cantidad > 0:
+            raise ValidationError(
+                f'{producto} es un kit: su stock se calcula con sus componentes; registra la entrada de ellos.'
+            )
+        else:
+            for componente_id, n in requerimientos(pk, bom).items():
+                componentes[componente_id] = componentes.get(componente_id, 0) + n * cantidad
+    if not componentes:
+        return MovimientoStock.registrar_lote(simples, usuario, ip, motivo, lote=lote)
+
+    lote = lote or uuid.uuid4()
+    using = router.db_for_write(MovimientoStock)
+    with transaction.atomic(using=using):
+        # dos registrar_lote en la misma transacción: se bloquean todos los productos antes,
+        # en orden de id, como hace cada uno por separado (sin deadlocks con otros lotes)
+        ids = {getattr(producto, 'pk', producto) for producto, _ in simples} | set(componentes)
+        list(
+            Producto.objects.using(using).select_for_update()
+            .filter(pk__in=ids).order_by('pk').values_list('pk', flat=True)
+        )
+        movimientos = MovimientoStock.registrar_lote(simples, usuario, ip, motivo, lote=lote)
+        return movimientos + MovimientoStock.registrar_lote(
+            [(pk, n, MovimientoStock.TipoMovimiento.SALIDA) for pk, n in sorted(componentes.items())],
+            usuario, ip, motivo, permitir_negativo=False, lote=lote,
+        )
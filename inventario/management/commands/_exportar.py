@@ -0,0 +1,58 @@
+import sys
+
+from django.core.management.base import BaseCommand
+
+from inventario import exportar
+from inventario.replicas import en_replica
+
+from ._fechas import parse_momento
+
+
+class ComandoExportar(BaseCommand):
+    """Base de exportar_productos / exportar_movimientos."""
+    queryset = None  # QuerySet base; los filtros se aplican con exportar.filtrar
+    columnas = None
+
+    def add_arguments(self, parser):
+        parser.add_argument('--formato', choices=sorted(exportar.FORMATOS), default='csv')
+        parser.add_argument('--gzip', action='store_true')
+        parser.add_argument('--salida', help='Ruta del archivo; por defecto la salida estándar.')
+        parser.add_argument('--desde', help='AAAA-MM-DD (inclusive) o instante exacto.')
+        parser.add_argument('--hasta', help='AAAA-MM-DD (inclusive) o instante exacto.')
+        parser.add_argument('--proveedor', type=int, help='id del proveedor.')
+        parser.add_argument('--tipo')
+        parser.add_argument('--chunk', type=int, default=exportar.CHUNK)
+
+    def get_queryset(self, **filtros):
+        return exportar.filtrar(self.queryset.all(), **filtros)
+
+    def handle(self, *args, **options):
+        with en_replica():
+            self.exportar(options)
+
+    def exportar(self, options):
+        filtros = {
+            'desde': parse_momento(options['desde']) if options['desde'] else None,
+            'hasta': parse_momento(options['hasta'], fin_de_dia=True) if options['hasta'] else None,
+            'proveedor': options['proveedor'],
+            'tipo': options['tipo'],
+        }
+        contenido = exportar.stream(
+            self.get_queryset(**filtros), self.columnas,
+            options['formato'], options['gzip'], options['chunk'],
+        )
+        if options['salida']:
+            if options['gzip']:
+                f = open(options['salida'], 'wb')
+            else:
+                f = open(options['salida'], 'w', encoding='utf-8', newline='')
+            with f:
+                for parte in contenido:
+                    f.write(parte)
+        elif options['gzip']:
+            for parte in contenido:
+                sys.stdout.buffer.write(parte)
+            sys.stdout.buffer.flush()
+        else:
+            for parte in contenido:
+                self.stdout.write(parte, ending='')
@@ -0,0 +1,24 @@
+import datetime
+
+from django.core.management.base import CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+
+def parse_momento(valor, fin_de_dia=False):
+    """
+    Acepta 'AAAA-MM-DD' o 'AAAA-MM-DD HH:MM[:SS]' en la zona horaria local.
+    Una fecha sola es el inicio del día, o el inicio del día siguiente con ``fin_de_dia``
+    (es decir, incluye todo ese día).
+    """
+    momento = parse_datetime(valor)
+    if momento is None:
+        fecha = parse_date(valor)
+        if fecha is None:
+            raise CommandError(f'Fecha inválida: {valor!r}')
+        if fin_de_dia:
+            fecha += datetime.timedelta(days=1)
+        momento = datetime.datetime.combine(fecha, datetime.time.min)
+    if timezone.is_naive(momento):
+        momento = timezone.make_aware(momento)
+    return momento
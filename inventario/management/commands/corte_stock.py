@@ -0,0 +1,30 @@
+import datetime
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from inventario.historico import generar_cortes
+
+from ._fechas import parse_momento
+
+
+class Command(BaseCommand):
+    help = (
+        'Genera el corte diario de stock por producto (StockSnapshot). '
+        'Por defecto el corte es la medianoche local de hoy (cierre de ayer).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--fecha', help='Día a cerrar (AAAA-MM-DD) o instante exacto del corte.')
+        parser.add_argument('--completo', action='store_true',
+                            help='Incluye todos los productos, no solo los modificados desde el corte anterior.')
+        parser.add_argument('--bloque', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        if options['fecha']:
+            corte = parse_momento(options['fecha'], fin_de_dia=True)
+        else:
+            hoy = timezone.localdate()
+            corte = timezone.make_aware(datetime.datetime.combine(hoy, datetime.time.min))
+        escritos = generar_cortes(corte, completo=options['completo'], tamano_bloque=options['bloque'])
+        self.stdout.write(self.style.SUCCESS(f'Corte {corte.isoformat()}: {escritos} producto(s).'))
@@ -0,0 +1,10 @@
+from inventario import exportar
+from inventario.models import MovimientoStock
+
+from ._exportar import ComandoExportar
+
+
+class Command(ComandoExportar):
+    help = 'Exporta movimientos de stock (CSV / JSONL, opcionalmente gzip) en streaming.'
+    queryset = MovimientoStock.objects.all()
+    columnas = exportar.COLUMNAS_MOVIMIENTO
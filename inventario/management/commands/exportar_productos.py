@@ -0,0 +1,10 @@
+from inventario import exportar
+from inventario.models import Producto
+
+from ._exportar import ComandoExportar
+
+
+class Command(ComandoExportar):
+    help = 'Exporta productos (CSV / JSONL, opcionalmente gzip) en streaming.'
+    queryset = Producto.objects.con_stock_total()
+    columnas = exportar.COLUMNAS_PRODUCTO + exportar.COLUMNAS_PRODUCTO_SENSIBLES
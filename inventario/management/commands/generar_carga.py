@@ -0,0 +1,46 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from inventario import carga
+from inventario.models import Producto
+
+
+class Command(BaseCommand):
+    help = (
+        'Genera datos de carga deterministas (proveedores, usuarios, productos y movimientos) '
+        'con bulk_create, para medir el rendimiento con medir_rendimiento.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--productos', type=int, default=1_000_000)
+        parser.add_argument('--movimientos', type=int, default=10_000_000)
+        parser.add_argument('--usuarios', type=int, default=5000)
+        parser.add_argument('--proveedores', type=int, default=200)
+        parser.add_argument('--semilla', type=int, default=42)
+        parser.add_argument('--prefijo', default='CARGA',
+                            help='Prefijo de SKU / usuario / proveedor de los datos generados.')
+        parser.add_argument('--bloque', type=int, default=5000, help='Productos por transacción.')
+        parser.add_argument('--limpiar', action='store_true',
+                            help='Borra antes los datos generados con el mismo prefijo.')
+        parser.add_argument('--solo-limpiar', action='store_true')
+
+    def handle(self, *args, **options):
+        prefijo = options['prefijo']
+        if options['limpiar'] or options['solo_limpiar']:
+            borrados = carga.limpiar(prefijo, options['bloque'])
+            self.stdout.write(f'{borrados} producto(s) de carga borrados.')
+            if options['solo_limpiar']:
+                return
+        if Producto.objects.filter(sku__startswith=f'{prefijo}-').exists():
+            raise CommandError(f'Ya hay datos con el prefijo {prefijo}; usa --limpiar.')
+
+        def progreso(modelo, hechos, total):
+            if options['verbosity'] >= 2 or hechos == total:
+                self.stdout.write(f'{modelo}: {hechos}/{total}')
+
+        totales = carga.generar(
+            options['productos'], options['movimientos'], options['usuarios'], options['proveedores'],
+            semilla=options['semilla'], prefijo=prefijo, bloque=options['bloque'], progreso=progreso,
+        )
+        self.stdout.write(self.style.SUCCESS(
+            ', '.join(f'{n} {modelo}' for modelo, n in totales.items()) + ' generados.'
+        ))
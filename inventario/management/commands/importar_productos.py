@@ -0,0 +1,54 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from inventario.importar import ErrorImportacion, ImportadorProductos, TAMANO_BLOQUE, huella_archivo, leer_filas
+
+
+class Command(BaseCommand):
+    help = 'Importa productos desde un CSV o XLSX (validación por bloques, bulk_create, reanudable).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('archivo')
+        parser.add_argument('--simulacion', action='store_true', help='Solo valida y reporta; no escribe.')
+        parser.add_argument('--crear-proveedores', action='store_true')
+        parser.add_argument('--usuario', help='username que queda como created_by.')
+        parser.add_argument('--bloque', type=int, default=TAMANO_BLOQUE)
+        parser.add_argument('--checkpoint', help='Archivo de avance (por defecto <archivo>.checkpoint.json).')
+        parser.add_argument('--sin-checkpoint', action='store_true')
+        parser.add_argument('--max-errores', type=int, default=50, help='Errores a listar en el reporte.')
+
+    def handle(self, *args, **options):
+        usuario = None
+        if options['usuario']:
+            try:
+                usuario = get_user_model().objects.get(username=options['usuario'])
+            except get_user_model().DoesNotExist:
+                raise CommandError(f'No existe el usuario {options["usuario"]!r}.')
+
+        checkpoint = origen = None
+        if not options['sin_checkpoint'] and not options['simulacion']:
+            checkpoint = options['checkpoint'] or f'{options["archivo"]}.checkpoint.json'
+            try:
+                origen = huella_archivo(options['archivo'])
+            except OSError as exc:
+                raise CommandError(str(exc))
+
+        importador = ImportadorProductos(
+            usuario=usuario,
+            simulacion=options['simulacion'],
+            crear_proveedores=options['crear_proveedores'],
+            tamano_bloque=options['bloque'],
+            checkpoint=checkpoint,
+            origen=origen,
+        )
+        try:
+            resultado = importador.importar(leer_filas(options['archivo'], options['archivo']))
+        except (ErrorImportacion, OSError) as exc:
+            raise CommandError(str(exc))
+
+        for fila, mensajes in resultado.errores[:options['max_errores']]:
+            self.stdout.write(f'Fila {fila}: ' + '; '.join(mensajes))
+        if len(resultado.errores) > options['max_errores']:
+            self.stdout.write(f'... y {len(resultado.errores) - options["max_errores"]} fila(s) más con error.')
+        estilo = self.style.WARNING if resultado.errores else self.style.SUCCESS
+        self.stdout.write(estilo(resultado.resumen()))
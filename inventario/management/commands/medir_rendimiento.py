@@ -0,0 +1,84 @@
+import json
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+
+from inventario import rendimiento
+
+
+class Command(BaseCommand):
+    help = (
+        'Mide p50/p95/p99 y consultas SQL de búsqueda, escaneo, ajuste de stock y listados del '
+        'admin. Escribe el resultado en JSON y opcionalmente lo compara con una corrida base.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--escenarios', help=f'Separados por coma; por defecto todos: '
+                                                 f'{", ".join(rendimiento.ESCENARIOS)}.')
+        parser.add_argument('--repeticiones', type=int, default=30)
+        parser.add_argument('--calentamiento', type=int, default=3)
+        parser.add_argument('--semilla', type=int, default=42)
+        parser.add_argument('--usuario', help='username con el que se hacen las peticiones; '
+                                              'por defecto el primer superusuario.')
+        parser.add_argument('--host', help='Host de las peticiones; por defecto el primero de ALLOWED_HOSTS.')
+        parser.add_argument('--salida', default='rendimiento.json')
+        parser.add_argument('--base', help='JSON de una corrida anterior para comparar.')
+        parser.add_argument('--tolerancia', type=float, default=20.0,
+                            help='Porcentaje de aumento de latencia tolerado frente a la base.')
+        parser.add_argument('--fallar-si-empeora', action='store_true',
+                            help='Termina con error si hay regresiones frente a la base.')
+
+    def handle(self, *args, **options):
+        escenarios = list(rendimiento.ESCENARIOS)
+        if options['escenarios']:
+            escenarios = [e.strip() for e in options['escenarios'].split(',') if e.strip()]
+            desconocidos = set(escenarios) - set(rendimiento.ESCENARIOS)
+            if desconocidos:
+                raise CommandError(f'Escenarios desconocidos: {", ".join(sorted(desconocidos))}.')
+        if options['repeticiones'] < 1:
+            raise CommandError('--repeticiones debe ser al menos 1.')
+
+        User = get_user_model()
+        if options['usuario']:
+            usuario = User.objects.filter(username=options['usuario']).first()
+        else:
+            usuario = User.objects.filter(is_superuser=True, is_active=True).order_by('pk').first()
+        if usuario is None:
+            raise CommandError('No hay usuario para las peticiones (crea un superusuario o usa --usuario).')
+
+        host = options['host'] or next((h for h in settings.ALLOWED_HOSTS if h and '*' not in h), 'localhost')
+        cliente = Client(HTTP_HOST=host.lstrip('.'))
+        cliente.force_login(usuario)
+
+        def progreso(nombre, medido):
+            if medido is None:
+                self.stdout.write(f'{nombre}: omitido (no hay productos)')
+            else:
+                self.stdout.write(
+                    f'{nombre}: p50={medido["p50_ms"]} ms p95={medido["p95_ms"]} ms '
+                    f'consultas={medido["consultas_p50"]} (máx {medido["consultas_max"]}) '
+                    f'estados={medido["estados"]}'
+                )
+
+        resultado = rendimiento.resultado(
+            cliente, escenarios, options['repeticiones'], options['calentamiento'],
+            options['semilla'], progreso,
+        )
+        with open(options['salida'], 'w', encoding='utf-8') as f:
+            json.dump(resultado, f, ensure_ascii=False, indent=2)
+        self.stdout.write(self.style.SUCCESS(f'Resultado en {options["salida"]}.'))
+
+        if not options['base']:
+            return
+        with open(options['base'], encoding='utf-8') as f:
+            base = json.load(f)
+        regresiones = rendimiento.comparar(resultado, base, options['tolerancia'] / 100)
+        if not regresiones:
+            self.stdout.write(self.style.SUCCESS('Sin regresiones frente a la base.'))
+            return
+        for nombre, metrica, antes, ahora in regresiones:
+            self.stdout.write(self.style.WARNING(f'{nombre} {metrica}: {antes} -> {ahora}'))
+        if options['fallar_si_empeora']:
+            raise CommandError(f'{len(regresiones)} regresión(es) frente a la base.')
@@ -0,0 +1,60 @@
+from django.conf import settings
+from django.core.mail import mail_managers, send_mail
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from inventario.models import AlertaStock, sincronizar_alertas
+
+
+class Command(BaseCommand):
+    help = (
+        'Envía por correo los productos en o bajo su punto de reorden que aún no se notificaron '
+        '(AlertaStock). Destinatarios: INVENTARIO_ALERTAS_DESTINATARIOS o, si no está, MANAGERS.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--todas', action='store_true', help='Incluye las alertas ya notificadas.')
+        parser.add_argument('--simular', action='store_true', help='Muestra el correo sin enviarlo ni marcar.')
+        parser.add_argument('--reconstruir', action='store_true',
+                            help='Recalcula antes la tabla de alertas recorriendo todos los productos.')
+
+    def handle(self, *args, **options):
+        if options['reconstruir']:
+            sincronizar_alertas()
+
+        alertas = AlertaStock.objects.select_related('producto', 'producto__proveedor_principal').order_by(
+            'producto__proveedor_principal__nombre', 'producto__nombre', 'pk'
+        )
+        if not options['todas']:
+            alertas = alertas.filter(notificada_en__isnull=True)
+        alertas = list(alertas)
+        if not alertas:
+            self.stdout.write('Sin alertas por notificar.')
+            return
+
+        lineas = []
+        proveedor_actual = object()
+        for alerta in alertas:
+            p = alerta.producto
+            proveedor = p.proveedor_principal.nombre if p.proveedor_principal else 'Sin proveedor'
+            if proveedor != proveedor_actual:
+                lineas.append(f'\n{proveedor}')
+                proveedor_actual = proveedor
+            lineas.append(
+                f'  - {p.sku} {p.nombre}: stock {p.stock_actual}, punto de reorden {p.punto_reorden} '
+                f'(desde {timezone.localtime(alerta.desde):%Y-%m-%d %H:%M})'
+            )
+        asunto = f'{len(alertas)} producto(s) bajo punto de reorden'
+        cuerpo = 'Productos en o bajo su punto de reorden:\n' + '\n'.join(lineas) + '\n'
+
+        if options['simular']:
+            self.stdout.write(asunto + '\n' + cuerpo)
+            return
+
+        destinatarios = getattr(settings, 'INVENTARIO_ALERTAS_DESTINATARIOS', None)
+        if destinatarios:
+            send_mail(asunto, cuerpo, None, destinatarios)
+        else:
+            mail_managers(asunto, cuerpo)
+        AlertaStock.objects.filter(pk__in=[a.pk for a in alertas]).update(notificada_en=timezone.now())
+        self.stdout.write(self.style.SUCCESS(f'{asunto}: notificado.'))
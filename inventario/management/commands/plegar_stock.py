@@ -0,0 +1,26 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from inventario.models import plegar_fragmentos
+
+
+class Command(BaseCommand):
+    help = (
+        'Pliega los contadores fragmentados (FragmentoStock) de los productos con '
+        'fragmentos_stock > 1 en stock_actual y en las existencias por ubicación.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--intervalo', type=float, default=5.0, help='Segundos entre pasadas.')
+        parser.add_argument('--una-vez', action='store_true', help='Una sola pasada y termina (cron).')
+
+    def handle(self, *args, **options):
+        while True:
+            plegados = plegar_fragmentos()
+            if plegados and options['verbosity'] > 1:
+                self.stdout.write(f'{plegados} producto(s) plegado(s).')
+            if options['una_vez']:
+                self.stdout.write(self.style.SUCCESS(f'{plegados} producto(s) plegado(s).'))
+                return
+            time.sleep(options['intervalo'])
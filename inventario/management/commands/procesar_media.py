@@ -0,0 +1,50 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+
+from inventario import media
+
+
+class Command(BaseCommand):
+    help = (
+        'Worker de la cola de subidas (TrabajoMedia): sube los archivos pendientes al storage '
+        'remoto en paralelo, con reintentos, y actualiza la referencia en el objeto.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hilos', type=int, default=4, help='Subidas simultáneas.')
+        parser.add_argument('--lote', type=int, default=20, help='Trabajos tomados por vuelta.')
+        parser.add_argument('--intervalo', type=float, default=2.0,
+                            help='Segundos de espera cuando la cola está vacía.')
+        parser.add_argument('--max-intentos', type=int, default=5)
+        parser.add_argument('--espera-base', type=int, default=30,
+                            help='Segundos antes del primer reintento (se duplica en cada fallo).')
+        parser.add_argument('--purgar-dias', type=int, default=7,
+                            help='Borra los trabajos completados hace más de N días (0 = no purgar).')
+        parser.add_argument('--una-vez', action='store_true', help='Vacía la cola disponible y termina.')
+
+    def handle(self, *args, **options):
+        if options['purgar_dias']:
+            purgados = media.purgar(options['purgar_dias'])
+            if purgados:
+                self.stdout.write(f'{purgados} trabajo(s) completado(s) purgado(s).')
+
+        opciones = {'max_intentos': options['max_intentos'], 'espera_base': options['espera_base']}
+        completados = fallidos = 0
+        with ThreadPoolExecutor(max_workers=options['hilos']) as pool:
+            while True:
+                tomados = media.tomar(options['lote'])
+                if not tomados:
+                    # con --una-vez los reintentos (disponible_en futuro) quedan para la próxima corrida
+                    if options['una_vez']:
+                        break
+                    time.sleep(options['intervalo'])
+                    continue
+                for ok in pool.map(lambda pk: media.procesar_en_hilo(pk, **opciones), tomados):
+                    if ok:
+                        completados += 1
+                    else:
+                        fallidos += 1
+                self.stdout.write(f'{completados} completado(s), {fallidos} fallo(s).')
+        self.stdout.write(self.style.SUCCESS(f'Cola vacía: {completados} completado(s), {fallidos} fallo(s).'))
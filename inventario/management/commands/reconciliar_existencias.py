@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+
+from inventario.ubicaciones import corregir, diferencias
+
+
+class Command(BaseCommand):
+    help = (
+        'Compara Producto.stock_actual con la suma de sus existencias por ubicación y, salvo '
+        '--solo-reportar, lleva la diferencia a la ubicación principal de cada producto.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--solo-reportar', action='store_true', help='No modifica las existencias.')
+
+    def handle(self, *args, **options):
+        filas = diferencias()
+        if not filas:
+            self.stdout.write(self.style.SUCCESS('Existencias cuadradas con el stock de cada producto.'))
+            return
+        for pk, codigo, stock, en_ubicaciones in filas[:50]:
+            self.stdout.write(f'producto={pk} ubicacion={codigo}: stock_actual={stock} en ubicaciones={en_ubicaciones}')
+        if len(filas) > 50:
+            self.stdout.write(f'... y {len(filas) - 50} más.')
+        if not options['solo_reportar']:
+            corregir(filas)
+        accion = 'reportado(s)' if options['solo_reportar'] else 'corregido(s)'
+        self.stdout.write(self.style.WARNING(f'{len(filas)} producto(s) con diferencia, {accion}.'))
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from inventario.valuacion import reconstruir
+
+
+class Command(BaseCommand):
+    help = (
+        'Recalcula la valuación de inventario desde Producto, reporta las diferencias con la '
+        'tabla mantenida por deltas (ValuacionInventario) y la corrige.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--solo-reportar', action='store_true', help='No modifica la tabla.')
+
+    def handle(self, *args, **options):
+        diferencias = reconstruir(corregir=not options['solo_reportar'])
+        if not diferencias:
+            self.stdout.write(self.style.SUCCESS('Valuación sin deriva.'))
+            return
+        for (proveedor, tipo, estado), guardado, esperado in diferencias:
+            self.stdout.write(
+                f'proveedor={proveedor or "-"} tipo={tipo} estado={estado}: '
+                f'guardado (productos, unidades, valor)={guardado} esperado={esperado}'
+            )
+        accion = 'reportada' if options['solo_reportar'] else 'corregida'
+        self.stdout.write(self.style.WARNING(f'{len(diferencias)} clave(s) con deriva, {accion}.'))
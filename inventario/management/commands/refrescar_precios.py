@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from inventario.models import Producto
+
+
+class Command(BaseCommand):
+    help = (
+        'Actualiza Producto.precio_vigente de los productos cuya oferta abrió o cerró desde la '
+        'última corrida. Programar cada pocos minutos (cron / scheduler).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--completo', action='store_true',
+                            help='Recalcula todos los productos (p. ej. tras una carga con update()).')
+
+    def handle(self, *args, **options):
+        n = Producto.objects.refrescar_precios(completo=options['completo'])
+        self.stdout.write(self.style.SUCCESS(f'{n} producto(s) con precio vigente actualizado.'))
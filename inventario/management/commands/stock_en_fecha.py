@@ -0,0 +1,29 @@
+import csv
+
+from django.core.management.base import BaseCommand
+
+from inventario.historico import stock_en_todos
+from inventario.models import Producto
+from inventario.replicas import en_replica
+
+from ._fechas import parse_momento
+
+
+class Command(BaseCommand):
+    help = 'Reporte CSV del stock de todos los productos a una fecha (fin del día indicado).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('fecha', help='AAAA-MM-DD (cierre del día) o instante exacto.')
+        parser.add_argument('--chunk', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        momento = parse_momento(options['fecha'], fin_de_dia=True)
+        filas = (
+            stock_en_todos(momento, Producto.objects.order_by('pk'))
+            .values_list('sku', 'nombre', 'stock_en_fecha')
+            .iterator(chunk_size=options['chunk'])
+        )
+        writer = csv.writer(self.stdout)
+        writer.writerow(['sku', 'nombre', f'stock_{momento:%Y-%m-%d}'])
+        with en_replica():
+            writer.writerows(filas)
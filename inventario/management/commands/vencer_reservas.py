@@ -0,0 +1,26 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from inventario.reservas import vencer
+
+
+class Command(BaseCommand):
+    help = (
+        'Vence en bloque las reservas activas cuyo plazo ya pasó y devuelve sus unidades '
+        'a lo disponible (Producto.stock_reservado).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--intervalo', type=float, default=30.0, help='Segundos entre pasadas.')
+        parser.add_argument('--una-vez', action='store_true', help='Una sola pasada y termina (cron).')
+
+    def handle(self, *args, **options):
+        while True:
+            vencidas = vencer()
+            if vencidas and options['verbosity'] > 1:
+                self.stdout.write(f'{vencidas} reserva(s) vencida(s).')
+            if options['una_vez']:
+                self.stdout.write(self.style.SUCCESS(f'{vencidas} reserva(s) vencida(s).'))
+                return
+            time.sleep(options['intervalo'])
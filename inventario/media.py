@@ -0,0 +1,161 @@
+"""
+Cola de subidas diferidas al storage remoto (Cloudinary).
+
+La petición no espera la subida:
+
+1. Antes de ``save()`` el formulario llama ``diferir(instancia, *campos)``. Cada archivo nuevo
+   se lee en memoria y el campo queda con el nombre provisional ``pendiente/<nombre final>``.
+2. Después de ``save()`` ``encolar(instancia, diferidos)`` crea un ``TrabajoMedia`` por archivo,
+   en la misma transacción que el objeto.
+3. ``manage.py procesar_media`` (proceso ``worker`` del Procfile) toma los trabajos, los sube en
+   paralelo con reintentos y cambia la referencia al nombre definitivo, solo si el campo sigue
+   apuntando al provisional.
+
+Configuración opcional en settings::
+
+    INVENTARIO_MEDIA_ASINCRONA = True    # False: subida síncrona, como antes
+    INVENTARIO_MEDIA_STORAGE = None      # alias de STORAGES que reemplaza al del campo
+                                         # (p. ej. un FileSystemStorage en pruebas)
+"""
+import datetime
+import logging
+
+from django.apps import apps
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import storages
+from django.db import connection
+from django.db.models import F, Q
+from django.dispatch import Signal
+from django.utils import timezone
+
+from .models import PREFIJO_PENDIENTE, TrabajoMedia
+
+logger = logging.getLogger(__name__)
+
+Estado = TrabajoMedia.Estado
+
+# se envía cuando el worker reemplaza la referencia (sender = clase del modelo)
+archivo_subido = Signal()  # kwargs: objeto_id, campo, nombre
+
+
+def asincrona():
+    return getattr(settings, 'INVENTARIO_MEDIA_ASINCRONA', True)
+
+
+def storage_para(field):
+    alias = getattr(settings, 'INVENTARIO_MEDIA_STORAGE', None)
+    return storages[alias] if alias else field.storage
+
+
+# ---- lado de la petición -----------------------------------------------------------------
+
+def diferir(instancia, *campos):
+    """
+    Reemplaza los archivos nuevos de ``campos`` por su nombre provisional y devuelve
+    ``[(campo, nombre, contenido)]`` para ``encolar``. Sin cola, no hace nada.
+    """
+    if not asincrona():
+        return []
+    diferidos = []
+    for campo in campos:
+        archivo = getattr(instancia, campo)
+        if not archivo or archivo._committed:
+            continue
+        field = instancia._meta.get_field(campo)
+        nombre = field.generate_filename(instancia, archivo.name)
+        marcador = PREFIJO_PENDIENTE + nombre
+        if len(marcador) > field.max_length:
+            continue  # no cabe el nombre provisional: se sube en el save(), como antes
+        contenido = b''.join(archivo.chunks())
+        setattr(instancia, campo, marcador)
+        diferidos.append((campo, nombre, contenido))
+    return diferidos
+
+
+def encolar(instancia, diferidos):
+    if not diferidos:
+        return []
+    return TrabajoMedia.objects.bulk_create([
+        TrabajoMedia(
+            modelo=instancia._meta.label, objeto_id=str(instancia.pk),
+            campo=campo, nombre=nombre, contenido=contenido,
+        )
+        for campo, nombre, contenido in diferidos
+    ])
+
+
+# ---- lado del worker ---------------------------------------------------------------------
+
+def tomar(limite, bloqueo_max=600):
+    """
+    Marca como ``procesando`` hasta ``limite`` trabajos disponibles y devuelve sus ids.
+    También recupera los que quedaron ``procesando`` más de ``bloqueo_max`` segundos
+    (worker caído). El UPDATE condicionado evita que dos workers tomen el mismo trabajo.
+    """
+    ahora = timezone.now()
+    disponibles = (
+        Q(estado=Estado.PENDIENTE, disponible_en__lte=ahora)
+        | Q(estado=Estado.PROCESANDO, tomado_en__lt=ahora - datetime.timedelta(seconds=bloqueo_max))
+    )
+    candidatos = (
+        TrabajoMedia.objects.filter(disponibles)
+        .order_by('disponible_en', 'pk').values_list('pk', flat=True)[:limite]
+    )
+    tomados = []
+    for pk in list(candidatos):
+        actualizados = TrabajoMedia.objects.filter(disponibles, pk=pk).update(
+            estado=Estado.PROCESANDO, tomado_en=ahora, intentos=F('intentos') + 1,
+        )
+        if actualizados:
+            tomados.append(pk)
+    return tomados
+
+
+def procesar(pk, max_intentos=5, espera_base=30):
+    """Sube un trabajo ya tomado. Devuelve ``True`` si quedó completado."""
+    trabajo = TrabajoMedia.objects.get(pk=pk)
+    modelo = apps.get_model(trabajo.modelo)
+    field = modelo._meta.get_field(trabajo.campo)
+    storage = storage_para(field)
+    try:
+        guardado = storage.save(trabajo.nombre, ContentFile(bytes(trabajo.contenido)))
+    except Exception as exc:
+        logger.warning('Subida fallida (%s), intento %s: %s', trabajo, trabajo.intentos, exc)
+        if trabajo.intentos >= max_intentos:
+            cambios = {'estado': Estado.FALLIDO}
+        else:
+            espera = espera_base * 2 ** (trabajo.intentos - 1)
+            cambios = {
+                'estado': Estado.PENDIENTE,
+                'disponible_en': timezone.now() + datetime.timedelta(seconds=espera),
+            }
+        TrabajoMedia.objects.filter(pk=pk).update(error=f'{type(exc).__name__}: {exc}', **cambios)
+        return False
+
+    marcador = PREFIJO_PENDIENTE + trabajo.nombre
+    actualizados = modelo._default_manager.filter(
+        pk=trabajo.objeto_id, **{trabajo.campo: marcador}
+    ).update(**{trabajo.campo: guardado})
+    nota = ''
+    if actualizados:
+        archivo_subido.send(sender=modelo, objeto_id=trabajo.objeto_id, campo=trabajo.campo, nombre=guardado)
+    else:
+        # el objeto se borró o el archivo se reemplazó mientras tanto
+        storage.delete(guardado)
+        nota = 'Descartado: el objeto ya no apunta a este archivo.'
+    TrabajoMedia.objects.filter(pk=pk).update(estado=Estado.COMPLETADO, contenido=b'', error=nota)
+    return True
+
+
+def procesar_en_hilo(pk, **kwargs):
+    # cada hilo abre su propia conexión; se cierra al terminar para no dejarla colgada
+    try:
+        return procesar(pk, **kwargs)
+    finally:
+        connection.close()
+
+
+def purgar(dias):
+    limite = timezone.now() - datetime.timedelta(days=dias)
+    return TrabajoMedia.objects.filter(estado=Estado.COMPLETADO, actualizado_en__lt=limite).delete()[0]
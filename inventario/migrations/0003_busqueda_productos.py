@@ -0,0 +1,22 @@
+from django.db import migrations
+
+from inventario import busqueda
+
+
+def instalar(apps, schema_editor):
+    busqueda.instalar_indice(schema_editor.connection)
+
+
+def desinstalar(apps, schema_editor):
+    busqueda.desinstalar_indice(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventario', '0002_remove_producto_inventario__barcode_73eb14_idx_and_more'),
+    ]
+
+    operations = [
+        migrations.RunPython(instalar, desinstalar),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.5 on 2026-10-18 08:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventario', '0003_busqueda_productos'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='movimientostock',
+            name='lote',
+            field=models.UUIDField(blank=True, db_index=True, editable=False, null=True, verbose_name='Lote'),
+        ),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 5.2.5 on 2026-10-18 08:46
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventario', '0004_movimientostock_lote'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('corte', models.DateTimeField(verbose_name='Corte')),
+                ('stock', models.IntegerField(verbose_name='Stock')),
+            ],
+            options={
+                'verbose_name': 'Corte de stock',
+                'verbose_name_plural': 'Cortes de stock',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='movimientostock',
+            index=models.Index(fields=['producto', 'creado_en'], name='inventario__product_137d2b_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='producto',
+            index=models.Index(fields=['updated_at'], name='inventario__updated_0051c0_idx'),
+        ),
+        migrations.AddField(
+            model_name='stocksnapshot',
+            name='producto',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='snapshots', to='inventario.producto'),
+        ),
+        migrations.AddIndex(
+            model_name='stocksnapshot',
+            index=models.Index(fields=['corte'], name='inventario__corte_5fb2fe_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='stocksnapshot',
+            constraint=models.UniqueConstraint(fields=('producto', 'corte'), name='inventario_snapshot_producto_corte'),
+        ),
+    ]
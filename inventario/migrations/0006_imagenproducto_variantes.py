@@ -0,0 +1,24 @@
+# Generated by Django 5.2.5 on 2026-10-18 08:51
+
+import inventario.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventario', '0005_stocksnapshot_indices'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='imagenproducto',
+            name='icono',
+            field=models.ImageField(blank=True, editable=False, upload_to=inventario.models.variante_upload_to, verbose_name='Ícono'),
+        ),
+        migrations.AddField(
+            model_name='imagenproducto',
+            name='miniatura',
+            field=models.ImageField(blank=True, editable=False, upload_to=inventario.models.variante_upload_to, verbose_name='Miniatura'),
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.2.5 on 2026-10-18 08:53
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventario', '0006_imagenproducto_variantes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TrabajoMedia',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('modelo', models.CharField(max_length=100, verbose_name='Modelo')),
+                ('objeto_id', models.CharField(max_length=64, verbose_name='Objeto')),
+                ('campo', models.CharField(max_length=100, verbose_name='Campo')),
+                ('nombre', models.CharField(max_length=255, verbose_name='Nombre destino')),
+                ('contenido', models.BinaryField(verbose_name='Contenido')),
+                ('estado', models.CharField(choices=[('pendiente', 'Pendiente'), ('procesando', 'Procesando'), ('completado', 'Completado'), ('fallido', 'Fallido')], default='pendiente', max_length=12)),
+                ('intentos', models.PositiveSmallIntegerField(default=0, verbose_name='Intentos')),
+                ('error', models.TextField(blank=True, verbose_name='Último error')),
+                ('disponible_en', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Disponible en')),
+                ('tomado_en', models.DateTimeField(blank=True, null=True, verbose_name='Tomado en')),
+                ('creado_en', models.DateTimeField(auto_now_add=True, verbose_name='Creado en')),
+                ('actualizado_en', models.DateTimeField(auto_now=True, verbose_name='Actualizado en')),
+            ],
+            options={
+                'verbose_name': 'Trabajo de media',
+                'verbose_name_plural': 'Trabajos de media',
+                'indexes': [models.Index(fields=['estado', 'disponible_en'], name='inventario__estado_6f3e6e_idx')],
+            },
+        ),
+    ]
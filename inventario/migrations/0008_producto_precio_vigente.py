@@ -0,0 +1,42 @@
+# Generated by Django 5.2.5 on 2026-10-18 08:54
+
+from django.conf import settings
+from django.db import migrations, models
+from django.utils import timezone
+
+from inventario import precios
+
+
+def calcular_precios(apps, schema_editor):
+    Producto = apps.get_model('inventario', 'Producto')
+    Producto.objects.update(**precios.valores_update(timezone.now()))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventario', '0007_trabajomedia'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='producto',
+            name='precio_vigente',
+            field=models.DecimalField(blank=True, decimal_places=2, editable=False, max_digits=12, null=True, verbose_name='Precio vigente'),
+        ),
+        migrations.AddField(
+            model_name='producto',
+            name='precio_vigente_hasta',
+            field=models.DateTimeField(blank=True, editable=False, null=True, verbose_name='Precio vigente hasta'),
+        ),
+        migrations.AddIndex(
+            model_name='producto',
+            index=models.Index(fields=['visibilidad_online', 'precio_vigente', 'id'], name='inventario__visibil_c5fd2d_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='producto',
+            index=models.Index(fields=['precio_vigente_hasta'], name='inventario__precio__24adbb_idx'),
+        ),
+        migrations.RunPython(calcular_precios, migrations.RunPython.noop),
+    ]
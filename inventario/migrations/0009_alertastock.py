@@ -0,0 +1,34 @@
+# Generated by Django 5.2.5 on 2026-10-18 08:57
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventario', '0008_producto_precio_vigente'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='producto',
+            name='punto_reorden',
+            field=models.IntegerField(blank=True, null=True, verbose_name='Punto de reorden'),
+        ),
+        migrations.CreateModel(
+            name='AlertaStock',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('desde', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Bajo el punto de reorden desde')),
+                ('notificada_en', models.DateTimeField(blank=True, null=True, verbose_name='Notificada en')),
+                ('producto', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='alerta_stock', to='inventario.producto')),
+            ],
+            options={
+                'verbose_name': 'Alerta de stock',
+                'verbose_name_plural': 'Alertas de stock',
+                'ordering': ['desde'],
+            },
+        ),
+    ]
@@ -0,0 +1,57 @@
+# Generated by Django 5.2.5 on 2026-10-18 08:59
+
+from decimal import Decimal
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, DecimalField, ExpressionWrapper, F, Sum, Value
+from django.db.models.functions import Coalesce
+
+
+def poblar(apps, schema_editor):
+    Producto = apps.get_model('inventario', 'Producto')
+    ValuacionInventario = apps.get_model('inventario', 'ValuacionInventario')
+    valor = ExpressionWrapper(
+        F('stock_actual') * Coalesce('costo_unitario', Value(Decimal('0'))),
+        output_field=DecimalField(max_digits=18, decimal_places=2),
+    )
+    filas = (
+        Producto.objects.order_by()
+        .values('proveedor_principal_id', 'tipo_producto', 'estado')
+        .annotate(n=Count('id'), unidades=Sum('stock_actual'), valor=Sum(valor))
+    )
+    ValuacionInventario.objects.bulk_create([
+        ValuacionInventario(
+            proveedor_id=f['proveedor_principal_id'], tipo_producto=f['tipo_producto'], estado=f['estado'],
+            productos=f['n'], unidades=f['unidades'] or 0, valor=f['valor'] or 0,
+        )
+        for f in filas
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventario', '0009_alertastock'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ValuacionInventario',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tipo_producto', models.CharField(choices=[('Nuevo', 'Nuevo'), ('Repuesto', 'Repuesto'), ('Servicio', 'Servicio'), ('Kit', 'Kit')], max_length=20, verbose_name='Tipo de producto')),
+                ('estado', models.CharField(choices=[('Disponible', 'Disponible'), ('Reservado', 'Reservado'), ('Vendido', 'Vendido'), ('Dañado', 'Dañado'), ('Desechado', 'Desechado')], max_length=20, verbose_name='Estado')),
+                ('productos', models.IntegerField(default=0, verbose_name='Productos')),
+                ('unidades', models.BigIntegerField(default=0, verbose_name='Unidades')),
+                ('valor', models.DecimalField(decimal_places=2, default=0, max_digits=18, verbose_name='Valor')),
+                ('proveedor', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='inventario.proveedor')),
+            ],
+            options={
+                'verbose_name': 'Valuación de inventario',
+                'verbose_name_plural': 'Valuación de inventario',
+                'constraints': [models.UniqueConstraint(condition=models.Q(('proveedor__isnull', False)), fields=('proveedor', 'tipo_producto', 'estado'), name='inventario_valuacion_clave'), models.UniqueConstraint(condition=models.Q(('proveedor__isnull', True)), fields=('tipo_producto', 'estado'), name='inventario_valuacion_clave_sin_proveedor')],
+            },
+        ),
+        migrations.RunPython(poblar, migrations.RunPython.noop),
+    ]
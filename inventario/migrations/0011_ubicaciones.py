@@ -0,0 +1,86 @@
+# Generated by Django 5.2.5 on 2026-10-18 09:10
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+SIN_ASIGNAR = 'SIN-ASIGNAR'
+
+
+def poblar(apps, schema_editor):
+    """Una ubicación por cada ``ubicacion_principal`` y todo el stock actual en ella."""
+    Producto = apps.get_model('inventario', 'Producto')
+    Ubicacion = apps.get_model('inventario', 'Ubicacion')
+    ExistenciaUbicacion = apps.get_model('inventario', 'ExistenciaUbicacion')
+    codigos = {
+        (c or '').strip() or SIN_ASIGNAR
+        for c in Producto.objects.order_by().values_list('ubicacion_principal', flat=True).distinct()
+    }
+    Ubicacion.objects.bulk_create([Ubicacion(codigo=c) for c in codigos], batch_size=1000)
+    ids = dict(Ubicacion.objects.values_list('codigo', 'pk'))
+    lote = []
+    filas = Producto.objects.exclude(stock_actual=0).values_list('pk', 'ubicacion_principal', 'stock_actual')
+    for pk, codigo, stock in filas.iterator(chunk_size=5000):
+        lote.append(ExistenciaUbicacion(
+            producto_id=pk, ubicacion_id=ids[(codigo or '').strip() or SIN_ASIGNAR], cantidad=stock,
+        ))
+        if len(lote) >= 5000:
+            ExistenciaUbicacion.objects.bulk_create(lote)
+            lote = []
+    ExistenciaUbicacion.objects.bulk_create(lote)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventario', '0010_valuacioninventario'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Ubicacion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('codigo', models.CharField(max_length=100, unique=True, verbose_name='Código')),
+                ('nombre', models.CharField(blank=True, max_length=150, verbose_name='Nombre')),
+                ('sucursal', models.CharField(blank=True, db_index=True, max_length=100, verbose_name='Sucursal')),
+                ('activa', models.BooleanField(default=True, verbose_name='Activa')),
+            ],
+            options={
+                'verbose_name': 'Ubicación',
+                'verbose_name_plural': 'Ubicaciones',
+                'ordering': ['codigo'],
+            },
+        ),
+        migrations.AlterField(
+            model_name='movimientostock',
+            name='tipo',
+            field=models.CharField(choices=[('IN', 'Entrada'), ('OUT', 'Salida'), ('ADJ', 'Ajuste'), ('TRF', 'Transferencia')], max_length=3),
+        ),
+        migrations.AddField(
+            model_name='movimientostock',
+            name='ubicacion_destino',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='movimientos_entrada', to='inventario.ubicacion', verbose_name='Ubicación destino'),
+        ),
+        migrations.AddField(
+            model_name='movimientostock',
+            name='ubicacion_origen',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='movimientos_salida', to='inventario.ubicacion', verbose_name='Ubicación origen'),
+        ),
+        migrations.CreateModel(
+            name='ExistenciaUbicacion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('cantidad', models.IntegerField(default=0, verbose_name='Cantidad')),
+                ('actualizado_en', models.DateTimeField(auto_now=True, verbose_name='Actualizado en')),
+                ('producto', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='existencias', to='inventario.producto')),
+                ('ubicacion', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='existencias', to='inventario.ubicacion')),
+            ],
+            options={
+                'verbose_name': 'Existencia por ubicación',
+                'verbose_name_plural': 'Existencias por ubicación',
+                'indexes': [models.Index(fields=['ubicacion', 'producto'], name='inventario__ubicaci_70809c_idx')],
+                'constraints': [models.UniqueConstraint(fields=('producto', 'ubicacion'), name='inventario_existencia_producto_ubicacion')],
+            },
+        ),
+        migrations.RunPython(poblar, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.5 on 2026-10-18 09:15
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventario', '0011_ubicaciones'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='producto',
+            name='fragmentos_stock',
+            field=models.PositiveSmallIntegerField(default=0, help_text='0 o 1: contador único. N > 1: N contadores paralelos que se pliegan periódicamente (manage.py plegar_stock).', verbose_name='Contadores de stock'),
+        ),
+        migrations.CreateModel(
+            name='FragmentoStock',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fragmento', models.PositiveSmallIntegerField(verbose_name='Contador')),
+                ('cantidad', models.IntegerField(default=0, verbose_name='Cantidad pendiente')),
+                ('producto', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='fragmentos', to='inventario.producto')),
+                ('ubicacion', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='+', to='inventario.ubicacion')),
+            ],
+            options={
+                'verbose_name': 'Contador de stock',
+                'verbose_name_plural': 'Contadores de stock',
+                'constraints': [models.UniqueConstraint(fields=('producto', 'ubicacion', 'fragmento'), name='inventario_fragmento_producto_ubicacion')],
+            },
+        ),
+    ]
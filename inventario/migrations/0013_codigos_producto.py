@@ -0,0 +1,61 @@
+# Generated by Django 5.2.5 on 2026-10-18 09:24
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+from inventario.codigos import analizar, repetidos
+
+
+def poblar(apps, schema_editor):
+    """
+    Un ``CodigoProducto`` por cada ``codigo_identificador``. Si dos productos tienen códigos
+    que normalizan a la misma clave la migración falla y los lista: hay que corregirlos antes.
+    """
+    Producto = apps.get_model('inventario', 'Producto')
+    CodigoProducto = apps.get_model('inventario', 'CodigoProducto')
+    filas = list(
+        Producto.objects.exclude(codigo_identificador__isnull=True).exclude(codigo_identificador='')
+        .order_by('pk').values_list('pk', 'codigo_identificador')
+    )
+    conflictos = repetidos(filas)
+    if conflictos:
+        detalle = '\n'.join(
+            f'  {clave}: ' + ', '.join(f'producto {pk} ({codigo!r})' for pk, codigo in grupo)
+            for clave, grupo in sorted(conflictos.items())
+        )
+        raise RuntimeError(
+            f'{len(conflictos)} código(s) de barras equivalentes asignados a más de un producto; '
+            f'corrija codigo_identificador y vuelva a migrar:\n{detalle}'
+        )
+    lote = []
+    for pk, codigo in filas:
+        clave, formato = analizar(codigo)
+        if clave:
+            lote.append(CodigoProducto(producto_id=pk, codigo=codigo.strip(), clave=clave, formato=formato))
+    CodigoProducto.objects.bulk_create(lote, batch_size=5000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventario', '0012_contadores_stock'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CodigoProducto',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('codigo', models.CharField(max_length=128, verbose_name='Código')),
+                ('clave', models.CharField(editable=False, max_length=128, unique=True, verbose_name='Clave normalizada')),
+                ('formato', models.CharField(choices=[('EAN8', 'EAN-8'), ('UPCE', 'UPC-E'), ('UPCA', 'UPC-A'), ('EAN13', 'EAN-13'), ('GTIN14', 'GTIN-14'), ('OTRO', 'Otro')], default='OTRO', editable=False, max_length=8, verbose_name='Formato')),
+                ('creado_en', models.DateTimeField(auto_now_add=True, verbose_name='Creado en')),
+                ('producto', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='codigos', to='inventario.producto')),
+            ],
+            options={
+                'verbose_name': 'Código de producto',
+                'verbose_name_plural': 'Códigos de producto',
+            },
+        ),
+        migrations.RunPython(poblar, migrations.RunPython.noop),
+    ]
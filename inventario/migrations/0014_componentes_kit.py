@@ -0,0 +1,28 @@
+# Generated by Django 5.2.5 on 2026-10-18 09:28
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventario', '0013_codigos_producto'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ComponenteKit',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('cantidad', models.PositiveIntegerField(default=1, verbose_name='Cantidad por kit')),
+                ('componente', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='en_kits', to='inventario.producto')),
+                ('kit', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='componentes', to='inventario.producto')),
+            ],
+            options={
+                'verbose_name': 'Componente de kit',
+                'verbose_name_plural': 'Componentes de kit',
+                'constraints': [models.UniqueConstraint(fields=('kit', 'componente'), name='inventario_componente_kit'), models.CheckConstraint(condition=models.Q(('cantidad__gt', 0)), name='inventario_componente_cantidad_positiva')],
+            },
+        ),
+    ]
@@ -0,0 +1,69 @@
+# Generated by Django 5.2.5 on 2026-10-18 09:31
+
+import django.db.models.deletion
+import django.db.models.expressions
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventario', '0014_componentes_kit'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Reserva',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('cantidad', models.PositiveIntegerField(verbose_name='Cantidad')),
+                ('estado', models.CharField(choices=[('ACT', 'Activa'), ('CNV', 'Convertida en venta'), ('LIB', 'Liberada'), ('VEN', 'Vencida')], default='ACT', max_length=3, verbose_name='Estado')),
+                ('referencia', models.CharField(blank=True, max_length=100, verbose_name='Referencia (cotización, carrito)')),
+                ('creada_en', models.DateTimeField(auto_now_add=True, verbose_name='Creada en')),
+                ('vence_en', models.DateTimeField(verbose_name='Vence en')),
+                ('cerrada_en', models.DateTimeField(blank=True, null=True, verbose_name='Cerrada en')),
+            ],
+            options={
+                'verbose_name': 'Reserva',
+                'verbose_name_plural': 'Reservas',
+            },
+        ),
+        migrations.AddField(
+            model_name='producto',
+            name='stock_reservado',
+            field=models.IntegerField(default=0, editable=False, verbose_name='Stock reservado'),
+        ),
+        migrations.AddIndex(
+            model_name='producto',
+            index=models.Index(django.db.models.expressions.CombinedExpression(models.F('stock_actual'), '-', models.F('stock_reservado')), name='inventario_producto_disponible'),
+        ),
+        migrations.AddField(
+            model_name='reserva',
+            name='movimiento',
+            field=models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='reserva', to='inventario.movimientostock'),
+        ),
+        migrations.AddField(
+            model_name='reserva',
+            name='producto',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reservas', to='inventario.producto'),
+        ),
+        migrations.AddField(
+            model_name='reserva',
+            name='usuario',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='reserva',
+            index=models.Index(condition=models.Q(('estado', 'ACT')), fields=['vence_en'], name='inventario_reserva_vence_act'),
+        ),
+        migrations.AddIndex(
+            model_name='reserva',
+            index=models.Index(fields=['referencia'], name='inventario__referen_bc2d87_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='reserva',
+            constraint=models.CheckConstraint(condition=models.Q(('cantidad__gt', 0)), name='inventario_reserva_cantidad_positiva'),
+        ),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 5.2.5 on 2026-10-18 09:44
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+MOTIVOS_ESCANEO = ('Ingreso por escaneo (lote)', 'Salida por escaneo (lote)')
+
+
+def poblar(apps, schema_editor):
+    """Los lotes de escaneo ya aplicados siguen contando como duplicados si el cliente los reintenta."""
+    MovimientoStock = apps.get_model('inventario', 'MovimientoStock')
+    LoteAplicado = apps.get_model('inventario', 'LoteAplicado')
+    filas = (
+        MovimientoStock.objects.filter(motivo__in=MOTIVOS_ESCANEO, lote__isnull=False)
+        .values_list('lote', 'usuario_id').order_by('lote').distinct()
+    )
+    vistos, lote = set(), []
+    for uuid, usuario_id in filas.iterator(chunk_size=5000):
+        if uuid not in vistos:
+            vistos.add(uuid)
+            lote.append(LoteAplicado(lote=uuid, usuario_id=usuario_id))
+    LoteAplicado.objects.bulk_create(lote, batch_size=5000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventario', '0015_reservas'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LoteAplicado',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('lote', models.UUIDField(editable=False, unique=True, verbose_name='Lote')),
+                ('creado_en', models.DateTimeField(auto_now_add=True, verbose_name='Creado en')),
+                ('usuario', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Lote aplicado',
+                'verbose_name_plural': 'Lotes aplicados',
+            },
+        ),
+        migrations.RunPython(poblar, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.5 on 2026-10-18 09:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventario', '0016_lotes_aplicados'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='reserva',
+            name='componentes',
+            field=models.JSONField(blank=True, editable=False, null=True, verbose_name='Componentes apartados'),
+        ),
+    ]
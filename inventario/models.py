@@ -1,9 +1,20 @@
+import random
 import uuid
 from django.conf import settings
-from django.db import models
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError, connections, models, router, transaction
+from django.db.models import Case, F, IntegerField, OuterRef, Q, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce
+from django.dispatch import Signal
 from django.utils import timezone
 from cloudinary_storage.storage import RawMediaCloudinaryStorage
 
+from . import codigos, precios
+
+# columnas de Producto mantenidas solo por la base (ver ``Producto.save``)
+CAMPOS_CONTADORES = ('stock_actual', 'stock_reservado')
+
+
 class Proveedor(models.Model):
     nombre = models.CharField('Nombre', max_length=150, unique=True)
     email = models.EmailField('Correo', blank=True, null=True)
@@ -18,6 +29,77 @@ class Proveedor(models.Model):
         return self.nombre
 
 
+# ubicación para productos cuyo ``ubicacion_principal`` quedó vacío
+UBICACION_SIN_ASIGNAR = 'SIN-ASIGNAR'
+
+
+def codigo_ubicacion(texto):
+    return (texto or '').strip() or UBICACION_SIN_ASIGNAR
+
+
+class Ubicacion(models.Model):
+    """
+    Sucursal / pasillo / anaquel con existencias propias (``ExistenciaUbicacion``).
+    ``Producto.ubicacion_principal`` guarda el ``codigo`` de la ubicación donde entran y
+    salen los movimientos que no indican otra.
+    """
+    codigo = models.CharField('Código', max_length=100, unique=True)
+    nombre = models.CharField('Nombre', max_length=150, blank=True)
+    sucursal = models.CharField('Sucursal', max_length=100, blank=True, db_index=True)
+    activa = models.BooleanField('Activa', default=True)
+
+    class Meta:
+        verbose_name = 'Ubicación'
+        verbose_name_plural = 'Ubicaciones'
+        ordering = ['codigo']
+
+    def __str__(self):
+        return self.codigo
+
+    @classmethod
+    def ids_por_codigo(cls, codigos, using=None):
+        """``{codigo: id}``; crea las ubicaciones que todavía no existen."""
+        codigos = {codigo_ubicacion(c) for c in codigos}
+        qs = cls.objects.using(using)
+        ids = dict(qs.filter(codigo__in=codigos).values_list('codigo', 'pk'))
+        faltan = codigos - set(ids)
+        if faltan:
+            qs.bulk_create([cls(codigo=c) for c in faltan], ignore_conflicts=True)
+            ids.update(qs.filter(codigo__in=faltan).values_list('codigo', 'pk'))
+        return ids
+
+
+class ProductoQuerySet(models.QuerySet):
+
+    def con_precio_efectivo(self, ahora=None):
+        """Anota ``precio_efectivo`` evaluando la ventana de oferta en SQL a ``ahora``."""
+        return self.annotate(precio_efectivo=precios.precio_efectivo(ahora or timezone.now()))
+
+    def refrescar_precios(self, ahora=None, completo=False):
+        """
+        Recalcula ``precio_vigente`` en un solo UPDATE. Salvo ``completo``, solo las filas
+        cuyo ``precio_vigente_hasta`` ya pasó (índice). Devuelve las filas actualizadas.
+        """
+        ahora = ahora or timezone.now()
+        qs = self if completo else self.filter(precio_vigente_hasta__lte=ahora)
+        # updated_at avanza: el precio publicado cambió (ETag del catálogo, exportaciones)
+        return qs.update(updated_at=ahora, **precios.valores_update(ahora))
+
+    def con_disponible(self):
+        """Anota ``disponible``: ``stock_actual`` menos lo apartado por reservas (expresión indexada)."""
+        return self.annotate(disponible=F('stock_actual') - F('stock_reservado'))
+
+    def con_stock_total(self):
+        """Anota ``stock_total``: ``stock_actual`` más los contadores fragmentados aún sin plegar."""
+        pendiente = (
+            FragmentoStock.objects.filter(producto=OuterRef('pk'))
+            .order_by().values('producto').annotate(total=Sum('cantidad')).values('total')[:1]
+        )
+        return self.annotate(
+            stock_total=F('stock_actual') + Coalesce(Subquery(pendiente, output_field=IntegerField()), Value(0))
+        )
+
+
 class Producto(models.Model):
     class TipoProducto(models.TextChoices):
         NUEVO = 'Nuevo', 'Nuevo'
@@ -62,6 +144,17 @@ class Producto(models.Model):
     ubicacion_principal = models.CharField('Ubicación principal', max_length=100)
     cantidad_inicial = models.IntegerField('Cantidad inicial', default=0)
     stock_actual = models.IntegerField('Stock actual', default=0)
+    # con stock_actual <= punto_reorden el producto entra en AlertaStock
+    punto_reorden = models.IntegerField('Punto de reorden', blank=True, null=True)
+    # productos muy escaneados: los movimientos van a N contadores (FragmentoStock) sin
+    # bloquear la fila del producto; ``plegar_fragmentos`` los lleva a stock_actual
+    fragmentos_stock = models.PositiveSmallIntegerField(
+        'Contadores de stock', default=0,
+        help_text='0 o 1: contador único. N > 1: N contadores paralelos que se pliegan periódicamente '
+                  '(manage.py plegar_stock).',
+    )
+    # unidades apartadas por reservas activas (``Reserva``); disponible = stock_actual - stock_reservado
+    stock_reservado = models.IntegerField('Stock reservado', default=0, editable=False)
     unidad_medida = models.CharField('Unidad de medida', max_length=20, choices=UnidadMedida.choices)
 
     costo_unitario = models.DecimalField('Costo unitario', max_digits=12, decimal_places=2, blank=True, null=True)
@@ -94,6 +187,11 @@ class Producto(models.Model):
     visibilidad_online = models.CharField(
         'Visibilidad online', max_length=20, choices=VisibilidadOnline.choices, default=VisibilidadOnline.OCULTO
     )
+    # precio de oferta o público según la ventana de oferta; ver inventario/precios.py
+    precio_vigente = models.DecimalField(
+        'Precio vigente', max_digits=12, decimal_places=2, blank=True, null=True, editable=False
+    )
+    precio_vigente_hasta = models.DateTimeField('Precio vigente hasta', blank=True, null=True, editable=False)
     peso_kg = models.DecimalField('Peso (kg)', max_digits=8, decimal_places=3, blank=True, null=True)
     largo_mm = models.IntegerField('Largo (mm)', blank=True, null=True)
     ancho_mm = models.IntegerField('Ancho (mm)', blank=True, null=True)
@@ -110,11 +208,121 @@ class Producto(models.Model):
             models.Index(fields=['sku_proveedor']),
             models.Index(fields=['nombre']),
             models.Index(fields=['codigo_identificador']),
+            models.Index(fields=['updated_at']),
+            models.Index(fields=['visibilidad_online', 'precio_vigente', 'id']),
+            models.Index(fields=['precio_vigente_hasta']),
+            models.Index(F('stock_actual') - F('stock_reservado'), name='inventario_producto_disponible'),
         ]
 
+    objects = ProductoQuerySet.as_manager()
+
     def __str__(self):
         return f"{self.nombre} [{self.sku}]"
 
+    def actualizar_precio_vigente(self, ahora=None):
+        self.precio_vigente, self.precio_vigente_hasta = precios.calcular(
+            self.precio_publico, self.precio_oferta, self.oferta_inicio, self.oferta_fin, ahora
+        )
+
+    def clean(self):
+        super().clean()
+        if codigos.verificador_invalido(self.codigo_identificador):
+            raise ValidationError({
+                'codigo_identificador': 'El dígito verificador del código no es válido; vuelve a escanearlo.',
+            })
+
+    def validate_unique(self, exclude=None):
+        """Además de los campos únicos: el código no puede ser (en ninguna de sus formas) alias de otro producto."""
+        errores = {}
+        try:
+            super().validate_unique(exclude=exclude)
+        except ValidationError as e:
+            errores = e.update_error_dict(errores)
+        clave = codigos.normalizar(self.codigo_identificador)
+        if clave and 'codigo_identificador' not in errores and 'codigo_identificador' not in (exclude or ()):
+            otro = (
+                CodigoProducto.objects.filter(clave=clave).exclude(producto_id=self.pk)
+                .select_related('producto').only('producto__nombre', 'producto__sku').first()
+            )
+            if otro is not None:
+                errores['codigo_identificador'] = [f'El código ya está asignado a {otro.producto}.']
+        if errores:
+            raise ValidationError(errores)
+
+    def _campos_guardados(self, update_fields):
+        """``attname`` de las columnas que escribirá ``save()``."""
+        if update_fields is not None:
+            return {self._meta.get_field(nombre).attname for nombre in update_fields}
+        diferidos = self.get_deferred_fields()
+        return {f.attname for f in self._meta.concrete_fields if f.attname not in diferidos}
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding and not kwargs.get('force_insert'):
+            # los contadores de stock solo cambian con UPDATE relativos (movimientos, reservas,
+            # plegado): guardar una instancia leída antes no debe pisarlos
+            update_fields = kwargs.get('update_fields')
+            if update_fields is None:
+                diferidos = self.get_deferred_fields()
+                update_fields = [
+                    f.name for f in self._meta.concrete_fields if not f.primary_key and f.attname not in diferidos
+                ]
+            kwargs['update_fields'] = [n for n in update_fields if n not in CAMPOS_CONTADORES]
+        # con campos de precio diferidos (.only()) no hay nada que recalcular
+        if not set(precios.CAMPOS_PRECIO) & self.get_deferred_fields():
+            self.actualizar_precio_vigente()
+            update_fields = kwargs.get('update_fields')
+            if update_fields is not None and set(update_fields) & set(precios.CAMPOS_PRECIO):
+                kwargs['update_fields'] = {*update_fields, 'precio_vigente', 'precio_vigente_hasta'}
+
+        using = kwargs.get('using') or router.db_for_write(Producto, instance=self)
+        guardados = self._campos_guardados(kwargs.get('update_fields'))
+        valuar = bool(guardados & set(CAMPOS_VALUACION))
+        with transaction.atomic(using=using):
+            anterior = None
+            if valuar and not self._state.adding:
+                # fila bloqueada: el delta de valuación se calcula contra lo que realmente se reemplaza
+                anterior = (
+                    Producto.objects.using(using).select_for_update().filter(pk=self.pk)
+                    .values_list(*CAMPOS_VALUACION).first()
+                )
+            super().save(*args, **kwargs)
+            if valuar:
+                nueva = tuple(
+                    getattr(self, campo) if campo in guardados or anterior is None else anterior[i]
+                    for i, campo in enumerate(CAMPOS_VALUACION)
+                )
+                deltas = {}
+                if anterior is not None:
+                    _sumar_valuacion(deltas, anterior, -1)
+                _sumar_valuacion(deltas, nueva, 1)
+                registrar_deltas_valuacion(deltas, using)
+            if 'codigo_identificador' in guardados:
+                # ``_codigo_anterior`` lo deja la señal pre_save (inventario/signals.py)
+                self._sincronizar_codigo(getattr(self, '_codigo_anterior', None), using)
+        if {'stock_actual', 'punto_reorden'} & guardados:
+            sincronizar_alertas([self.pk], using=using)
+        if 'stock_actual' in guardados:
+            stock_cambiado.send(sender=Producto, producto_ids=[self.pk], using=using)
+
+    def _sincronizar_codigo(self, anterior, using):
+        """Mantiene el ``CodigoProducto`` de ``codigo_identificador`` (y quita el del código anterior)."""
+        if anterior == self.codigo_identificador:
+            return
+        qs = CodigoProducto.objects.using(using)
+        if anterior:
+            qs.filter(producto=self, clave=codigos.normalizar(anterior)).delete()
+        alias = CodigoProducto.de(self.pk, self.codigo_identificador)
+        if not alias.clave:
+            return
+        dueno = qs.filter(clave=alias.clave).values_list('producto_id', flat=True).first()
+        if dueno is None:
+            alias.save(using=using)
+        elif dueno != self.pk:
+            # lo valida ``validate_unique``; aquí solo llega quien guarda sin validar
+            raise ValidationError({
+                'codigo_identificador': f'El código "{self.codigo_identificador}" ya está asignado a otro producto.',
+            })
+
     def agregar_stock(self, cantidad, usuario=None, ip=None, motivo='Ingreso'):
         MovimientoStock.registrar(self, cantidad, MovimientoStock.TipoMovimiento.ENTRADA, usuario, ip, motivo)
 
@@ -122,15 +330,156 @@ class Producto(models.Model):
         MovimientoStock.registrar(self, -abs(cantidad), MovimientoStock.TipoMovimiento.SALIDA, usuario, ip, motivo)
 
 
+class CodigoProducto(models.Model):
+    """
+    Un código de barras del producto (puede tener varios: el de fábrica, el del proveedor, el
+    UPC-E del empaque chico). ``clave`` es su forma normalizada (``inventario/codigos.py``) con
+    índice único: cualquier forma escaneada se resuelve con una sola igualdad. El código de
+    ``Producto.codigo_identificador`` se mantiene solo desde ``Producto.save()``.
+    """
+    producto = models.ForeignKey(Producto, on_delete=models.CASCADE, related_name='codigos')
+    codigo = models.CharField('Código', max_length=128)
+    clave = models.CharField('Clave normalizada', max_length=128, unique=True, editable=False)
+    formato = models.CharField('Formato', max_length=8, choices=codigos.FORMATOS, default=codigos.OTRO, editable=False)
+    creado_en = models.DateTimeField('Creado en', auto_now_add=True)
+
+    class Meta:
+        verbose_name = 'Código de producto'
+        verbose_name_plural = 'Códigos de producto'
+
+    def __str__(self):
+        return self.codigo
+
+    @classmethod
+    def de(cls, producto_id, codigo):
+        """Instancia (sin guardar) con ``clave`` y ``formato`` calculados, para ``bulk_create``."""
+        clave, formato = codigos.analizar(codigo)
+        return cls(producto_id=producto_id, codigo=(codigo or '').strip(), clave=clave, formato=formato)
+
+    def clean(self):
+        clave = codigos.normalizar(self.codigo)
+        if not clave:
+            raise ValidationError({'codigo': 'El código no puede estar vacío.'})
+        if codigos.verificador_invalido(self.codigo):
+            raise ValidationError({'codigo': 'El dígito verificador del código no es válido.'})
+        if CodigoProducto.objects.filter(clave=clave).exclude(pk=self.pk).exists():
+            raise ValidationError({'codigo': 'El código ya está asignado a un producto.'})
+
+    def save(self, *args, **kwargs):
+        self.codigo = (self.codigo or '').strip()
+        self.clave, self.formato = codigos.analizar(self.codigo)
+        super().save(*args, **kwargs)
+
+
+class ComponenteKit(models.Model):
+    """
+    Renglón de la lista de materiales de un kit: ``cantidad`` de ``componente`` por cada kit.
+    Un componente puede ser otro kit (anidado). La disponibilidad del kit se calcula desde
+    sus componentes (``inventario/kits.py``), no desde su ``stock_actual``.
+    """
+    kit = models.ForeignKey(Producto, on_delete=models.CASCADE, related_name='componentes')
+    componente = models.ForeignKey(Producto, on_delete=models.PROTECT, related_name='en_kits')
+    cantidad = models.PositiveIntegerField('Cantidad por kit', default=1)
+
+    class Meta:
+        verbose_name = 'Componente de kit'
+        verbose_name_plural = 'Componentes de kit'
+        constraints = [
+            models.UniqueConstraint(fields=['kit', 'componente'], name='inventario_componente_kit'),
+            models.CheckConstraint(condition=Q(cantidad__gt=0), name='inventario_componente_cantidad_positiva'),
+        ]
+
+    def __str__(self):
+        return f"{self.kit_id} <- {self.cantidad} x {self.componente_id}"
+
+    def clean(self):
+        if self.kit_id is None or self.componente_id is None:
+            return
+        if self.kit.tipo_producto != Producto.TipoProducto.KIT:
+            raise ValidationError({'kit': 'Solo los productos de tipo Kit tienen componentes.'})
+        # el componente no puede contener (directa o indirectamente) al kit
+        nivel = {self.componente_id}
+        vistos = set()
+        while nivel:
+            if self.kit_id in nivel:
+                raise ValidationError({'componente': 'El componente contiene a este kit (referencia circular).'})
+            vistos |= nivel
+            nivel = set(
+                ComponenteKit.objects.filter(kit__in=nivel).values_list('componente_id', flat=True)
+            ) - vistos
+
+
+class Reserva(models.Model):
+    """
+    Unidades apartadas para una cotización o un carrito hasta ``vence_en``. Mientras está
+    activa suma en ``Producto.stock_reservado``; las salidas sin negativos no pueden tomar
+    esas unidades. La reserva de un kit aparta sus componentes (``componentes``, fijados al
+    reservar). Ver ``inventario/reservas.py``.
+    """
+    class EstadoReserva(models.TextChoices):
+        ACTIVA = 'ACT', 'Activa'
+        CONVERTIDA = 'CNV', 'Convertida en venta'
+        LIBERADA = 'LIB', 'Liberada'
+        VENCIDA = 'VEN', 'Vencida'
+
+    producto = models.ForeignKey(Producto, on_delete=models.CASCADE, related_name='reservas')
+    cantidad = models.PositiveIntegerField('Cantidad')
+    estado = models.CharField('Estado', max_length=3, choices=EstadoReserva.choices, default=EstadoReserva.ACTIVA)
+    referencia = models.CharField('Referencia (cotización, carrito)', max_length=100, blank=True)
+    usuario = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True)
+    creada_en = models.DateTimeField('Creada en', auto_now_add=True)
+    vence_en = models.DateTimeField('Vence en')
+    cerrada_en = models.DateTimeField('Cerrada en', blank=True, null=True)
+    # kits: {componente_id: unidades} apartadas en lugar del kit
+    componentes = models.JSONField('Componentes apartados', blank=True, null=True, editable=False)
+    movimiento = models.OneToOneField(
+        'MovimientoStock', on_delete=models.SET_NULL, null=True, blank=True, related_name='reserva',
+    )
+
+    class Meta:
+        verbose_name = 'Reserva'
+        verbose_name_plural = 'Reservas'
+        constraints = [
+            models.CheckConstraint(condition=Q(cantidad__gt=0), name='inventario_reserva_cantidad_positiva'),
+        ]
+        indexes = [
+            # el barrido de vencidas recorre solo las activas
+            models.Index(fields=['vence_en'], condition=Q(estado='ACT'), name='inventario_reserva_vence_act'),
+            models.Index(fields=['referencia']),
+        ]
+
+    def __str__(self):
+        return f"{self.cantidad} x {self.producto_id} ({self.get_estado_display()})"
+
+    def apartado(self):
+        """``{producto_id: unidades}`` que la reserva suma en ``stock_reservado``."""
+        return unidades_apartadas(self.producto_id, self.cantidad, self.componentes)
+
+
+def unidades_apartadas(producto_id, cantidad, componentes):
+    """``Reserva.apartado`` a partir de los valores de la fila (``values_list``)."""
+    if componentes:
+        return {int(pk): n for pk, n in componentes.items()}
+    return {producto_id: cantidad}
+
+
 def imagen_upload_to(instance, filename):
     ext = (filename.rsplit('.', 1)[-1] or 'jpg').lower()
     return f"products/{instance.producto.internal_id}/{instance.secuencia}.{ext}"
 
 
+def variante_upload_to(instance, filename):
+    # el nombre ya viene como "<secuencia>-<variante>.<ext>" (ver inventario/imagenes.py)
+    return f"products/{instance.producto.internal_id}/{filename}"
+
+
 class ImagenProducto(models.Model):
     producto = models.ForeignKey(Producto, on_delete=models.CASCADE, related_name='imagenes')
     imagen = models.ImageField(upload_to=imagen_upload_to)
     secuencia = models.PositiveSmallIntegerField('Secuencia', default=1)
+    # variantes de tamaño fijo generadas al subir (inventario/imagenes.py)
+    miniatura = models.ImageField('Miniatura', upload_to=variante_upload_to, blank=True, editable=False)
+    icono = models.ImageField('Ícono', upload_to=variante_upload_to, blank=True, editable=False)
 
     class Meta:
         verbose_name = 'Imagen de producto'
@@ -140,12 +489,34 @@ class ImagenProducto(models.Model):
     def __str__(self):
         return f"{self.producto} img#{self.secuencia}"
 
+    @property
+    def pendiente(self):
+        """La imagen sigue en la cola de subida (ver ``inventario/media.py``)."""
+        return self.imagen.name.startswith(PREFIJO_PENDIENTE) if self.imagen else False
+
+    def subido(self, campo):
+        """
+        El archivo de ``campo`` si ya está en el storage definitivo; ``None`` si está vacío o
+        sigue en la cola (cada campo se sube en su propio ``TrabajoMedia``).
+        """
+        archivo = getattr(self, campo)
+        return archivo if archivo and not archivo.name.startswith(PREFIJO_PENDIENTE) else None
+
+    @property
+    def miniatura_subida(self):
+        return self.subido('miniatura')
+
+    @property
+    def icono_subido(self):
+        return self.subido('icono')
+
 
 class MovimientoStock(models.Model):
     class TipoMovimiento(models.TextChoices):
         ENTRADA = 'IN', 'Entrada'
         SALIDA = 'OUT', 'Salida'
         AJUSTE = 'ADJ', 'Ajuste'
+        TRANSFERENCIA = 'TRF', 'Transferencia'
 
     producto = models.ForeignKey(Producto, on_delete=models.CASCADE, related_name='movimientos')
     tipo = models.CharField(max_length=3, choices=TipoMovimiento.choices)
@@ -154,25 +525,702 @@ class MovimientoStock(models.Model):
     usuario = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True)
     ip = models.GenericIPAddressField('IP', blank=True, null=True)
     creado_en = models.DateTimeField('Creado en', auto_now_add=True)
+    lote = models.UUIDField('Lote', blank=True, null=True, editable=False, db_index=True)
+    # entradas: destino; salidas: origen; transferencias: ambas (ver ``transferir``)
+    ubicacion_origen = models.ForeignKey(
+        Ubicacion, on_delete=models.PROTECT, null=True, blank=True,
+        related_name='movimientos_salida', verbose_name='Ubicación origen',
+    )
+    ubicacion_destino = models.ForeignKey(
+        Ubicacion, on_delete=models.PROTECT, null=True, blank=True,
+        related_name='movimientos_entrada', verbose_name='Ubicación destino',
+    )
 
     class Meta:
         verbose_name = 'Movimiento de stock'
         verbose_name_plural = 'Movimientos de stock'
         ordering = ['-creado_en']
+        indexes = [
+            models.Index(fields=['producto', 'creado_en']),
+        ]
 
     def __str__(self):
         return f"{self.get_tipo_display()} {self.cantidad} -> {self.producto}"
 
+    @staticmethod
+    def _ubicaciones_de(cantidad, ubicacion_id):
+        """Campos de ubicación de un movimiento simple según su signo."""
+        if cantidad < 0:
+            return {'ubicacion_origen_id': ubicacion_id}
+        return {'ubicacion_destino_id': ubicacion_id}
+
     @classmethod
-    def registrar(cls, producto, cantidad_signed, tipo, usuario=None, ip=None, motivo=None):
-        mv = cls.objects.create(
-            producto=producto,
-            tipo=tipo,
-            cantidad=cantidad_signed,
-            motivo=motivo,
-            usuario=usuario,
-            ip=ip,
+    def registrar(cls, producto, cantidad_signed, tipo, usuario=None, ip=None, motivo=None,
+                  permitir_negativo=None, ubicacion=None):
+        """
+        Aplica el movimiento y el cambio de stock en una sola transacción.
+
+        El stock se incrementa en la BD (``stock_actual = stock_actual + n``), sin leer el
+        valor previo en Python, así que escaneos concurrentes del mismo SKU no pierden
+        actualizaciones. Con ``permitir_negativo=False`` la condición
+        ``stock_actual - stock_reservado >= -n`` va en el mismo UPDATE y, si no se cumple, se
+        lanza ``StockInsuficiente``.
+
+        La existencia que cambia es la de ``ubicacion`` (instancia o id) o, sin ella, la de la
+        ubicación principal del producto. Sin negativos, con ``ubicacion`` también se exige
+        existencia suficiente ahí; sin ella solo cuenta el total del producto.
+
+        Con ``producto.fragmentos_stock > 1`` y negativos permitidos el delta va a uno de sus
+        contadores (``FragmentoStock``) y no se toca la fila del producto: ``stock_actual``,
+        existencias, alertas y valuación se ponen al día al plegar. Sin permitir negativos
+        primero se pliegan sus contadores, con la fila bloqueada, y se sigue el camino normal.
+        """
+        if permitir_negativo is None:
+            permitir_negativo = getattr(settings, 'INVENTARIO_PERMITIR_STOCK_NEGATIVO', True)
+        using = router.db_for_write(cls, instance=producto)
+        fragmentado = (producto.fragmentos_stock or 0) > 1
+        if fragmentado and permitir_negativo:
+            return cls._registrar_fragmentado(producto, cantidad_signed, tipo, usuario, ip, motivo, ubicacion, using)
+        with transaction.atomic(using=using):
+            if fragmentado:
+                plegar_fragmentos([producto.pk], using)
+            fila = _incrementar_stock(
+                producto.pk, cantidad_signed, permitir_negativo, using,
+                devolver=('stock_actual', 'punto_reorden', *CAMPOS_VALUACION[:3], 'costo_unitario',
+                          'ubicacion_principal'),
+            )
+            if fila is None:
+                raise StockInsuficiente(
+                    f'Stock insuficiente de {producto} para retirar {abs(cantidad_signed)}.'
+                )
+            _actualizar_alertas({producto.pk: (fila[0] - cantidad_signed, fila[0], fila[1])}, using)
+            registrar_deltas_valuacion(_deltas_movimiento([(fila[2:5], cantidad_signed, fila[5])]), using)
+            if ubicacion is not None:
+                ubicacion_id = getattr(ubicacion, 'pk', ubicacion)
+            else:
+                ubicacion_id = Ubicacion.ids_por_codigo([fila[6]], using)[codigo_ubicacion(fila[6])]
+            # sin ``ubicacion`` basta el total del producto (ya comprobado arriba): la existencia puede
+            # estar en otra ubicación y la principal queda negativa hasta una transferencia
+            incrementar_existencias(
+                {(producto.pk, ubicacion_id): cantidad_signed}, permitir_negativo or ubicacion is None, using,
+            )
+            mv = cls.objects.using(using).create(
+                producto=producto,
+                tipo=tipo,
+                cantidad=cantidad_signed,
+                motivo=motivo,
+                usuario=usuario,
+                ip=ip,
+                **cls._ubicaciones_de(cantidad_signed, ubicacion_id),
+            )
+        producto.stock_actual = fila[0]
+        stock_cambiado.send(sender=cls, producto_ids=[producto.pk], using=using)
+        return mv
+
+    @classmethod
+    def _registrar_fragmentado(cls, producto, cantidad, tipo, usuario, ip, motivo, ubicacion, using):
+        if ubicacion is not None:
+            ubicacion_id = getattr(ubicacion, 'pk', ubicacion)
+        else:
+            codigo = codigo_ubicacion(producto.ubicacion_principal)
+            ubicacion_id = Ubicacion.ids_por_codigo([codigo], using)[codigo]
+        fragmento = random.randrange(producto.fragmentos_stock)
+        with transaction.atomic(using=using):
+            _incrementar_fragmento(producto.pk, ubicacion_id, fragmento, cantidad, using)
+            # ``producto.stock_actual`` no cambia: el total es ``Producto.objects.con_stock_total()``
+            mv = cls.objects.using(using).create(
+                producto=producto, tipo=tipo, cantidad=cantidad, motivo=motivo, usuario=usuario, ip=ip,
+                **cls._ubicaciones_de(cantidad, ubicacion_id),
+            )
+        stock_cambiado.send(sender=cls, producto_ids=[producto.pk], using=using)
+        return mv
+
+    @classmethod
+    def registrar_lote(cls, items, usuario=None, ip=None, motivo=None, permitir_negativo=None, lote=None,
+                       ubicacion=None):
+        """
+        Registra muchos movimientos de una vez (recepción / despacho de un embarque).
+
+        ``items``: iterable de ``(producto, cantidad_signed)`` o ``(producto, cantidad_signed, tipo)``;
+        ``producto`` puede ser instancia o id. Sin ``tipo`` se usa ENTRADA/SALIDA según el signo.
+        Las existencias que cambian son las de ``ubicacion`` (p. ej. el andén de recepción) o,
+        sin ella, las de la ubicación principal de cada producto; sin negativos, la existencia
+        solo se exige cuando se indica ``ubicacion`` (si no, basta el total de cada producto).
+
+        Todo va en una transacción: un ``bulk_create`` de movimientos (marcados con el mismo
+        ``lote``) y un UPDATE por bloque de productos con el delta neto de cada uno.
+        """
+        if permitir_negativo is None:
+            permitir_negativo = getattr(settings, 'INVENTARIO_PERMITIR_STOCK_NEGATIVO', True)
+        lote = lote or uuid.uuid4()
+
+        movimientos = []
+        deltas = {}
+        for item in items:
+            producto, cantidad = item[0], item[1]
+            if cantidad == 0:
+                continue
+            tipo = item[2] if len(item) > 2 else (
+                cls.TipoMovimiento.ENTRADA if cantidad > 0 else cls.TipoMovimiento.SALIDA
+            )
+            producto_id = getattr(producto, 'pk', producto)
+            deltas[producto_id] = deltas.get(producto_id, 0) + cantidad
+            movimientos.append(cls(
+                producto_id=producto_id, tipo=tipo, cantidad=cantidad, motivo=motivo,
+                usuario=usuario, ip=ip, lote=lote,
+            ))
+        if not movimientos:
+            return []
+
+        using = router.db_for_write(cls)
+        with transaction.atomic(using=using):
+            if not permitir_negativo:
+                # el faltante se evalúa contra el stock completo, contadores fragmentados incluidos
+                plegar_fragmentos(list(deltas), using)
+            filas = _aplicar_deltas_stock(deltas, permitir_negativo, using)
+            if ubicacion is not None:
+                ubicaciones = {f[0]: getattr(ubicacion, 'pk', ubicacion) for f in filas}
+            else:
+                codigos = Ubicacion.ids_por_codigo([f[7] for f in filas], using)
+                ubicaciones = {f[0]: codigos[codigo_ubicacion(f[7])] for f in filas}
+            incrementar_existencias(
+                {(pk, ubicaciones[pk]): delta for pk, delta in deltas.items()},
+                permitir_negativo or ubicacion is None, using,
+            )
+            for mv in movimientos:
+                for campo, valor in cls._ubicaciones_de(mv.cantidad, ubicaciones[mv.producto_id]).items():
+                    setattr(mv, campo, valor)
+            cls.objects.using(using).bulk_create(movimientos)
+        stock_cambiado.send(sender=cls, producto_ids=list(deltas), using=using)
+        return movimientos
+
+    @classmethod
+    def transferir(cls, producto, cantidad, origen, destino, usuario=None, ip=None, motivo=None):
+        """
+        Mueve ``cantidad`` de ``producto`` (instancia o id) entre dos ubicaciones (instancias o
+        ids) en una transacción. Registra dos movimientos TRF con el mismo ``lote``: ``-n``
+        y ``+n``, ambos con origen y destino, así la suma de ``cantidad`` por producto sigue
+        siendo su stock. ``stock_actual`` no cambia; la existencia del origen (con los
+        contadores fragmentados ya plegados) nunca queda negativa (``StockInsuficiente``).
+        """
+        producto_id = getattr(producto, 'pk', producto)
+        origen_id, destino_id = getattr(origen, 'pk', origen), getattr(destino, 'pk', destino)
+        if cantidad <= 0:
+            raise ValidationError('La cantidad a transferir debe ser mayor que cero.')
+        if origen_id == destino_id:
+            raise ValidationError('El origen y el destino deben ser distintos.')
+        using = router.db_for_write(cls)
+        comunes = dict(
+            producto_id=producto_id, tipo=cls.TipoMovimiento.TRANSFERENCIA, motivo=motivo,
+            usuario=usuario, ip=ip, lote=uuid.uuid4(),
+            ubicacion_origen_id=origen_id, ubicacion_destino_id=destino_id,
         )
-        producto.stock_actual = (producto.stock_actual or 0) + cantidad_signed
-        producto.save(update_fields=['stock_actual', 'updated_at'])
-        return mv
\ No newline at end of file
+        with transaction.atomic(using=using):
+            plegar_fragmentos([producto_id], using)
+            incrementar_existencias(
+                {(producto_id, origen_id): -cantidad, (producto_id, destino_id): cantidad}, False, using,
+            )
+            return cls.objects.using(using).bulk_create([
+                cls(cantidad=-cantidad, **comunes),
+                cls(cantidad=cantidad, **comunes),
+            ])
+
+
+class LoteAplicado(models.Model):
+    """
+    Lote enviado por un cliente (escaneo continuo) que ya se aplicó. Se inserta en la misma
+    transacción que sus movimientos: la restricción única sobre ``lote`` hace que un reintento
+    concurrente espere y falle en vez de aplicar el lote dos veces.
+    """
+    lote = models.UUIDField('Lote', unique=True, editable=False)
+    usuario = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True)
+    creado_en = models.DateTimeField('Creado en', auto_now_add=True)
+
+    class Meta:
+        verbose_name = 'Lote aplicado'
+        verbose_name_plural = 'Lotes aplicados'
+
+    def __str__(self):
+        return str(self.lote)
+
+
+class StockSnapshot(models.Model):
+    """
+    Stock de un producto al instante ``corte`` (incluye los movimientos con ``creado_en <= corte``).
+    Lo genera ``manage.py corte_stock``; ver ``inventario/historico.py``.
+    """
+    producto = models.ForeignKey(Producto, on_delete=models.CASCADE, related_name='snapshots')
+    corte = models.DateTimeField('Corte')
+    stock = models.IntegerField('Stock')
+
+    class Meta:
+        verbose_name = 'Corte de stock'
+        verbose_name_plural = 'Cortes de stock'
+        constraints = [
+            models.UniqueConstraint(fields=['producto', 'corte'], name='inventario_snapshot_producto_corte'),
+        ]
+        indexes = [
+            models.Index(fields=['corte']),
+        ]
+
+    def __str__(self):
+        return f"{self.producto_id} @ {self.corte:%Y-%m-%d %H:%M}: {self.stock}"
+
+
+class ExistenciaUbicacion(models.Model):
+    """
+    Existencias de un producto en una ubicación. ``Producto.stock_actual`` es el agregado
+    mantenido de estas filas: ``registrar`` / ``registrar_lote`` mueven ambos en la misma
+    transacción y ``transferir`` solo mueve las de origen y destino.
+    """
+    producto = models.ForeignKey(Producto, on_delete=models.CASCADE, related_name='existencias')
+    ubicacion = models.ForeignKey(Ubicacion, on_delete=models.PROTECT, related_name='existencias')
+    cantidad = models.IntegerField('Cantidad', default=0)
+    actualizado_en = models.DateTimeField('Actualizado en', auto_now=True)
+
+    class Meta:
+        verbose_name = 'Existencia por ubicación'
+        verbose_name_plural = 'Existencias por ubicación'
+        constraints = [
+            models.UniqueConstraint(fields=['producto', 'ubicacion'], name='inventario_existencia_producto_ubicacion'),
+        ]
+        indexes = [
+            # "qué hay en el pasillo 3": recorre solo las filas de la ubicación
+            models.Index(fields=['ubicacion', 'producto']),
+        ]
+
+    def __str__(self):
+        return f"{self.producto_id} @ {self.ubicacion_id}: {self.cantidad}"
+
+
+class FragmentoStock(models.Model):
+    """
+    Uno de los ``Producto.fragmentos_stock`` contadores de un producto en una ubicación. Cada
+    movimiento suma en uno al azar, así escaneos simultáneos del mismo SKU no esperan el
+    mismo bloqueo. El stock real es ``stock_actual`` + estos contadores hasta que
+    ``plegar_fragmentos`` los pasa al producto y a ``ExistenciaUbicacion`` y los deja en cero.
+    """
+    producto = models.ForeignKey(Producto, on_delete=models.CASCADE, related_name='fragmentos')
+    ubicacion = models.ForeignKey(Ubicacion, on_delete=models.PROTECT, related_name='+')
+    fragmento = models.PositiveSmallIntegerField('Contador')
+    cantidad = models.IntegerField('Cantidad pendiente', default=0)
+
+    class Meta:
+        verbose_name = 'Contador de stock'
+        verbose_name_plural = 'Contadores de stock'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['producto', 'ubicacion', 'fragmento'], name='inventario_fragmento_producto_ubicacion',
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.producto_id} @ {self.ubicacion_id} #{self.fragmento}: {self.cantidad}"
+
+
+def _incrementar_fragmento(producto_id, ubicacion_id, fragmento, delta, using):
+    qs = FragmentoStock.objects.using(using).filter(
+        producto_id=producto_id, ubicacion_id=ubicacion_id, fragmento=fragmento,
+    )
+    if qs.update(cantidad=F('cantidad') + delta):
+        return
+    FragmentoStock.objects.using(using).bulk_create([
+        FragmentoStock(producto_id=producto_id, ubicacion_id=ubicacion_id, fragmento=fragmento),
+    ], ignore_conflicts=True)
+    qs.update(cantidad=F('cantidad') + delta)
+
+
+def plegar_fragmentos(ids=None, using=None):
+    """
+    Pasa lo acumulado en ``FragmentoStock`` (de los productos ``ids`` o de todos) a
+    ``stock_actual`` y a las existencias, con alertas y valuación, y deja los contadores en
+    cero. Devuelve el número de productos plegados.
+    """
+    pendientes = FragmentoStock.objects.using(using).exclude(cantidad=0)
+    if ids is not None:
+        pendientes = pendientes.filter(producto_id__in=ids)
+    productos = sorted(set(pendientes.values_list('producto_id', flat=True)))
+    for i in range(0, len(productos), TAMANO_BLOQUE_UPDATE):
+        bloque = productos[i:i + TAMANO_BLOQUE_UPDATE]
+        with transaction.atomic(using=using):
+            # mismo orden de bloqueo que los movimientos: primero el producto, luego sus contadores
+            list(
+                Producto.objects.using(using).select_for_update()
+                .filter(pk__in=bloque).order_by('pk').values_list('pk', flat=True)
+            )
+            filas = list(
+                FragmentoStock.objects.using(using).select_for_update()
+                .filter(producto_id__in=bloque).exclude(cantidad=0).order_by('pk')
+                .values_list('pk', 'producto_id', 'ubicacion_id', 'cantidad')
+            )
+            if not filas:
+                continue
+            FragmentoStock.objects.using(using).filter(pk__in=[f[0] for f in filas]).update(cantidad=0)
+            deltas, existencias = {}, {}
+            for _, producto_id, ubicacion_id, cantidad in filas:
+                deltas[producto_id] = deltas.get(producto_id, 0) + cantidad
+                clave = (producto_id, ubicacion_id)
+                existencias[clave] = existencias.get(clave, 0) + cantidad
+            # lo plegado ya ocurrió: se aplica aunque deje algún stock negativo
+            _aplicar_deltas_stock(deltas, True, using)
+            incrementar_existencias(existencias, True, using)
+    return len(productos)
+
+
+class AlertaStock(models.Model):
+    """
+    Productos con ``stock_actual <= punto_reorden``. La tabla se mantiene al cruzar el umbral
+    (``MovimientoStock.registrar`` / ``registrar_lote`` y ``Producto.save``), así el tablero
+    y ``manage.py notificar_bajo_stock`` leen este conjunto chico sin recorrer ``Producto``.
+    """
+    producto = models.OneToOneField(Producto, on_delete=models.CASCADE, related_name='alerta_stock')
+    desde = models.DateTimeField('Bajo el punto de reorden desde', default=timezone.now)
+    notificada_en = models.DateTimeField('Notificada en', blank=True, null=True)
+
+    class Meta:
+        verbose_name = 'Alerta de stock'
+        verbose_name_plural = 'Alertas de stock'
+        ordering = ['desde']
+
+    def __str__(self):
+        return f"{self.producto_id} bajo punto de reorden desde {self.desde:%Y-%m-%d %H:%M}"
+
+
+def _actualizar_alertas(cambios, using):
+    """
+    ``cambios``: ``{producto_id: (stock_antes, stock_despues, punto_reorden)}``. Solo escribe
+    cuando el stock cruza el punto de reorden (en cualquier sentido).
+    """
+    entran, salen = [], []
+    for pk, (antes, despues, punto) in cambios.items():
+        if punto is None:
+            continue
+        if despues <= punto < antes:
+            entran.append(pk)
+        elif antes <= punto < despues:
+            salen.append(pk)
+    if entran:
+        AlertaStock.objects.using(using).bulk_create(
+            [AlertaStock(producto_id=pk) for pk in entran], ignore_conflicts=True
+        )
+    if salen:
+        AlertaStock.objects.using(using).filter(producto_id__in=salen).delete()
+
+
+def sincronizar_alertas(ids=None, using=None):
+    """
+    Deja ``AlertaStock`` coherente para los productos ``ids`` (todos si es ``None``). Para
+    cambios que no pasan por un movimiento: edición del punto de reorden, importación,
+    reconstrucción completa (``notificar_bajo_stock --reconstruir``).
+    """
+    productos = Producto.objects.using(using)
+    alertas = AlertaStock.objects.using(using)
+    if ids is not None:
+        productos = productos.filter(pk__in=ids)
+        alertas = alertas.filter(producto_id__in=ids)
+    bajo = productos.filter(punto_reorden__isnull=False, stock_actual__lte=F('punto_reorden'))
+    alertas.exclude(producto__in=bajo.values('pk')).delete()
+    nuevos = bajo.filter(alerta_stock__isnull=True).values_list('pk', flat=True)
+    AlertaStock.objects.using(using).bulk_create(
+        [AlertaStock(producto_id=pk) for pk in nuevos], ignore_conflicts=True
+    )
+
+
+# dimensiones (clave) + columnas que determinan el valor de un producto en ValuacionInventario
+CAMPOS_VALUACION = ('proveedor_principal_id', 'tipo_producto', 'estado', 'stock_actual', 'costo_unitario')
+
+
+class ValuacionInventario(models.Model):
+    """
+    Valor del inventario (``stock_actual * costo_unitario``) acumulado por proveedor, tipo y
+    estado. Se mantiene con deltas desde los movimientos y ``Producto.save``; ver
+    ``inventario/valuacion.py`` y ``manage.py reconciliar_valuacion``.
+    """
+    proveedor = models.ForeignKey(Proveedor, on_delete=models.CASCADE, blank=True, null=True)
+    tipo_producto = models.CharField('Tipo de producto', max_length=20, choices=Producto.TipoProducto.choices)
+    estado = models.CharField('Estado', max_length=20, choices=Producto.Estado.choices)
+    productos = models.IntegerField('Productos', default=0)
+    unidades = models.BigIntegerField('Unidades', default=0)
+    valor = models.DecimalField('Valor', max_digits=18, decimal_places=2, default=0)
+
+    class Meta:
+        verbose_name = 'Valuación de inventario'
+        verbose_name_plural = 'Valuación de inventario'
+        constraints = [
+            # proveedor nulo también cuenta como clave: dos restricciones parciales
+            models.UniqueConstraint(
+                fields=['proveedor', 'tipo_producto', 'estado'], condition=Q(proveedor__isnull=False),
+                name='inventario_valuacion_clave',
+            ),
+            models.UniqueConstraint(
+                fields=['tipo_producto', 'estado'], condition=Q(proveedor__isnull=True),
+                name='inventario_valuacion_clave_sin_proveedor',
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.proveedor_id or '-'} / {self.tipo_producto} / {self.estado}: {self.valor}"
+
+
+def _valor(stock, costo):
+    return (costo or 0) * stock
+
+
+def _sumar_valuacion(deltas, fila, signo):
+    """Suma (``signo`` = 1) o resta la contribución de ``fila`` (valores de ``CAMPOS_VALUACION``)."""
+    proveedor, tipo, estado, stock, costo = fila
+    d = deltas.setdefault((proveedor, tipo, estado), [0, 0, 0])
+    d[0] += signo
+    d[1] += signo * stock
+    d[2] += signo * _valor(stock, costo)
+
+
+def _deltas_movimiento(filas):
+    """``filas``: ``[((proveedor, tipo, estado), cantidad, costo)]``."""
+    deltas = {}
+    for clave, cantidad, costo in filas:
+        d = deltas.setdefault(tuple(clave), [0, 0, 0])
+        d[1] += cantidad
+        d[2] += _valor(cantidad, costo)
+    return deltas
+
+
+def _aplicar_deltas_valuacion(deltas, using):
+    for (proveedor, tipo, estado), (productos, unidades, valor) in deltas.items():
+        if not (productos or unidades or valor):
+            continue
+        filtro = {'proveedor_id': proveedor, 'tipo_producto': tipo, 'estado': estado}
+        cambios = {
+            'productos': F('productos') + productos,
+            'unidades': F('unidades') + unidades,
+            'valor': F('valor') + valor,
+        }
+        filas = ValuacionInventario.objects.using(using)
+        if filas.filter(**filtro).update(**cambios):
+            continue
+        try:
+            with transaction.atomic(using=using):
+                filas.create(**filtro, productos=productos, unidades=unidades, valor=valor)
+        except IntegrityError:
+            # otro proceso creó la fila entre el UPDATE y el INSERT
+            filas.filter(**filtro).update(**cambios)
+
+
+def valuar_productos(productos, signo, using):
+    """Suma (``signo`` = 1) o resta la contribución completa de instancias de ``Producto``."""
+    deltas = {}
+    for producto in productos:
+        _sumar_valuacion(deltas, tuple(getattr(producto, c) for c in CAMPOS_VALUACION), signo)
+    registrar_deltas_valuacion(deltas, using)
+
+
+def registrar_deltas_valuacion(deltas, using):
+    """
+    Aplica los deltas al confirmar la transacción en curso: las filas de la valuación son
+    pocas y muy disputadas, así no quedan bloqueadas mientras dura el movimiento. Si el
+    proceso cae entre el commit y el delta, ``reconciliar_valuacion`` corrige la deriva.
+    """
+    deltas = {clave: d for clave, d in deltas.items() if any(d)}
+    if deltas:
+        transaction.on_commit(lambda: _aplicar_deltas_valuacion(deltas, using), using=using)
+
+
+# nombre provisional de un archivo que aún no se sube al storage definitivo
+PREFIJO_PENDIENTE = 'pendiente/'
+
+
+class TrabajoMedia(models.Model):
+    """
+    Subida diferida de un archivo al storage remoto. El formulario guarda el contenido aquí
+    y deja en el campo el nombre ``pendiente/<nombre final>``; ``manage.py procesar_media``
+    lo sube y reemplaza la referencia. Ver ``inventario/media.py``.
+    """
+    class Estado(models.TextChoices):
+        PENDIENTE = 'pendiente', 'Pendiente'
+        PROCESANDO = 'procesando', 'Procesando'
+        COMPLETADO = 'completado', 'Completado'
+        FALLIDO = 'fallido', 'Fallido'
+
+    modelo = models.CharField('Modelo', max_length=100)  # app_label.Modelo
+    objeto_id = models.CharField('Objeto', max_length=64)
+    campo = models.CharField('Campo', max_length=100)
+    nombre = models.CharField('Nombre destino', max_length=255)
+    contenido = models.BinaryField('Contenido')
+    estado = models.CharField(max_length=12, choices=Estado.choices, default=Estado.PENDIENTE)
+    intentos = models.PositiveSmallIntegerField('Intentos', default=0)
+    error = models.TextField('Último error', blank=True)
+    disponible_en = models.DateTimeField('Disponible en', default=timezone.now)
+    tomado_en = models.DateTimeField('Tomado en', blank=True, null=True)
+    creado_en = models.DateTimeField('Creado en', auto_now_add=True)
+    actualizado_en = models.DateTimeField('Actualizado en', auto_now=True)
+
+    class Meta:
+        verbose_name = 'Trabajo de media'
+        verbose_name_plural = 'Trabajos de media'
+        indexes = [
+            models.Index(fields=['estado', 'disponible_en']),
+        ]
+
+    def __str__(self):
+        return f"{self.modelo}#{self.objeto_id}.{self.campo} ({self.estado})"
+
+
+class StockInsuficiente(ValidationError):
+    pass
+
+
+# el stock total de ``producto_ids`` cambió (kwargs: producto_ids, using); ver inventario/signals.py
+stock_cambiado = Signal()
+
+
+# productos por sentencia UPDATE en registrar_lote (acota el número de parámetros)
+TAMANO_BLOQUE_UPDATE = 200
+
+
+def _incrementar_stock_lote(deltas, permitir_negativo, using):
+    """
+    UPDATE único con ``CASE id WHEN ... THEN stock_actual + delta`` para un bloque de productos.
+    Sin negativos, una salida tampoco puede tomar unidades reservadas (``stock_reservado``).
+    """
+    qs = Producto.objects.using(using).filter(pk__in=deltas)
+    negativos = {pk: d for pk, d in deltas.items() if d < 0}
+    if not permitir_negativo and negativos:
+        guardia = Q(pk__in=[pk for pk in deltas if pk not in negativos])
+        for pk, d in negativos.items():
+            guardia |= Q(pk=pk, stock_actual__gte=F('stock_reservado') - d)
+        qs = qs.filter(guardia)
+    incremento = Case(
+        *[When(pk=pk, then=Value(d)) for pk, d in deltas.items()],
+        default=Value(0), output_field=models.IntegerField(),
+    )
+    actualizados = qs.update(stock_actual=F('stock_actual') + incremento, updated_at=timezone.now())
+    if actualizados != len(deltas):
+        sin_stock = (
+            Producto.objects.using(using).filter(pk__in=negativos)
+            .only('nombre', 'sku', 'stock_actual', 'stock_reservado')
+        )
+        detalle = ', '.join(
+            f'{p} (hay {p.stock_actual - p.stock_reservado} disponibles, se piden {-negativos[p.pk]})'
+            for p in sin_stock if p.stock_actual - p.stock_reservado < -negativos[p.pk]
+        )
+        raise StockInsuficiente(f'Stock insuficiente: {detalle}.')
+
+
+def _aplicar_deltas_stock(deltas, permitir_negativo, using):
+    """
+    ``deltas``: ``{producto_id: delta}``. Bloquea los productos, aplica los deltas y mantiene
+    alertas y valuación. Devuelve las filas ya actualizadas
+    (``pk, stock_actual, punto_reorden, *dimensiones, costo_unitario, ubicacion_principal``).
+    """
+    # bloqueo en orden de id: dos lotes concurrentes no pueden cruzarse (deadlock)
+    existentes = set(
+        Producto.objects.using(using).select_for_update()
+        .filter(pk__in=deltas).order_by('pk').values_list('pk', flat=True)
+    )
+    faltantes = set(deltas) - existentes
+    if faltantes:
+        raise Producto.DoesNotExist(f'Productos inexistentes: {sorted(faltantes)}')
+
+    ids = sorted(deltas)
+    for i in range(0, len(ids), TAMANO_BLOQUE_UPDATE):
+        bloque = {pk: deltas[pk] for pk in ids[i:i + TAMANO_BLOQUE_UPDATE] if deltas[pk]}
+        if bloque:
+            _incrementar_stock_lote(bloque, permitir_negativo, using)
+    # estado ya actualizado de las filas bloqueadas arriba: alertas y valuación
+    filas = list(
+        Producto.objects.using(using).filter(pk__in=deltas)
+        .values_list('pk', 'stock_actual', 'punto_reorden', *CAMPOS_VALUACION[:3], 'costo_unitario',
+                     'ubicacion_principal')
+    )
+    _actualizar_alertas({
+        pk: (stock - deltas[pk], stock, punto) for pk, stock, punto, *_ in filas
+    }, using)
+    registrar_deltas_valuacion(
+        _deltas_movimiento([(f[3:6], deltas[f[0]], f[6]) for f in filas]), using
+    )
+    return filas
+
+
+def incrementar_existencias(cambios, permitir_negativo, using):
+    """
+    ``cambios``: ``{(producto_id, ubicacion_id): delta}``. Crea las filas que falten y aplica
+    los deltas con un UPDATE por bloque; las filas se bloquean en orden de id. Sin
+    ``permitir_negativo``, ``StockInsuficiente`` si una existencia que baja queda negativa.
+    """
+    cambios = {clave: delta for clave, delta in cambios.items() if delta}
+    qs = ExistenciaUbicacion.objects.using(using)
+    claves = sorted(cambios)
+    for i in range(0, len(claves), TAMANO_BLOQUE_UPDATE):
+        bloque = claves[i:i + TAMANO_BLOQUE_UPDATE]
+
+        def leer(pares):
+            filtro = Q()
+            for producto_id, ubicacion_id in pares:
+                filtro |= Q(producto_id=producto_id, ubicacion_id=ubicacion_id)
+            filas = qs.select_for_update().filter(filtro).order_by('pk')
+            return {(p, u): pk for pk, p, u in filas.values_list('pk', 'producto_id', 'ubicacion_id')}
+
+        filas = leer(bloque)
+        nuevas = [clave for clave in bloque if clave not in filas]
+        if nuevas:
+            qs.bulk_create(
+                [ExistenciaUbicacion(producto_id=p, ubicacion_id=u) for p, u in nuevas], ignore_conflicts=True,
+            )
+            filas.update(leer(nuevas))
+        incremento = Case(
+            *[When(pk=filas[clave], then=Value(cambios[clave])) for clave in bloque],
+            default=Value(0), output_field=models.IntegerField(),
+        )
+        qs.filter(pk__in=filas.values()).update(cantidad=F('cantidad') + incremento, actualizado_en=timezone.now())
+        if permitir_negativo:
+            continue
+        retiros = {filas[clave]: -cambios[clave] for clave in bloque if cambios[clave] < 0}
+        negativas = qs.filter(pk__in=retiros, cantidad__lt=0).select_related('producto', 'ubicacion')
+        if negativas:
+            detalle = ', '.join(
+                f'{e.producto} en {e.ubicacion} (hay {e.cantidad + retiros[e.pk]}, se piden {retiros[e.pk]})'
+                for e in negativas
+            )
+            raise StockInsuficiente(f'Stock insuficiente: {detalle}.')
+
+
+def _update_returning(connection):
+    # UPDATE ... RETURNING: PostgreSQL y SQLite >= 3.35 (misma versión que INSERT ... RETURNING)
+    if connection.vendor == 'postgresql':
+        return True
+    return connection.vendor == 'sqlite' and connection.features.can_return_columns_from_insert
+
+
+def _incrementar_stock(producto_id, delta, permitir_negativo, using, devolver=('stock_actual',)):
+    """
+    ``UPDATE producto SET stock_actual = stock_actual + delta`` atómico. Devuelve la tupla de
+    columnas ``devolver`` ya actualizadas, o ``None`` si la fila no existe o el stock quedaría
+    negativo (o por debajo de lo reservado) sin permitirlo.
+    """
+    connection = connections[using]
+    ahora = timezone.now()
+    condicion_stock = not permitir_negativo and delta < 0
+
+    if _update_returning(connection):
+        qn = connection.ops.quote_name
+        sql = (
+            f'UPDATE {qn(Producto._meta.db_table)} '
+            f'SET {qn("stock_actual")} = {qn("stock_actual")} + %s, {qn("updated_at")} = %s '
+            f'WHERE {qn("id")} = %s'
+        )
+        params = [delta, connection.ops.adapt_datetimefield_value(ahora), producto_id]
+        if condicion_stock:
+            sql += f' AND {qn("stock_actual")} - {qn("stock_reservado")} >= %s'
+            params.append(-delta)
+        sql += ' RETURNING ' + ', '.join(qn(c) for c in devolver)
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            return cursor.fetchone()
+
+    qs = Producto.objects.using(using).filter(pk=producto_id)
+    if condicion_stock:
+        qs = qs.filter(stock_actual__gte=F('stock_reservado') - delta)
+    if not qs.update(stock_actual=F('stock_actual') + delta, updated_at=ahora):
+        return None
+    # la fila queda bloqueada por este UPDATE hasta el fin de la transacción
+    return Producto.objects.using(using).filter(pk=producto_id).values_list(*devolver).get()
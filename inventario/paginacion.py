@@ -0,0 +1,169 @@
+"""
+Paginación por cursor (keyset) y conteo estimado.
+
+En lugar de OFFSET, cada página filtra a partir de los valores de orden de la última
+fila vista, de modo que el costo de la página N no crece con N. El cursor es opaco
+para el cliente (JSON en base64url).
+
+Las columnas de orden deben volver exactas desde JSON: una columna float4 (``real``) se
+ordena como ``Cast(..., FloatField())`` (double), si no la fila límite puede repetirse u
+omitirse en la página siguiente (ver ``busqueda._con_orden``).
+"""
+import base64
+import datetime
+import decimal
+import json
+import uuid
+
+from django.db import connections
+from django.db.models import Q
+
+
+class CursorInvalido(ValueError):
+    pass
+
+
+def codificar_cursor(valores):
+    def _plano(v):
+        if isinstance(v, (datetime.datetime, datetime.date)):
+            return v.isoformat()
+        if isinstance(v, (decimal.Decimal, uuid.UUID)):
+            return str(v)
+        return v
+    crudo = json.dumps([_plano(v) for v in valores], separators=(',', ':'))
+    return base64.urlsafe_b64encode(crudo.encode()).decode().rstrip('=')
+
+
+def decodificar_cursor(cursor, n):
+    try:
+        relleno = '=' * (-len(cursor) % 4)
+        valores = json.loads(base64.urlsafe_b64decode(cursor + relleno))
+    except (ValueError, TypeError) as exc:
+        raise CursorInvalido(cursor) from exc
+    if not isinstance(valores, list) or len(valores) != n:
+        raise CursorInvalido(cursor)
+    return valores
+
+
+def _orden(queryset):
+    orden = list(queryset.query.order_by) or list(queryset.model._meta.ordering)
+    if not orden:
+        raise ValueError('La paginación por cursor requiere un order_by determinista.')
+    campos = []
+    for o in orden:
+        if not isinstance(o, str):
+            raise ValueError('Solo se admiten nombres de campo en order_by para paginar por cursor.')
+        campos.append((o.lstrip('-'), o.startswith('-')))
+    return campos
+
+
+def filtro_despues_de(campos, valores):
+    """
+    (a, b, c) > (va, vb, vc) respetando la dirección de cada columna:
+    a > va  OR  (a = va AND b > vb)  OR  (a = va AND b = vb AND c > vc)
+    """
+    condicion = Q()
+    iguales = Q()
+    for (campo, desc), valor in zip(campos, valores):
+        lookup = 'lt' if desc else 'gt'
+        condicion |= iguales & Q(**{f'{campo}__{lookup}': valor})
+        iguales &= Q(**{campo: valor})
+    return condicion
+
+
+def _valor(obj, campo):
+    if isinstance(obj, dict):
+        return obj[campo]
+    if isinstance(obj, (list, tuple)):
+        raise ValueError('Usa .values() o instancias; values_list() no expone los nombres de campo.')
+    return getattr(obj, campo)
+
+
+class PaginaCursor:
+    """Página de resultados; interfaz mínima compatible con las plantillas de ListView."""
+
+    def __init__(self, object_list, siguiente, cursor_actual, paginator):
+        self.object_list = object_list
+        self.siguiente = siguiente
+        self.cursor_actual = cursor_actual
+        self.paginator = paginator
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self):
+        return self.siguiente is not None
+
+    def has_previous(self):
+        return self.cursor_actual is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+class KeysetPaginator:
+    """
+    Pagina un QuerySet ordenado. El orden (``order_by``) debe terminar en una columna
+    única (p. ej. ``id``) para que el cursor sea determinista.
+    """
+
+    def __init__(self, queryset, por_pagina, modo_conteo='estimado', tope_conteo=1000):
+        self.queryset = queryset
+        self.por_pagina = por_pagina
+        self.campos = _orden(queryset)
+        self.modo_conteo = modo_conteo
+        self.tope_conteo = tope_conteo
+        self._conteo = None
+
+    def filtrar(self, cursor=None):
+        """QuerySet (sin cortar) de las filas posteriores a ``cursor``."""
+        if not cursor:
+            return self.queryset
+        valores = decodificar_cursor(cursor, len(self.campos))
+        return self.queryset.filter(filtro_despues_de(self.campos, valores))
+
+    def pagina(self, cursor=None):
+        filas = list(self.filtrar(cursor)[:self.por_pagina + 1])
+        siguiente = None
+        if len(filas) > self.por_pagina:
+            filas = filas[:self.por_pagina]
+            ultimo = filas[-1]
+            siguiente = codificar_cursor([_valor(ultimo, c) for c, _ in self.campos])
+        return PaginaCursor(filas, siguiente, cursor or None, self)
+
+    def conteo(self):
+        """``(total, es_aproximado)`` según ``modo_conteo``; ``(None, True)`` en modo 'ninguno'."""
+        if self._conteo is None:
+            if self.modo_conteo == 'exacto':
+                self._conteo = (self.queryset.count(), False)
+            elif self.modo_conteo == 'estimado':
+                self._conteo = estimar_total(self.queryset, self.tope_conteo)
+            else:
+                self._conteo = (None, True)
+        return self._conteo
+
+    # compatibilidad con el contexto estándar de ListView (paginator.count)
+    @property
+    def count(self):
+        return self.conteo()[0]
+
+
+def estimar_total(queryset, tope=1000):
+    """
+    Conteo barato:
+    - PostgreSQL: filas estimadas por el planificador (EXPLAIN), sin ejecutar la consulta.
+    - Resto: COUNT(*) acotado a ``tope`` + 1 filas; si se alcanza el tope el total es aproximado.
+    """
+    qs = queryset.order_by()
+    if connections[qs.db].vendor == 'postgresql':
+        plan = json.loads(qs.explain(format='json'))
+        if isinstance(plan, list):
+            plan = plan[0]
+        return int(plan['Plan']['Plan Rows']), True
+    n = qs[:tope + 1].count()
+    if n > tope:
+        return tope, True
+    return n, False
@@ -0,0 +1,53 @@
+"""
+Precio efectivo de venta: ``precio_oferta`` dentro de la ventana [``oferta_inicio``, ``oferta_fin``)
+y ``precio_publico`` fuera de ella (extremos nulos = ventana abierta).
+
+Se guarda precalculado en ``Producto.precio_vigente`` (indexado) junto con
+``precio_vigente_hasta``: el próximo instante en que ese precio deja de ser correcto (abre o
+cierra una oferta). ``Producto.save()`` lo recalcula y ``manage.py refrescar_precios``
+(programado cada pocos minutos) actualiza, con un solo UPDATE, solo las filas cuyo
+``precio_vigente_hasta`` ya pasó.
+
+Las expresiones no dependen de la clase del modelo, así las reutiliza la migración.
+"""
+from django.db.models import Case, DateTimeField, F, Q, When
+from django.utils import timezone
+
+CAMPOS_PRECIO = ('precio_publico', 'precio_oferta', 'oferta_inicio', 'oferta_fin')
+
+
+def calcular(publico, oferta, inicio, fin, ahora=None):
+    """``(precio_vigente, precio_vigente_hasta)`` para los valores dados."""
+    ahora = ahora or timezone.now()
+    if oferta is None:
+        return publico, None
+    if inicio is not None and ahora < inicio:
+        return publico, inicio
+    if fin is not None and ahora >= fin:
+        return publico, None
+    return oferta, fin
+
+
+def oferta_activa(ahora):
+    return (
+        Q(precio_oferta__isnull=False)
+        & (Q(oferta_inicio__isnull=True) | Q(oferta_inicio__lte=ahora))
+        & (Q(oferta_fin__isnull=True) | Q(oferta_fin__gt=ahora))
+    )
+
+
+def precio_efectivo(ahora):
+    return Case(When(oferta_activa(ahora), then=F('precio_oferta')), default=F('precio_publico'))
+
+
+def valores_update(ahora):
+    """kwargs de ``QuerySet.update()`` que dejan ``precio_vigente`` / ``_hasta`` correctos a ``ahora``."""
+    return {
+        'precio_vigente': precio_efectivo(ahora),
+        'precio_vigente_hasta': Case(
+            When(Q(precio_oferta__isnull=False, oferta_inicio__gt=ahora), then=F('oferta_inicio')),
+            When(oferta_activa(ahora), then=F('oferta_fin')),
+            default=None,
+            output_field=DateTimeField(),
+        ),
+    }
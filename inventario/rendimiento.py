@@ -0,0 +1,189 @@
+"""
+Medición de latencia y consultas de las rutas calientes (``manage.py medir_rendimiento``).
+
+Cada escenario es una petición HTTP real (``django.test.Client``, con middleware, sesión y
+plantillas) contra la base configurada, normalmente poblada con ``generar_carga``. Por
+escenario se reportan p50 / p95 / p99 en milisegundos y el número de consultas SQL.
+
+Las peticiones que escriben (``ajuste_post``) corren dentro de una transacción que se
+revierte: no alteran el stock ni el historial. Por eso tampoco se miden los
+``on_commit`` (deltas de valuación) que dispararía una escritura real.
+
+El resultado es un JSON (``resultado()``) que ``comparar()`` contrasta con una corrida base.
+"""
+import contextlib
+import datetime
+import platform
+import random
+import statistics
+import time
+
+import django
+from django.contrib.auth import get_user_model
+from django.db import connection, transaction
+from django.urls import reverse
+
+from .consultas import registrar_consultas
+from .models import MovimientoStock, Producto
+
+VERSION = 1
+
+TERMINOS = ['tornillo', 'balero 6204', 'filtro', 'bujía ngk', 'manguera alta presión', 'm8', 'válvula', 'sensor']
+
+
+class Contexto:
+    """Muestra determinista de productos existentes para armar las URLs."""
+
+    def __init__(self, semilla=42, muestras=200):
+        self.rnd = random.Random(semilla)
+        rango = Producto.objects.order_by().values_list('pk', flat=True)
+        minimo, maximo = rango.order_by('pk').first(), rango.order_by('-pk').first()
+        self.productos = []
+        if minimo is not None:
+            columnas = ('internal_id', 'sku', 'codigo_identificador', 'nombre')
+            vistos = set()
+            for _ in range(muestras):
+                # una búsqueda por índice en lugar de ORDER BY RANDOM() sobre toda la tabla
+                fila = (
+                    Producto.objects.filter(pk__gte=self.rnd.randint(minimo, maximo))
+                    .order_by('pk').values('pk', *columnas).first()
+                )
+                if fila and fila['pk'] not in vistos:
+                    vistos.add(fila['pk'])
+                    self.productos.append(fila)
+
+    def producto(self, i):
+        return self.productos[i % len(self.productos)]
+
+    def termino(self, i):
+        if i % 2:
+            return TERMINOS[i % len(TERMINOS)]
+        return self.producto(i)['nombre'].split()[0]
+
+
+def _get(nombre_url, params=None, args=None):
+    def armar(ctx, i):
+        url = reverse(nombre_url, args=args(ctx, i) if args else None)
+        return 'get', url, params(ctx, i) if params else {}
+    return armar
+
+
+def _por_producto(ctx, i):
+    return [ctx.producto(i)['internal_id']]
+
+
+def _ajuste_post(ctx, i):
+    url = reverse('inventario:ajuste', args=_por_producto(ctx, i))
+    return 'post', url, {'accion': 'add', 'cantidad': 1, 'motivo': 'medición de rendimiento'}
+
+
+# nombre -> (armar(ctx, i) -> (método, url, datos), requiere productos, se revierte)
+ESCENARIOS = {
+    'buscar': (_get('inventario:buscar', lambda ctx, i: {'q': ctx.termino(i)}), True, False),
+    'buscar_codigo': (_get('inventario:buscar', lambda ctx, i: {'q': ctx.producto(i)['sku']}), True, False),
+    'buscar_sin_filtro': (_get('inventario:buscar'), False, False),
+    'scan': (_get('inventario:scan_result', lambda ctx, i: {'code': ctx.producto(i)['codigo_identificador']}), True, False),
+    'scan_inexistente': (_get('inventario:scan_result', lambda ctx, i: {'code': f'NOEXISTE{i}'}), False, False),
+    'ajuste_get': (_get('inventario:ajuste', args=_por_producto), True, False),
+    'ajuste_post': (_ajuste_post, True, True),
+    'admin_productos': (_get('admin:inventario_producto_changelist'), False, False),
+    'admin_productos_busqueda': (
+        _get('admin:inventario_producto_changelist', lambda ctx, i: {'q': ctx.termino(i)}), True, False,
+    ),
+    'admin_movimientos': (_get('admin:inventario_movimientostock_changelist'), False, False),
+    'admin_usuarios': (_get('admin:usuarios_customuser_changelist'), False, False),
+}
+
+
+@contextlib.contextmanager
+def _revertido():
+    with transaction.atomic():
+        yield
+        transaction.set_rollback(True)
+
+
+def _percentil(valores, p):
+    if len(valores) == 1:
+        return valores[0]
+    return statistics.quantiles(valores, n=100, method='inclusive')[p - 1]
+
+
+def medir(cliente, ctx, nombre, repeticiones=30, calentamiento=3):
+    armar, requiere_productos, revertir = ESCENARIOS[nombre]
+    if requiere_productos and not ctx.productos:
+        return None
+    tiempos, consultas, estados = [], [], {}
+    for i in range(calentamiento + repeticiones):
+        metodo, url, datos = armar(ctx, i)
+        with registrar_consultas() as registro:
+            with _revertido() if revertir else contextlib.nullcontext():
+                inicio = time.perf_counter()
+                response = getattr(cliente, metodo)(url, datos)
+                if response.streaming:
+                    b''.join(response.streaming_content)
+                duracion = time.perf_counter() - inicio
+        if i < calentamiento:
+            continue
+        tiempos.append(duracion * 1000)
+        consultas.append(registro.total)
+        estados[str(response.status_code)] = estados.get(str(response.status_code), 0) + 1
+    return {
+        'p50_ms': round(_percentil(tiempos, 50), 2),
+        'p95_ms': round(_percentil(tiempos, 95), 2),
+        'p99_ms': round(_percentil(tiempos, 99), 2),
+        'media_ms': round(statistics.fmean(tiempos), 2),
+        'max_ms': round(max(tiempos), 2),
+        'consultas_p50': statistics.median_low(consultas),
+        'consultas_max': max(consultas),
+        'estados': estados,
+    }
+
+
+def volumen():
+    return {
+        'productos': Producto.objects.count(),
+        'movimientos': MovimientoStock.objects.count(),
+        'usuarios': get_user_model().objects.count(),
+    }
+
+
+def resultado(cliente, escenarios, repeticiones=30, calentamiento=3, semilla=42, progreso=None):
+    ctx = Contexto(semilla)
+    medidos = {}
+    for nombre in escenarios:
+        medidos[nombre] = medir(cliente, ctx, nombre, repeticiones, calentamiento)
+        if progreso:
+            progreso(nombre, medidos[nombre])
+    return {
+        'version': VERSION,
+        'fecha': datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='seconds'),
+        'entorno': {
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'base_de_datos': connection.vendor,
+            'maquina': platform.node(),
+        },
+        'volumen': volumen(),
+        'repeticiones': repeticiones,
+        'calentamiento': calentamiento,
+        'semilla': semilla,
+        'escenarios': {n: r for n, r in medidos.items() if r is not None},
+    }
+
+
+def comparar(actual, base, tolerancia=0.2):
+    """
+    ``[(escenario, métrica, base, actual)]`` de lo que empeoró: p50 / p95 más de
+    ``tolerancia`` (fracción) o cualquier consulta adicional.
+    """
+    regresiones = []
+    for nombre, medido in actual['escenarios'].items():
+        previo = base.get('escenarios', {}).get(nombre)
+        if not previo:
+            continue
+        for metrica in ('p50_ms', 'p95_ms'):
+            if medido[metrica] > previo[metrica] * (1 + tolerancia):
+                regresiones.append((nombre, metrica, previo[metrica], medido[metrica]))
+        if medido['consultas_max'] > previo['consultas_max']:
+            regresiones.append((nombre, 'consultas_max', previo['consultas_max'], medido['consultas_max']))
+    return regresiones
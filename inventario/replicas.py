@@ -0,0 +1,182 @@
+"""
+Lecturas en réplicas con "read-your-writes".
+
+Solo lee de una réplica el código marcado como de lectura: las vistas con
+``LecturaReplicaMixin`` (en GET / HEAD, incluido el contenido en streaming) y lo que corre
+dentro de ``en_replica()`` (comandos de reportes y exportación). Todo lo demás, las
+escrituras y cualquier lectura dentro de una transacción siguen en ``default``.
+
+``ReplicasMiddleware`` fija a la primaria, por ``INVENTARIO_REPLICAS_FIJAR`` segundos, al
+navegador (cookie) y al usuario (caché; en sus otros dispositivos, en las vistas que ya
+cargan al usuario) que acaban de escribir: después de un ajuste o de editar un producto las
+pantallas muestran el dato nuevo aunque la réplica vaya atrasada.
+
+Configuración en settings (sin ``INVENTARIO_REPLICAS`` todo va a ``default``)::
+
+    DATABASES['replica'] = {..., 'TEST': {'MIRROR': 'default'}}
+    DATABASE_ROUTERS = ['inventario.replicas.RouterReplicas']
+    MIDDLEWARE += ['inventario.replicas.ReplicasMiddleware']  # después de AuthenticationMiddleware
+
+    INVENTARIO_REPLICAS = ['replica']   # alias de solo lectura
+    INVENTARIO_REPLICAS_FIJAR = 10      # segundos en la primaria después de escribir
+"""
+import contextlib
+import contextvars
+import random
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.utils.functional import empty
+
+COOKIE = 'inventario_primaria'
+
+# alias de lectura de la petición / comando en curso (None: primaria)
+_lectura = contextvars.ContextVar('inventario_replicas_lectura', default=None)
+# la petición en curso escribió en la base
+_escritura = contextvars.ContextVar('inventario_replicas_escritura', default=None)
+# la petición en curso viene de escribir (cookie): no usa réplicas
+_fijado = contextvars.ContextVar('inventario_replicas_fijado', default=False)
+_peticion = contextvars.ContextVar('inventario_replicas_peticion', default=None)
+
+
+def replicas():
+    return list(getattr(settings, 'INVENTARIO_REPLICAS', []))
+
+
+def segundos_fijado():
+    return getattr(settings, 'INVENTARIO_REPLICAS_FIJAR', 10)
+
+
+def elegir_replica():
+    """Alias de réplica para una unidad de trabajo, o ``None`` si no corresponde usar una."""
+    aliases = replicas()
+    if not aliases or _fijado.get() or _usuario_fijado():
+        return None
+    return random.choice(aliases)
+
+
+def _usuario_fijado():
+    # solo si la petición ya cargó al usuario: esta revisión no agrega consultas
+    request = _peticion.get()
+    user = getattr(request, 'user', None) if request is not None else None
+    if user is None or getattr(user, '_wrapped', None) is empty:
+        return False
+    return user.is_authenticated and bool(cache.get(_clave_usuario(user.pk)))
+
+
+@contextlib.contextmanager
+def en_replica(alias=None):
+    """Las lecturas de este bloque van a ``alias`` (por defecto una réplica al azar)."""
+    token = _lectura.set(alias or elegir_replica())
+    try:
+        yield
+    finally:
+        _lectura.reset(token)
+
+
+@contextlib.contextmanager
+def en_primaria():
+    """Las lecturas de este bloque van a la primaria (p. ej. para poblar una caché)."""
+    token = _lectura.set(None)
+    try:
+        yield
+    finally:
+        _lectura.reset(token)
+
+
+def _iterar_en(alias, iterable):
+    # el streaming se consume fuera de la vista: cada trozo se produce en el mismo alias
+    iterador = iter(iterable)
+    while True:
+        token = _lectura.set(alias)
+        try:
+            parte = next(iterador)
+        except StopIteration:
+            return
+        finally:
+            _lectura.reset(token)
+        yield parte
+
+
+class RouterReplicas:
+
+    def db_for_read(self, model, **hints):
+        alias = _lectura.get()
+        if alias is None or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return None
+        return alias
+
+    def db_for_write(self, model, **hints):
+        marca = _escritura.get()
+        if marca is not None:
+            marca['escribio'] = True
+        return None
+
+    def allow_relation(self, obj1, obj2, **hints):
+        bases = {DEFAULT_DB_ALIAS, *replicas()}
+        if obj1._state.db in bases and obj2._state.db in bases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # las réplicas se alimentan de la primaria, no se migran
+        return False if db in replicas() else None
+
+
+class LecturaReplicaMixin:
+    """Vista de solo lectura: sus GET / HEAD leen de una réplica (salvo petición fijada)."""
+
+    def dispatch(self, request, *args, **kwargs):
+        if request.method not in ('GET', 'HEAD'):
+            return super().dispatch(request, *args, **kwargs)
+        alias = elegir_replica()
+        if alias is None:
+            return super().dispatch(request, *args, **kwargs)
+        with en_replica(alias):
+            response = super().dispatch(request, *args, **kwargs)
+            if hasattr(response, 'render') and callable(response.render):
+                response = response.render()
+        if response.streaming:
+            response.streaming_content = _iterar_en(alias, response.streaming_content)
+        return response
+
+
+def _clave_usuario(user_id):
+    return f'inventario:replicas:fijado:{user_id}'
+
+
+class ReplicasMiddleware:
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        ahora = time.time()
+        marca = {'escribio': False}
+        tokens = (_fijado.set(self._cookie_vigente(request, ahora)), _peticion.set(request), _escritura.set(marca))
+        try:
+            response = self.get_response(request)
+        finally:
+            _fijado.reset(tokens[0])
+            _peticion.reset(tokens[1])
+            _escritura.reset(tokens[2])
+        if marca['escribio'] and replicas():
+            self._fijar(request, response, ahora)
+        return response
+
+    @staticmethod
+    def _cookie_vigente(request, ahora):
+        try:
+            return float(request.COOKIES.get(COOKIE, 0)) > ahora
+        except ValueError:
+            return False
+
+    @staticmethod
+    def _fijar(request, response, ahora):
+        segundos = segundos_fijado()
+        response.set_cookie(COOKIE, f'{ahora + segundos:.3f}', max_age=segundos, httponly=True, samesite='Lax')
+        user = getattr(request, 'user', None)
+        if user is not None and user.is_authenticated:
+            cache.set(_clave_usuario(user.pk), 1, segundos)
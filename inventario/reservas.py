@@ -0,0 +1,169 @@
+"""
+Reservas de stock con vencimiento (cotizaciones, carritos en línea).
+
+- ``reservar``: aparta unidades con un UPDATE condicional del contador
+  ``Producto.stock_reservado`` (``stock_actual - stock_reservado >= n``). Dos reservas
+  simultáneas no pueden apartar las mismas unidades y lo disponible nunca se calcula
+  sumando reservas.
+- ``liberar`` / ``convertir``: cierran una reserva activa (fila bloqueada) y devuelven sus
+  unidades al contador; ``convertir`` registra además la salida (``MovimientoStock``) en la
+  misma transacción.
+- ``vencer``: barre por bloques las reservas activas con ``vence_en`` pasado (índice
+  parcial); por bloque, un UPDATE de reservas y uno de contadores. Lo corre
+  ``manage.py vencer_reservas``.
+- Kits: la reserva de un kit con componentes aparta sus componentes (las unidades quedan
+  fijadas en ``Reserva.componentes``) y al convertirla salen los componentes, como en
+  ``kits.vender_kit``. ``kits.disponibles`` descarta antes lo que no alcanza.
+
+Configuración opcional en settings::
+
+    INVENTARIO_RESERVAS_MINUTOS = 30  # vigencia por defecto
+"""
+import datetime
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db import router, transaction
+from django.db.models import Case, F, IntegerField, Value, When
+from django.utils import timezone
+
+from . import kits
+from .models import (
+    MovimientoStock, Producto, Reserva, StockInsuficiente, plegar_fragmentos, stock_cambiado, unidades_apartadas,
+)
+
+Estado = Reserva.EstadoReserva
+
+TAMANO_BLOQUE = 500
+
+
+def minutos_vigencia():
+    return getattr(settings, 'INVENTARIO_RESERVAS_MINUTOS', 30)
+
+
+def reservar(producto, cantidad, minutos=None, referencia='', usuario=None):
+    """Aparta ``cantidad`` de ``producto`` por ``minutos``; ``StockInsuficiente`` si no hay disponibles."""
+    if cantidad <= 0:
+        raise ValidationError('La cantidad a reservar debe ser mayor que cero.')
+    faltante = f'No hay {cantidad} unidad(es) disponibles de {producto} para reservar.'
+    componentes = None
+    if kits.con_componentes([producto.pk]):
+        if kits.disponibles([producto.pk]).get(producto.pk, 0) < cantidad:
+            raise StockInsuficiente(faltante)
+        componentes = {pk: n * cantidad for pk, n in kits.requerimientos(producto.pk).items()}
+    apartar = componentes or {producto.pk: cantidad}
+    ahora = timezone.now()
+    using = router.db_for_write(Reserva)
+    with transaction.atomic(using=using):
+        if componentes or (producto.fragmentos_stock or 0) > 1:
+            # lo disponible se compara contra el stock completo, contadores fragmentados incluidos
+            plegar_fragmentos(list(apartar), using)
+        # en orden de id, como los movimientos; la caché de kits solo adelanta el rechazo
+        for pk, n in sorted(apartar.items()):
+            apartado = Producto.objects.using(using).filter(
+                pk=pk, stock_actual__gte=F('stock_reservado') + n,
+            ).update(stock_reservado=F('stock_reservado') + n, updated_at=ahora)
+            if not apartado:
+                raise StockInsuficiente(faltante)
+        reserva = Reserva.objects.using(using).create(
+            producto=producto, cantidad=cantidad, referencia=referencia, usuario=usuario,
+            vence_en=ahora + datetime.timedelta(minutes=minutos or minutos_vigencia()),
+            componentes={str(pk): n for pk, n in componentes.items()} if componentes else None,
+        )
+    stock_cambiado.send(sender=Reserva, producto_ids=list(apartar), using=using)
+    return reserva
+
+
+def _devolver(por_producto, ahora, using):
+    """Resta ``{producto_id: unidades}`` de ``stock_reservado`` con un UPDATE (filas bloqueadas en orden de id)."""
+    list(
+        Producto.objects.using(using).select_for_update()
+        .filter(pk__in=por_producto).order_by('pk').values_list('pk', flat=True)
+    )
+    Producto.objects.using(using).filter(pk__in=por_producto).update(
+        stock_reservado=F('stock_reservado') - Case(
+            *[When(pk=pk, then=Value(n)) for pk, n in por_producto.items()],
+            default=Value(0), output_field=IntegerField(),
+        ),
+        updated_at=ahora,
+    )
+
+
+def _cerrar(reserva, estado, ahora, using):
+    """Bloquea la reserva, que debe seguir activa (y vigente al convertirla), y devuelve sus unidades."""
+    fila = Reserva.objects.using(using).select_for_update().filter(pk=reserva.pk, estado=Estado.ACTIVA).first()
+    if fila is None:
+        raise ValidationError('La reserva ya no está activa.')
+    if estado == Estado.CONVERTIDA and fila.vence_en <= ahora:
+        raise ValidationError('La reserva está vencida.')
+    _devolver(fila.apartado(), ahora, using)
+    fila.estado, fila.cerrada_en = estado, ahora
+    fila.save(using=using, update_fields=['estado', 'cerrada_en'])
+    return fila
+
+
+def liberar(reserva):
+    """Cancela una reserva activa: sus unidades vuelven a estar disponibles."""
+    using = router.db_for_write(Reserva)
+    with transaction.atomic(using=using):
+        fila = _cerrar(reserva, Estado.LIBERADA, timezone.now(), using)
+    reserva.estado, reserva.cerrada_en = fila.estado, fila.cerrada_en
+    stock_cambiado.send(sender=Reserva, producto_ids=list(fila.apartado()), using=using)
+    return reserva
+
+
+def convertir(reserva, usuario=None, ip=None, motivo=None):
+    """
+    Convierte una reserva vigente en venta: la cierra y registra la salida en la misma
+    transacción. De un kit salen los componentes apartados; se devuelve el primero de esos
+    movimientos (todos con el mismo ``lote``).
+    """
+    using = router.db_for_write(Reserva)
+    with transaction.atomic(using=using):
+        fila = _cerrar(reserva, Estado.CONVERTIDA, timezone.now(), using)
+        motivo = motivo or f'Venta de reserva {fila.referencia or fila.pk}'
+        if fila.componentes:
+            fila.movimiento = MovimientoStock.registrar_lote(
+                [(pk, -n, MovimientoStock.TipoMovimiento.SALIDA) for pk, n in sorted(fila.apartado().items())],
+                usuario, ip, motivo, permitir_negativo=False,
+            )[0]
+        else:
+            producto = Producto.objects.using(using).get(pk=fila.producto_id)
+            fila.movimiento = MovimientoStock.registrar(
+                producto, -fila.cantidad, MovimientoStock.TipoMovimiento.SALIDA, usuario, ip,
+                motivo=motivo, permitir_negativo=False,
+            )
+        fila.save(using=using, update_fields=['movimiento'])
+    reserva.estado, reserva.cerrada_en, reserva.movimiento = fila.estado, fila.cerrada_en, fila.movimiento
+    return fila.movimiento
+
+
+def vencer(ahora=None, bloque=TAMANO_BLOQUE, using=None):
+    """Marca como vencidas las reservas activas con ``vence_en <= ahora``. Devuelve cuántas."""
+    ahora = ahora or timezone.now()
+    using = using or router.db_for_write(Reserva)
+    total = 0
+    while True:
+        with transaction.atomic(using=using):
+            # skip_locked: una reserva que se está convirtiendo o liberando queda para la siguiente pasada
+            filas = list(
+                Reserva.objects.using(using).select_for_update(skip_locked=True)
+                .filter(estado=Estado.ACTIVA, vence_en__lte=ahora).order_by('vence_en')
+                .values_list('pk', 'producto_id', 'cantidad', 'componentes')[:bloque]
+            )
+            if not filas:
+                break
+            por_producto = {}
+            for _, producto_id, cantidad, componentes in filas:
+                for pk, n in unidades_apartadas(producto_id, cantidad, componentes).items():
+                    por_producto[pk] = por_producto.get(pk, 0) + n
+            Reserva.objects.using(using).filter(pk__in=[f[0] for f in filas]).update(
+                estado=Estado.VENCIDA, cerrada_en=ahora,
+            )
+            # bloqueo en orden de id, igual que los movimientos: sin deadlocks con ellos
+            _devolver(por_producto, ahora, using)
+            stock_cambiado.send(sender=Reserva, producto_ids=list(por_producto), using=using)
+        total += len(filas)
+        if len(filas) < bloque:
+            break
+    return total
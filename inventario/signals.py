@@ -0,0 +1,83 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from . import kits
+from .cache_codigos import cache_codigos
+from .media import archivo_subido
+from .models import (
+    CodigoProducto, ComponenteKit, ImagenProducto, Producto, Proveedor, stock_cambiado, valuar_productos,
+)
+from .valuacion import reconstruir
+
+
+@receiver(pre_save, sender=Producto, dispatch_uid='inventario_codigo_anterior')
+def recordar_codigo_anterior(sender, instance, raw=False, update_fields=None, **kwargs):
+    # si cambia el código hay que invalidar también el anterior
+    instance._codigo_anterior = None
+    if raw or instance.pk is None:
+        return
+    if update_fields is not None and 'codigo_identificador' not in update_fields:
+        return
+    instance._codigo_anterior = (
+        Producto.objects.filter(pk=instance.pk).values_list('codigo_identificador', flat=True).first()
+    )
+
+
+@receiver(post_save, sender=Producto, dispatch_uid='inventario_invalidar_codigo')
+def invalidar_codigo_guardado(sender, instance, using, **kwargs):
+    # al confirmar: antes, otra petición podría volver a cachear la fila vieja
+    codigos = (instance.codigo_identificador, getattr(instance, '_codigo_anterior', None))
+    transaction.on_commit(lambda: cache_codigos.invalidar(*codigos), using=using)
+
+
+@receiver(post_delete, sender=Producto, dispatch_uid='inventario_invalidar_codigo_borrado')
+def invalidar_codigo_borrado(sender, instance, using, **kwargs):
+    codigo = instance.codigo_identificador
+    transaction.on_commit(lambda: cache_codigos.invalidar(codigo), using=using)
+
+
+@receiver(post_save, sender=CodigoProducto, dispatch_uid='inventario_invalidar_alias')
+@receiver(post_delete, sender=CodigoProducto, dispatch_uid='inventario_invalidar_alias_borrado')
+def invalidar_alias(sender, instance, using, **kwargs):
+    # incluye la caché negativa: un alias nuevo puede ser un código que antes no existía
+    clave = instance.clave
+    transaction.on_commit(lambda: cache_codigos.invalidar(clave), using=using)
+
+
+@receiver(stock_cambiado, dispatch_uid='inventario_kits_stock')
+def invalidar_kits(sender, producto_ids, using, **kwargs):
+    # disponibilidad de los kits que usan estos productos; al confirmar, no antes
+    ids = list(producto_ids)
+    transaction.on_commit(lambda: kits.invalidar_componentes(ids), using=using)
+
+
+@receiver(post_save, sender=ComponenteKit, dispatch_uid='inventario_kits_guardado')
+@receiver(post_delete, sender=ComponenteKit, dispatch_uid='inventario_kits_borrado')
+def invalidar_listas_materiales(sender, instance, using, **kwargs):
+    transaction.on_commit(kits.invalidar_todo, using=using)
+
+
+@receiver(post_delete, sender=Producto, dispatch_uid='inventario_valuacion_borrado')
+def restar_valuacion_borrado(sender, instance, using, **kwargs):
+    valuar_productos([instance], -1, using)
+
+
+@receiver(post_delete, sender=Proveedor, dispatch_uid='inventario_valuacion_proveedor')
+def reconstruir_valuacion_proveedor(sender, instance, **kwargs):
+    # sus productos pasan a proveedor nulo con un UPDATE (SET_NULL) que no emite señales
+    transaction.on_commit(reconstruir)
+
+
+# las imágenes forman parte del producto publicado (catálogo): su cambio avanza updated_at
+@receiver(post_save, sender=ImagenProducto, dispatch_uid='inventario_imagen_guardada')
+@receiver(post_delete, sender=ImagenProducto, dispatch_uid='inventario_imagen_borrada')
+def tocar_producto_imagen(sender, instance, raw=False, **kwargs):
+    if not raw:
+        Producto.objects.filter(pk=instance.producto_id).update(updated_at=timezone.now())
+
+
+@receiver(archivo_subido, sender=ImagenProducto, dispatch_uid='inventario_imagen_subida')
+def tocar_producto_imagen_subida(sender, objeto_id, **kwargs):
+    Producto.objects.filter(imagenes__pk=objeto_id).update(updated_at=timezone.now())
@@ -1,3 +1,1549 @@
-from django.test import TestCase
+import csv
+import datetime
+import gzip
+import io
+import json
+import os
+import tempfile
+import uuid
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib import admin
+from django.contrib.auth import get_user_model
+from django.core import mail
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.files.base import ContentFile
+from django.core.files.storage import storages
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.db.models import Sum
+from django.http import HttpResponse, StreamingHttpResponse
+from django.test import Client, RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from PIL import Image
+
+from usuarios.models import Role
+
+from . import (
+    carga, codigos, exportar, historico, imagenes, kits, media, precios, rendimiento, replicas, reservas, ubicaciones,
+    valuacion,
+)
+from .admin import ProductoAdmin
+from .busqueda import buscar_productos
+from .cache_codigos import cache_codigos
+from .consultas import PresupuestoConsultasMixin, huella
+from .forms import ProductoCreateForm, ProductoUpdateForm
+from .importar import ErrorImportacion, ImportadorProductos, huella_archivo, leer_filas
+from .models import (
+    PREFIJO_PENDIENTE, AlertaStock, CodigoProducto, ComponenteKit, ExistenciaUbicacion, ImagenProducto, LoteAplicado,
+    MovimientoStock, Producto, Proveedor, Reserva, StockInsuficiente, StockSnapshot, TrabajoMedia, Ubicacion,
+    ValuacionInventario, _update_returning, plegar_fragmentos, sincronizar_alertas,
+)
+from .paginacion import CursorInvalido, KeysetPaginator, codificar_cursor, estimar_total
+from .valuacion import reconstruir
+from .views import resolver_codigos
+
+N_PRODUCTOS = 300
+
+
+def sembrar_inventario(n=N_PRODUCTOS):
+    """Datos a volumen realista: productos con imágenes, movimientos y alertas."""
+    usuario = get_user_model().objects.create_superuser(
+        'admin', 'admin@example.com', 'x', role_obj=Role.objects.create(name='Administrador'),
+    )
+    proveedores = Proveedor.objects.bulk_create([Proveedor(nombre=f'Proveedor {i}') for i in range(5)])
+    visibilidades = list(Producto.VisibilidadOnline)
+    productos = Producto.objects.bulk_create([
+        Producto(
+            sku=f'SKU{i:05d}', sku_proveedor=f'PRV{i:05d}', codigo_identificador=f'750{i:010d}',
+            nombre=f'Producto {i}', tipo_producto=Producto.TipoProducto.REPUESTO,
+            descripcion_corta='Descripción', ubicacion_principal=f'A-{i % 20}',
+            unidad_medida=Producto.UnidadMedida.PZA, stock_actual=i % 7, punto_reorden=2,
+            costo_unitario=Decimal('10.50'), precio_publico=Decimal('20'), precio_vigente=Decimal('20'),
+            proveedor_principal=proveedores[i % 5], visibilidad_online=visibilidades[i % 3],
+        )
+        for i in range(n)
+    ])
+    CodigoProducto.objects.bulk_create([CodigoProducto.de(p.pk, p.codigo_identificador) for p in productos])
+    ImagenProducto.objects.bulk_create([
+        ImagenProducto(
+            producto=p, secuencia=s, imagen=f'products/{p.internal_id}/{s}.webp',
+            miniatura=f'products/{p.internal_id}/{s}-miniatura.webp',
+            icono=f'products/{p.internal_id}/{s}-icono.webp',
+        )
+        for p in productos for s in (1, 2)
+    ])
+    MovimientoStock.objects.bulk_create([
+        MovimientoStock(producto=p, tipo=MovimientoStock.TipoMovimiento.ENTRADA, cantidad=1, usuario=usuario)
+        for p in productos for _ in range(2)
+    ])
+    AlertaStock.objects.bulk_create([AlertaStock(producto=p) for p in productos if p.stock_actual <= 2])
+    ids = Ubicacion.ids_por_codigo([p.ubicacion_principal for p in productos])
+    ExistenciaUbicacion.objects.bulk_create([
+        ExistenciaUbicacion(producto=p, ubicacion_id=ids[p.ubicacion_principal], cantidad=p.stock_actual)
+        for p in productos if p.stock_actual
+    ])
+    reconstruir()
+    return usuario, productos
+
+
+class PresupuestoConsultasTests(PresupuestoConsultasMixin, TestCase):
+    """Cada vista de inventario ejecuta un número acotado de consultas, sin importar el volumen."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario, cls.productos = sembrar_inventario()
+        cls.producto = cls.productos[0]
+
+    def setUp(self):
+        self.client.force_login(self.usuario)
+
+    def test_seleccion(self):
+        self.get_con_presupuesto(reverse('inventario:seleccion'), 4)
+
+    def test_buscar(self):
+        self.get_con_presupuesto(reverse('inventario:buscar'), 6)
+        self.get_con_presupuesto(reverse('inventario:buscar') + '?q=Producto', 7)
+
+    def test_formularios_producto(self):
+        self.get_con_presupuesto(reverse('inventario:nuevo'), 5)
+        self.get_con_presupuesto(reverse('inventario:editar', args=[self.producto.internal_id]), 6)
+        self.get_con_presupuesto(reverse('inventario:imagenes', args=[self.producto.internal_id]), 6)
+        self.get_con_presupuesto(reverse('inventario:ajuste', args=[self.producto.internal_id]), 5)
+
+    def test_escaneo(self):
+        self.get_con_presupuesto(reverse('inventario:scan_result') + f'?code={self.producto.codigo_identificador}', 5)
+
+    def test_lote(self):
+        self.get_con_presupuesto(reverse('inventario:lote'), 4)
+
+    def test_scan_lote_no_crece_con_los_codigos(self):
+        codigos = {p.codigo_identificador: 1 for p in self.productos[:100]}
+        with self.assertPresupuesto(21):
+            response = self.client.post(
+                reverse('inventario:scan_lote'),
+                json.dumps({'lote': str(uuid.uuid4()), 'accion': 'add', 'codigos': codigos}),
+                content_type='application/json',
+            )
+        self.assertEqual(response.status_code, 200)
+
+    def test_alertas_y_valuacion(self):
+        self.get_con_presupuesto(reverse('inventario:alertas'), 6)
+        self.get_con_presupuesto(reverse('inventario:valuacion'), 5)
+
+    def test_catalogo(self):
+        self.client.logout()
+        url = reverse('inventario:catalogo_api')
+        self.get_con_presupuesto(url + '?por_pagina=100', 3)
+        self.get_con_presupuesto(url + '?por_pagina=100&orden=-precio&campos=sku,precio,imagenes', 3)
+
+    def test_exportaciones(self):
+        self.get_con_presupuesto(reverse('inventario:exportar_productos'), 5)
+        self.get_con_presupuesto(reverse('inventario:exportar_movimientos'), 5)
+
+    def test_ubicaciones(self):
+        self.get_con_presupuesto(reverse('inventario:transferir', args=[self.producto.internal_id]), 7)
+        self.get_con_presupuesto(reverse('inventario:ubicaciones') + '?q=A-1', 5)
+        ubicacion = Ubicacion.objects.get(codigo='A-1')
+        self.get_con_presupuesto(reverse('inventario:ubicacion', args=[ubicacion.pk]), 6)
+
+    def test_metricas(self):
+        self.get_con_presupuesto(reverse('inventario:metricas'), 3)
+
+    def test_admin(self):
+        self.get_con_presupuesto(reverse('admin:inventario_producto_changelist'), 8)
+        self.get_con_presupuesto(reverse('admin:inventario_movimientostock_changelist'), 8)
+        self.get_con_presupuesto(reverse('admin:inventario_alertastock_changelist'), 8)
+        self.get_con_presupuesto(reverse('admin:inventario_producto_change', args=[self.producto.pk]), 12)
+
+
+class RegistrarStockTests(TestCase):
+
+    def setUp(self):
+        self.producto = Producto.objects.create(
+            sku='SKU1', sku_proveedor='PRV1', nombre='Filtro', tipo_producto=Producto.TipoProducto.REPUESTO,
+            descripcion_corta='Filtro', ubicacion_principal='A-01', unidad_medida=Producto.UnidadMedida.PZA,
+        )
+
+    def registrar(self, cantidad, **kwargs):
+        tipo = MovimientoStock.TipoMovimiento.ENTRADA if cantidad > 0 else MovimientoStock.TipoMovimiento.SALIDA
+        return MovimientoStock.registrar(self.producto, cantidad, tipo, **kwargs)
+
+    def comprobar_incremento_y_rechazo(self):
+        self.registrar(5)
+        self.registrar(-2)
+        self.assertEqual(self.producto.stock_actual, 3)
+        with self.assertRaises(StockInsuficiente):
+            self.registrar(-4, permitir_negativo=False)
+        self.producto.refresh_from_db()
+        self.assertEqual(self.producto.stock_actual, 3)
+        self.assertEqual(MovimientoStock.objects.filter(producto=self.producto).count(), 2)
+        self.registrar(-4, permitir_negativo=True)
+        self.producto.refresh_from_db()
+        self.assertEqual(self.producto.stock_actual, -1)
+        self.assertEqual(MovimientoStock.objects.aggregate(s=Sum('cantidad'))['s'], -1)
+
+    def test_update_returning(self):
+        if not _update_returning(connection):
+            self.skipTest('La base no soporta UPDATE ... RETURNING.')
+        self.comprobar_incremento_y_rechazo()
+
+    def test_sin_returning(self):
+        with mock.patch('inventario.models._update_returning', return_value=False):
+            self.comprobar_incremento_y_rechazo()
+
+    @override_settings(INVENTARIO_PERMITIR_STOCK_NEGATIVO=False)
+    def test_setting_sin_negativos(self):
+        with self.assertRaises(StockInsuficiente):
+            self.registrar(-1)
+        self.assertFalse(MovimientoStock.objects.exists())
+
+    def test_stock_no_se_edita_en_el_admin(self):
+        request = RequestFactory().get('/')
+        self.assertIn('stock_actual', ProductoAdmin(Producto, admin.site).get_readonly_fields(request, self.producto))
+
+    def test_lote_de_escaneo_se_aplica_una_vez(self):
+        self.client.force_login(get_user_model().objects.create_superuser('admin', 'a@example.com', 'x'))
+
+        def enviar(lote, accion, n):
+            return self.client.post(
+                reverse('inventario:scan_lote'),
+                json.dumps({'lote': str(lote), 'accion': accion, 'codigos': {'SKU1': n}}),
+                content_type='application/json',
+            )
+
+        lote = uuid.uuid4()
+        self.assertFalse(enviar(lote, 'add', 3).json()['duplicado'])
+        self.assertTrue(enviar(lote, 'add', 3).json()['duplicado'])
+        self.producto.refresh_from_db()
+        self.assertEqual(self.producto.stock_actual, 3)
+        self.assertEqual(LoteAplicado.objects.filter(lote=lote).count(), 1)
+
+        # un lote rechazado no queda reclamado: el reintento se puede aplicar
+        lote = uuid.uuid4()
+        with override_settings(INVENTARIO_PERMITIR_STOCK_NEGATIVO=False):
+            self.assertEqual(enviar(lote, 'remove', 5).status_code, 409)
+        self.assertFalse(LoteAplicado.objects.filter(lote=lote).exists())
+        self.assertFalse(enviar(lote, 'remove', 2).json()['duplicado'])
+        self.producto.refresh_from_db()
+        self.assertEqual(self.producto.stock_actual, 1)
+
+
+    def test_lote_de_escaneo_con_producto_borrado_o_invalido(self):
+        self.client.force_login(get_user_model().objects.create_superuser('admin', 'a@example.com', 'x'))
+
+        def enviar(lote, accion):
+            datos = json.dumps({'lote': str(lote), 'accion': accion, 'codigos': {'SKU1': 1}})
+            return self.client.post(reverse('inventario:scan_lote'), datos, content_type='application/json')
+
+        lote = uuid.uuid4()
+        with mock.patch('inventario.views.kits.registrar_lote', side_effect=ValidationError('Lista circular.')):
+            response = enviar(lote, 'remove')
+        self.assertEqual((response.status_code, response.json()['error']), (400, 'Lista circular.'))
+        self.assertFalse(LoteAplicado.objects.filter(lote=lote).exists())
+
+        resolver = resolver_codigos
+
+        def resolver_y_borrar(codigos):
+            productos = resolver(codigos)
+            Producto.objects.filter(pk=self.producto.pk).delete()  # borrado entre la resolución y el lote
+            return productos
+
+        lote = uuid.uuid4()
+        with mock.patch('inventario.views.resolver_codigos', resolver_y_borrar):
+            response = enviar(lote, 'add')
+        self.assertEqual(response.status_code, 409)
+        self.assertIn('se eliminó', response.json()['error'])
+        self.assertFalse(LoteAplicado.objects.filter(lote=lote).exists())
+
+class MovimientoLoteTests(TestCase):
+
+    def setUp(self):
+        self.a, self.b = [
+            Producto.objects.create(
+                sku=sku, sku_proveedor=sku, codigo_identificador=codigo, nombre=sku,
+                tipo_producto=Producto.TipoProducto.REPUESTO, descripcion_corta=sku, ubicacion_principal='A-01',
+                unidad_medida=Producto.UnidadMedida.PZA,
+            )
+            for sku, codigo in (('SKU1', '7501234567893'), ('SKU2', 'CAJA-2'))
+        ]
+
+    def stock(self):
+        return dict(Producto.objects.values_list('sku', 'stock_actual'))
+
+    def test_registrar_lote_neto_por_producto_y_un_solo_lote(self):
+        anden = Ubicacion.objects.create(codigo='ANDEN')
+        movimientos = MovimientoStock.registrar_lote(
+            [(self.a, 5), (self.b.pk, 2), (self.a, 3), (self.b, 0)], ubicacion=anden, motivo='Embarque',
+        )
+        self.assertEqual(len(movimientos), 3)
+        self.assertEqual(len({m.lote for m in movimientos}), 1)
+        self.assertEqual(self.stock(), {'SKU1': 8, 'SKU2': 2})
+        self.assertEqual(ExistenciaUbicacion.objects.get(producto=self.a, ubicacion=anden).cantidad, 8)
+        self.assertEqual(MovimientoStock.registrar_lote([]), [])
+
+        # sin negativos: si un renglón no alcanza, no se aplica ninguno
+        with self.assertRaises(StockInsuficiente):
+            MovimientoStock.registrar_lote([(self.a, -1), (self.b, -3)], permitir_negativo=False)
+        self.assertEqual(self.stock(), {'SKU1': 8, 'SKU2': 2})
+        self.assertEqual(MovimientoStock.objects.count(), 3)
+
+    def test_vista_de_lote(self):
+        self.client.force_login(get_user_model().objects.create_superuser('admin', 'a@example.com', 'x'))
+        url = reverse('inventario:lote')
+        codigos = '07501234567893,4\nCAJA-2\nSKU1\n\nCAJA-2,2'
+        response = self.client.post(url, {'accion': 'add', 'codigos': codigos}, follow=True)
+        self.assertRedirects(response, url)
+        self.assertEqual(
+            [str(m) for m in response.context['messages']],
+            ['Lote aplicado: 2 producto(s), 8 unidad(es), 3 movimiento(s).'],
+        )
+        self.assertEqual(self.stock(), {'SKU1': 5, 'SKU2': 3})
+        self.assertEqual(MovimientoStock.objects.values('lote').distinct().count(), 1)
+
+        response = self.client.post(url, {'accion': 'remove', 'codigos': 'SKU1\nNO-EXISTE,2'})
+        self.assertIn('NO-EXISTE', response.context['form'].errors['codigos'][0])
+        response = self.client.post(url, {'accion': 'add', 'codigos': 'SKU1,cero'})
+        self.assertIn('cantidad inválida', response.context['form'].errors['codigos'][0])
+        self.assertEqual(self.stock(), {'SKU1': 5, 'SKU2': 3})
+
+
+class HistoricoTests(TestCase):
+
+    def setUp(self):
+        self.producto, self.otro = [
+            Producto.objects.create(
+                sku=sku, sku_proveedor=sku, nombre=sku, tipo_producto=Producto.TipoProducto.REPUESTO,
+                descripcion_corta=sku, ubicacion_principal='A-01', unidad_medida=Producto.UnidadMedida.PZA,
+            )
+            for sku in ('SKU1', 'SKU2')
+        ]
+        self.t0 = timezone.now() - datetime.timedelta(days=10)
+        # +10 el día 1, -3 el día 3, +5 el día 6; SKU2: +4 el día 2
+        for producto, cantidad, dia in ((self.producto, 10, 1), (self.producto, -3, 3), (self.producto, 5, 6),
+                                        (self.otro, 4, 2)):
+            tipo = MovimientoStock.TipoMovimiento.ENTRADA if cantidad > 0 else MovimientoStock.TipoMovimiento.SALIDA
+            movimiento = MovimientoStock.registrar(producto, cantidad, tipo)
+            MovimientoStock.objects.filter(pk=movimiento.pk).update(creado_en=self.dia(dia))
+
+    def dia(self, n, horas=0):
+        return self.t0 + datetime.timedelta(days=n, hours=horas)
+
+    def test_stock_en_sin_cortes_resta_desde_el_actual(self):
+        esperado = {0: 0, 2: 10, 4: 7, 8: 12}
+        for dia, stock in esperado.items():
+            self.assertEqual(historico.stock_en(self.producto, self.dia(dia)), stock, dia)
+        # un movimiento exactamente en el instante pedido ya cuenta
+        self.assertEqual(historico.stock_en(self.producto, self.dia(3)), 7)
+        en_fecha = dict(historico.stock_en_todos(self.dia(4)).values_list('sku', 'stock_en_fecha'))
+        self.assertEqual(en_fecha, {'SKU1': 7, 'SKU2': 4})
+
+    def test_cortes_desde_el_corte_mas_cercano(self):
+        corte = self.dia(3, horas=1)
+        self.assertEqual(historico.generar_cortes(corte, completo=True), 2)
+        self.assertEqual(
+            dict(StockSnapshot.objects.filter(corte=corte).values_list('producto__sku', 'stock')),
+            {'SKU1': 7, 'SKU2': 4},
+        )
+        # se parte del corte (anterior o posterior, el más cercano): un corte alterado se nota
+        StockSnapshot.objects.filter(producto=self.producto).update(stock=70)
+        self.assertEqual(historico.stock_en(self.producto, self.dia(2)), 73)   # 70 - (-3)
+        self.assertEqual(historico.stock_en(self.producto, self.dia(5)), 70)
+        self.assertEqual(historico.stock_en(self.producto, self.dia(7)), 75)
+        en_fecha = dict(historico.stock_en_todos(self.dia(7)).values_list('sku', 'stock_en_fecha'))
+        self.assertEqual(en_fecha, {'SKU1': 75, 'SKU2': 4})
+        # sin corte anterior stock_en_todos usa el stock actual
+        self.assertEqual(historico.stock_en_todos(self.dia(2)).get(pk=self.producto.pk).stock_en_fecha, 10)
+
+    def test_generar_cortes_incremental_e_idempotente(self):
+        primero = timezone.now()
+        self.assertEqual(historico.generar_cortes(primero), 2)
+        MovimientoStock.registrar(self.otro, 1, MovimientoStock.TipoMovimiento.ENTRADA)
+        segundo = timezone.now()
+        # solo el producto que cambió desde el corte anterior
+        self.assertEqual(historico.generar_cortes(segundo), 1)
+        self.assertEqual(list(StockSnapshot.objects.filter(corte=segundo).values_list('stock', flat=True)), [5])
+        self.assertEqual(historico.generar_cortes(primero, completo=True), 2)
+        self.assertEqual(StockSnapshot.objects.count(), 3)
+        self.assertEqual(historico.stock_en(self.otro, segundo), 5)
+
+
+class BusquedaTests(TestCase):
+
+    def setUp(self):
+        datos = (
+            ('TOR-8', 'Tornillo M8 acero', ''),
+            ('TUE-8', 'Tuerca M8', 'tornillo hexagonal'),
+            ('M8', 'Arandela plana', ''),
+            ('BAN-1', 'Banda dentada', ''),
+        )
+        for sku, nombre, palabras in datos:
+            Producto.objects.create(
+                sku=sku, sku_proveedor=f'P-{sku}', nombre=nombre, palabras_clave=palabras,
+                tipo_producto=Producto.TipoProducto.REPUESTO, descripcion_corta=nombre,
+                ubicacion_principal='A-01', unidad_medida=Producto.UnidadMedida.PZA,
+            )
+
+    def skus(self, q):
+        return list(buscar_productos(q).values_list('sku', flat=True))
+
+    def test_exactos_primero_y_luego_relevancia(self):
+        resultado = self.skus('M8')
+        self.assertEqual(resultado[0], 'M8')
+        self.assertEqual(set(resultado), {'M8', 'TOR-8', 'TUE-8'})
+        # prefijo mientras se escribe; el nombre pesa más que las palabras clave
+        self.assertEqual(self.skus('torn'), ['TOR-8', 'TUE-8'])
+        self.assertEqual(self.skus('P-BAN-1'), ['BAN-1'])
+        self.assertEqual(self.skus('inexistente'), [])
+        self.assertEqual(self.skus('  '), ['M8', 'BAN-1', 'TOR-8', 'TUE-8'])  # por nombre
+
+    def test_el_indice_sigue_a_los_cambios(self):
+        producto = Producto.objects.get(sku='BAN-1')
+        producto.nombre = 'Polea de aluminio'
+        producto.save()
+        self.assertEqual(self.skus('polea'), ['BAN-1'])
+        self.assertEqual(self.skus('dentada'), [])
+        producto.delete()
+        self.assertEqual(self.skus('polea'), [])
+
+    def test_vista(self):
+        self.client.force_login(get_user_model().objects.create_superuser('admin', 'a@example.com', 'x'))
+        response = self.client.get(reverse('inventario:buscar'), {'q': 'M8'})
+        self.assertEqual([p.sku for p in response.context['productos']][0], 'M8')
+        self.assertContains(response, 'Arandela plana')
+
+
+class PaginacionTests(TestCase):
+
+    def setUp(self):
+        # nombres repetidos: el id desempata
+        for i, nombre in enumerate(['Balero', 'Balero', 'Cadena', 'Balero', 'Arnés']):
+            Producto.objects.create(
+                sku=f'SKU{i}', sku_proveedor=f'PRV{i}', nombre=nombre, tipo_producto=Producto.TipoProducto.REPUESTO,
+                descripcion_corta=nombre, ubicacion_principal='A-01', unidad_medida=Producto.UnidadMedida.PZA,
+                punto_reorden=i % 2,
+            )
+
+    def recorrer(self, queryset, por_pagina):
+        paginator = KeysetPaginator(queryset, por_pagina, modo_conteo='exacto')
+        paginas, cursor = [], None
+        while True:
+            pagina = paginator.pagina(cursor)
+            paginas.append([p.sku for p in pagina])
+            if not pagina.has_next():
+                return paginas
+            cursor = pagina.siguiente
+
+    def test_recorre_todo_sin_repetir_en_ambas_direcciones(self):
+        qs = Producto.objects.order_by('nombre', 'id')
+        self.assertEqual(self.recorrer(qs, 2), [['SKU4', 'SKU0'], ['SKU1', 'SKU3'], ['SKU2']])
+        qs = Producto.objects.order_by('-punto_reorden', 'nombre', '-id')
+        esperado = list(qs.values_list('sku', flat=True))
+        self.assertEqual(sum(self.recorrer(qs, 2), []), esperado)
+        self.assertEqual(KeysetPaginator(qs, 2, modo_conteo='exacto').conteo(), (5, False))
+
+    def test_busqueda_por_relevancia_sin_repetir_ni_omitir(self):
+        for i, nombre in enumerate(['Balero de bolas', 'Balero cónico 6204', 'Soporte para balero', 'Balero']):
+            Producto.objects.create(
+                sku=f'BAL{i}', sku_proveedor=f'PB{i}', nombre=nombre, tipo_producto=Producto.TipoProducto.REPUESTO,
+                descripcion_corta=nombre, ubicacion_principal='A-01', unidad_medida=Producto.UnidadMedida.PZA,
+            )
+        qs = buscar_productos('balero')
+        esperado = list(qs.values_list('sku', flat=True))
+        self.assertEqual(len(esperado), 7)
+        # la relevancia (float4 en PostgreSQL) viaja en el cursor: página de 1 = cada fila es límite
+        self.assertEqual(sum(self.recorrer(qs, 1), []), esperado)
+
+    def test_cursor_invalido_y_conteo_estimado(self):
+        paginator = KeysetPaginator(Producto.objects.order_by('nombre', 'id'), 2)
+        with self.assertRaises(CursorInvalido):
+            paginator.pagina('no-es-un-cursor')
+        with self.assertRaises(CursorInvalido):
+            paginator.pagina(codificar_cursor(['Balero']))  # faltan columnas
+        with self.assertRaises(ValueError):
+            KeysetPaginator(Producto.objects.order_by(), 2)
+        if connection.vendor != 'postgresql':
+            self.assertEqual(estimar_total(Producto.objects.all(), tope=3), (3, True))
+            self.assertEqual(estimar_total(Producto.objects.all(), tope=10), (5, False))
+
+    def test_vista_de_busqueda_por_cursor(self):
+        self.client.force_login(get_user_model().objects.create_superuser('admin', 'a@example.com', 'x'))
+        url = reverse('inventario:buscar')
+        response = self.client.get(url, {'por_pagina': 3})
+        self.assertEqual([p.sku for p in response.context['productos']], ['SKU4', 'SKU0', 'SKU1'])
+        siguiente = response.context['page_obj'].siguiente
+        response = self.client.get(url, {'por_pagina': 3, 'cursor': siguiente})
+        self.assertEqual([p.sku for p in response.context['productos']], ['SKU3', 'SKU2'])
+        self.assertFalse(response.context['page_obj'].has_next())
+        self.assertEqual(self.client.get(url, {'cursor': 'x'}).status_code, 404)
+
+
+class ExportarTests(TestCase):
+
+    def setUp(self):
+        self.proveedor = Proveedor.objects.create(nombre='Proveedor')
+        self.productos = [
+            Producto.objects.create(
+                sku=f'SKU{i}', sku_proveedor=f'PRV{i}', nombre=f'Producto, "{i}"',
+                tipo_producto=Producto.TipoProducto.REPUESTO, descripcion_corta='d', ubicacion_principal='A-01',
+                unidad_medida=Producto.UnidadMedida.PZA, costo_unitario=Decimal('4.50'),
+                proveedor_principal=self.proveedor if i % 2 else None,
+            )
+            for i in range(5)
+        ]
+        self.usuario = get_user_model().objects.create_user('cajero', 'c@example.com', 'x')
+
+    def descargar(self, nombre, **params):
+        response = self.client.get(reverse(f'inventario:exportar_{nombre}'), params)
+        self.assertIsInstance(response, StreamingHttpResponse)
+        return response, b''.join(response.streaming_content)
+
+    def test_csv_por_bloques_con_cabecera_y_comillas(self):
+        partes = list(exportar.stream(exportar.productos(), exportar.COLUMNAS_PRODUCTO, chunk=2))
+        self.assertEqual(len(partes), 4)  # cabecera + bloques de 2, 2 y 1
+        filas = list(csv.reader(''.join(partes).splitlines()))
+        self.assertEqual(filas[0], [nombre for nombre, _ in exportar.COLUMNAS_PRODUCTO])
+        self.assertEqual([f[1] for f in filas[1:]], [f'SKU{i}' for i in range(5)])
+        self.assertEqual(filas[2][4], 'Producto, "1"')
+
+    def test_jsonl_y_gzip(self):
+        columnas = [('sku', 'sku'), ('costo', 'costo_unitario'), ('internal_id', 'internal_id')]
+        lineas = ''.join(exportar.stream(exportar.productos(), columnas, 'jsonl')).splitlines()
+        primero = json.loads(lineas[0])
+        self.assertEqual(
+            primero, {'sku': 'SKU0', 'costo': '4.50', 'internal_id': str(self.productos[0].internal_id)},
+        )
+        comprimido = b''.join(exportar.stream(exportar.productos(), columnas, 'jsonl', comprimir=True))
+        self.assertEqual(gzip.decompress(comprimido).decode('utf-8').splitlines(), lineas)
+
+    def test_vista_filtra_y_oculta_columnas_sensibles(self):
+        self.client.force_login(self.usuario)
+        response, contenido = self.descargar('productos', proveedor=self.proveedor.pk)
+        self.assertIn('attachment; filename="productos-', response['Content-Disposition'])
+        filas = list(csv.reader(contenido.decode('utf-8').splitlines()))
+        self.assertNotIn('costo_unitario', filas[0])
+        self.assertEqual([f[1] for f in filas[1:]], ['SKU1', 'SKU3'])
+
+        self.client.force_login(get_user_model().objects.create_superuser('admin', 'a@example.com', 'x'))
+        _, contenido = self.descargar('productos', formato='jsonl', gzip='1')
+        lineas = gzip.decompress(contenido).decode('utf-8').splitlines()
+        self.assertEqual(len(lineas), 5)
+        self.assertEqual(json.loads(lineas[0])['costo_unitario'], '4.50')
+
+    def test_stock_incluye_los_contadores_fragmentados(self):
+        producto = self.productos[0]
+        Producto.objects.filter(pk=producto.pk).update(fragmentos_stock=4)
+        producto.refresh_from_db()
+        for _ in range(3):
+            MovimientoStock.registrar(producto, 2, MovimientoStock.TipoMovimiento.ENTRADA)
+        self.assertEqual(Producto.objects.get(pk=producto.pk).stock_actual, 0)  # aún sin plegar
+
+        self.client.force_login(self.usuario)
+        _, contenido = self.descargar('productos')
+        filas = list(csv.DictReader(contenido.decode('utf-8').splitlines()))
+        self.assertEqual([f['stock_actual'] for f in filas], ['6', '0', '0', '0', '0'])
+
+    def test_comando_con_filtros(self):
+        with tempfile.TemporaryDirectory() as directorio:
+            ruta = os.path.join(directorio, 'productos.jsonl')
+            call_command('exportar_productos', formato='jsonl', proveedor=self.proveedor.pk, salida=ruta)
+            with open(ruta, encoding='utf-8') as f:
+                filas = [json.loads(linea) for linea in f]
+        self.assertEqual([(f['sku'], f['costo_unitario']) for f in filas], [('SKU1', '4.50'), ('SKU3', '4.50')])
+
+    def test_movimientos_por_fecha_inclusive(self):
+        self.client.force_login(self.usuario)
+        for producto in self.productos[:3]:
+            MovimientoStock.registrar(producto, 2, MovimientoStock.TipoMovimiento.ENTRADA, self.usuario)
+        viejo = MovimientoStock.objects.order_by('pk').first()
+        MovimientoStock.objects.filter(pk=viejo.pk).update(creado_en=timezone.now() - datetime.timedelta(days=3))
+
+        hoy = timezone.localdate().isoformat()
+        _, contenido = self.descargar('movimientos', desde=hoy, hasta=hoy)
+        filas = list(csv.reader(contenido.decode('utf-8').splitlines()))
+        self.assertEqual([(f[2], f[5], f[7]) for f in filas[1:]], [('SKU1', '2', 'cajero'), ('SKU2', '2', 'cajero')])
+
+        response = self.client.get(reverse('inventario:exportar_movimientos'), {'desde': hoy, 'hasta': '2000-01-01'})
+        self.assertEqual(response.status_code, 400)
+
+
+class ImagenesTests(SimpleTestCase):
+
+    def subida(self, imagen, formato='JPEG', nombre='foto.jpg', **opciones):
+        salida = io.BytesIO()
+        imagen.save(salida, format=formato, **opciones)
+        return SimpleUploadedFile(nombre, salida.getvalue())
+
+    def test_orienta_reduce_y_descarta_exif(self):
+        exif = Image.Exif()
+        exif[0x0112] = 6  # girada 90°: se ve vertical
+        exif[0x010F] = 'Camara'
+        archivo = self.subida(Image.new('RGB', (3000, 2000), 'red'), exif=exif.tobytes())
+        with override_settings(INVENTARIO_IMAGENES={'LADO_MAX': 1200}):
+            principal, variantes = imagenes.normalizar(archivo)
+        self.assertEqual(principal.name, 'foto.webp')
+        resultado = Image.open(principal)
+        self.assertEqual((resultado.format, resultado.size), ('WEBP', (800, 1200)))
+        self.assertEqual(dict(resultado.getexif()), {})
+        self.assertEqual(set(variantes), set(imagenes.VARIANTES))
+        self.assertEqual(Image.open(variantes['icono']).size, (64, 96))
+        self.assertEqual(Image.open(variantes['miniatura']).size, (320, 480))
+
+    def test_jpeg_compone_la_transparencia_sobre_blanco(self):
+        archivo = self.subida(Image.new('RGBA', (40, 20), (0, 0, 0, 0)), 'PNG', 'logo.png')
+        with override_settings(INVENTARIO_IMAGENES={'FORMATO': 'jpeg'}):
+            principal, _ = imagenes.normalizar(archivo)
+        resultado = Image.open(principal)
+        self.assertEqual((principal.name, resultado.format, resultado.mode), ('logo.jpg', 'JPEG', 'RGB'))
+        self.assertEqual(resultado.size, (40, 20))  # nunca se amplía
+        self.assertGreater(min(resultado.getpixel((10, 10))), 245)
+
+    def test_rechaza_lo_que_no_es_imagen_y_las_enormes(self):
+        with self.assertRaisesMessage(ValidationError, 'no es una imagen válida'):
+            imagenes.normalizar(SimpleUploadedFile('foto.jpg', b'no es una imagen'))
+        with override_settings(INVENTARIO_IMAGENES={'MAX_MEGAPIXELES': 1}):
+            with self.assertRaisesMessage(ValidationError, 'supera 1 megapíxeles'):
+                imagenes.normalizar(self.subida(Image.new('RGB', (1100, 1000))))
+
+
+class MediaTests(TestCase):
+
+    def setUp(self):
+        directorio = tempfile.TemporaryDirectory()
+        self.addCleanup(directorio.cleanup)
+        ajustes = override_settings(
+            STORAGES={**settings.STORAGES, 'pruebas': {
+                'BACKEND': 'django.core.files.storage.FileSystemStorage', 'OPTIONS': {'location': directorio.name},
+            }},
+            INVENTARIO_MEDIA_STORAGE='pruebas',
+        )
+        ajustes.enable()
+        self.addCleanup(ajustes.disable)
+        self.storage = storages['pruebas']
+        self.producto = Producto.objects.create(
+            sku='SKU1', sku_proveedor='PRV1', nombre='Producto', tipo_producto=Producto.TipoProducto.REPUESTO,
+            descripcion_corta='d', ubicacion_principal='A-01', unidad_medida=Producto.UnidadMedida.PZA,
+        )
+
+    def subir(self, secuencia=1, contenido=b'imagen'):
+        imagen = ImagenProducto(producto=self.producto, secuencia=secuencia, imagen=ContentFile(contenido, 'a.webp'))
+        diferidos = media.diferir(imagen, 'imagen')
+        imagen.save()
+        return imagen, media.encolar(imagen, diferidos)[0]
+
+    def test_la_peticion_encola_y_el_worker_sube(self):
+        imagen, trabajo = self.subir()
+        nombre = f'products/{self.producto.internal_id}/1.webp'
+        self.assertEqual(imagen.imagen.name, PREFIJO_PENDIENTE + nombre)
+        self.assertTrue(imagen.pendiente)
+        self.assertFalse(self.storage.exists(nombre))
+
+        recibidos = []
+
+        def recibir(**kwargs):
+            recibidos.append(kwargs['nombre'])
+
+        media.archivo_subido.connect(recibir)
+        self.addCleanup(media.archivo_subido.disconnect, recibir)
+        self.assertEqual(media.tomar(10), [trabajo.pk])
+        self.assertEqual(media.tomar(10), [])  # ya tomado
+        self.assertTrue(media.procesar(trabajo.pk))
+
+        imagen.refresh_from_db()
+        self.assertEqual((imagen.imagen.name, recibidos), (nombre, [nombre]))
+        with self.storage.open(nombre) as archivo:
+            self.assertEqual(archivo.read(), b'imagen')
+        trabajo.refresh_from_db()
+        self.assertEqual((trabajo.estado, bytes(trabajo.contenido)), (TrabajoMedia.Estado.COMPLETADO, b''))
+
+    def test_variantes_en_la_cola_no_se_publican(self):
+        imagen = ImagenProducto(
+            producto=self.producto, imagen=ContentFile(b'i', 'a.webp'),
+            miniatura=ContentFile(b'm', '1-miniatura.webp'), icono=ContentFile(b'c', '1-icono.webp'),
+        )
+        diferidos = media.diferir(imagen, 'imagen', 'miniatura', 'icono')
+        imagen.save()
+        trabajos = {t.campo: t for t in media.encolar(imagen, diferidos)}
+        media.tomar(10)
+        self.assertTrue(media.procesar(trabajos['imagen'].pk))  # las variantes siguen pendientes
+        imagen.refresh_from_db()
+        self.assertFalse(imagen.pendiente)
+        self.assertEqual((imagen.miniatura_subida, imagen.icono_subido), (None, None))
+
+        Producto.objects.filter(pk=self.producto.pk).update(visibilidad_online=Producto.VisibilidadOnline.VENTA)
+        datos = self.client.get(reverse('inventario:catalogo_api')).json()['resultados'][0]['imagenes']
+        self.assertEqual(
+            datos, [{'secuencia': 1, 'url': imagen.imagen.url, 'miniatura': None, 'icono': None}],
+        )
+        self.client.force_login(get_user_model().objects.create_superuser('admin', 'a@example.com', 'x'))
+        for url in (reverse('inventario:buscar'), reverse('inventario:imagenes', args=[self.producto.internal_id])):
+            self.assertNotContains(self.client.get(url), PREFIJO_PENDIENTE)
+
+        self.assertTrue(media.procesar(trabajos['icono'].pk))
+        imagen.refresh_from_db()
+        self.assertContains(self.client.get(reverse('inventario:buscar')), imagen.icono.url)
+
+    def test_reintentos_con_espera_creciente(self):
+        _, trabajo = self.subir()
+        fallas = mock.patch.object(self.storage, 'save', side_effect=OSError('sin red'))
+        with fallas, self.assertLogs('inventario.media', 'WARNING'):
+            for intento, espera in ((1, 30), (2, 60)):
+                TrabajoMedia.objects.filter(pk=trabajo.pk).update(disponible_en=timezone.now())
+                self.assertEqual(media.tomar(10), [trabajo.pk])
+                antes = timezone.now()
+                self.assertFalse(media.procesar(trabajo.pk, max_intentos=3))
+                trabajo.refresh_from_db()
+                self.assertEqual((trabajo.estado, trabajo.intentos), (TrabajoMedia.Estado.PENDIENTE, intento))
+                self.assertGreaterEqual(trabajo.disponible_en, antes + datetime.timedelta(seconds=espera))
+                self.assertIn('sin red', trabajo.error)
+            self.assertEqual(media.tomar(10), [])  # todavía en espera
+            TrabajoMedia.objects.filter(pk=trabajo.pk).update(disponible_en=timezone.now())
+            media.tomar(10)
+            self.assertFalse(media.procesar(trabajo.pk, max_intentos=3))
+        trabajo.refresh_from_db()
+        self.assertEqual(trabajo.estado, TrabajoMedia.Estado.FALLIDO)
+
+    def test_recupera_los_colgados_y_descarta_lo_reemplazado(self):
+        imagen, trabajo = self.subir()
+        media.tomar(10)
+        TrabajoMedia.objects.filter(pk=trabajo.pk).update(tomado_en=timezone.now() - datetime.timedelta(hours=1))
+        self.assertEqual(media.tomar(10, bloqueo_max=600), [trabajo.pk])
+
+        ImagenProducto.objects.filter(pk=imagen.pk).update(imagen='products/otra.webp')
+        self.assertTrue(media.procesar(trabajo.pk))
+        trabajo.refresh_from_db()
+        self.assertIn('Descartado', trabajo.error)
+        self.assertEqual(ImagenProducto.objects.get(pk=imagen.pk).imagen.name, 'products/otra.webp')
+        self.assertEqual(self.storage.listdir(f'products/{self.producto.internal_id}')[1], [])
+
+    @override_settings(INVENTARIO_MEDIA_ASINCRONA=False)
+    def test_sin_cola_no_difiere(self):
+        imagen = ImagenProducto(producto=self.producto, imagen=ContentFile(b'x', 'a.webp'))
+        self.assertEqual(media.diferir(imagen, 'imagen'), [])
+        self.assertEqual(media.encolar(imagen, []), [])
+
+
+class PreciosTests(TestCase):
+
+    def setUp(self):
+        self.ahora = timezone.now()
+        self.producto = Producto.objects.create(
+            sku='SKU1', sku_proveedor='PRV1', nombre='Producto', tipo_producto=Producto.TipoProducto.REPUESTO,
+            descripcion_corta='d', ubicacion_principal='A-01', unidad_medida=Producto.UnidadMedida.PZA,
+            precio_publico=Decimal('100.00'), precio_oferta=Decimal('80.00'),
+            oferta_inicio=self.ahora + datetime.timedelta(hours=1), oferta_fin=self.ahora + datetime.timedelta(hours=3),
+        )
+
+    def en(self, horas):
+        return self.ahora + datetime.timedelta(hours=horas)
+
+    def vigente(self):
+        return Producto.objects.values_list('precio_vigente', 'precio_vigente_hasta').get(pk=self.producto.pk)
+
+    def test_calcular_en_cada_tramo_de_la_ventana(self):
+        p = self.producto
+        argumentos = (p.precio_publico, p.precio_oferta, p.oferta_inicio, p.oferta_fin)
+        self.assertEqual(precios.calcular(*argumentos, ahora=self.ahora), (Decimal('100.00'), self.en(1)))
+        self.assertEqual(precios.calcular(*argumentos, ahora=self.en(1)), (Decimal('80.00'), self.en(3)))
+        self.assertEqual(precios.calcular(*argumentos, ahora=self.en(3)), (Decimal('100.00'), None))
+        self.assertEqual(precios.calcular(p.precio_publico, None, None, None), (Decimal('100.00'), None))
+        self.assertEqual(precios.calcular(p.precio_publico, p.precio_oferta, None, None), (Decimal('80.00'), None))
+
+    def test_save_calcula_y_el_refresco_sigue_la_ventana(self):
+        self.assertEqual(self.vigente(), (Decimal('100.00'), self.en(1)))
+        self.assertEqual(Producto.objects.refrescar_precios(ahora=self.en(0.5)), 0)
+
+        self.assertEqual(Producto.objects.refrescar_precios(ahora=self.en(2)), 1)
+        self.assertEqual(self.vigente(), (Decimal('80.00'), self.en(3)))
+        self.assertEqual(
+            Producto.objects.con_precio_efectivo(self.en(2)).get(pk=self.producto.pk).precio_efectivo,
+            Decimal('80.00'),
+        )
+        self.assertEqual(Producto.objects.get(pk=self.producto.pk).updated_at, self.en(2))
+
+        self.assertEqual(Producto.objects.refrescar_precios(ahora=self.en(4)), 1)
+        self.assertEqual(self.vigente(), (Decimal('100.00'), None))
+        self.assertEqual(Producto.objects.refrescar_precios(ahora=self.en(5)), 0)
+
+    def test_guardar_un_campo_de_precio_y_el_refresco_completo(self):
+        self.producto.oferta_inicio = None
+        self.producto.save(update_fields=['oferta_inicio'])
+        self.assertEqual(self.vigente(), (Decimal('80.00'), self.en(3)))
+
+        Producto.objects.filter(pk=self.producto.pk).update(precio_oferta=Decimal('70.00'))  # sin save()
+        self.assertEqual(Producto.objects.refrescar_precios(ahora=self.ahora), 0)
+        out = io.StringIO()
+        call_command('refrescar_precios', '--completo', stdout=out)
+        self.assertIn('1 producto(s)', out.getvalue())
+        self.assertEqual(self.vigente(), (Decimal('70.00'), self.en(3)))
+
+
+class AlertasStockTests(TestCase):
+
+    def setUp(self):
+        self.producto = self.crear('SKU1', punto_reorden=3)
+        MovimientoStock.registrar(self.producto, 5, MovimientoStock.TipoMovimiento.ENTRADA)
+
+    def crear(self, sku, **campos):
+        return Producto.objects.create(
+            sku=sku, sku_proveedor=sku, nombre=f'Producto {sku}', tipo_producto=Producto.TipoProducto.REPUESTO,
+            descripcion_corta='d', ubicacion_principal='A-01', unidad_medida=Producto.UnidadMedida.PZA, **campos,
+        )
+
+    def salida(self, producto, n):
+        MovimientoStock.registrar(producto, -n, MovimientoStock.TipoMovimiento.SALIDA)
+
+    def test_entra_y_sale_solo_al_cruzar_el_punto_de_reorden(self):
+        self.assertFalse(AlertaStock.objects.exists())
+        self.salida(self.producto, 2)  # 3: en el punto de reorden
+        alerta = AlertaStock.objects.get(producto=self.producto)
+        AlertaStock.objects.filter(pk=alerta.pk).update(notificada_en=timezone.now())
+
+        self.salida(self.producto, 1)  # sigue abajo: la alerta no se toca
+        self.assertEqual(
+            AlertaStock.objects.values_list('pk', 'desde').get(), (alerta.pk, alerta.desde),
+        )
+        self.assertIsNotNone(AlertaStock.objects.get().notificada_en)
+
+        MovimientoStock.registrar(self.producto, 2, MovimientoStock.TipoMovimiento.ENTRADA)  # 4
+        self.assertFalse(AlertaStock.objects.exists())
+
+        sin_punto = self.crear('SKU2')
+        self.salida(sin_punto, 1)
+        self.assertFalse(AlertaStock.objects.exists())
+
+    def test_lote_y_cambio_del_punto_de_reorden(self):
+        otro = self.crear('SKU2', punto_reorden=0)
+        MovimientoStock.registrar_lote([(self.producto, -4), (otro, 1)])
+        self.assertEqual(list(AlertaStock.objects.values_list('producto__sku', flat=True)), ['SKU1'])
+
+        otro.punto_reorden = 5
+        otro.save()
+        self.producto.refresh_from_db()
+        self.producto.punto_reorden = 0
+        self.producto.save(update_fields=['punto_reorden'])
+        self.assertEqual(list(AlertaStock.objects.values_list('producto__sku', flat=True)), ['SKU2'])
+
+    def test_sincronizar_corrige_cambios_hechos_con_update(self):
+        otro = self.crear('SKU2', punto_reorden=10)
+        Producto.objects.filter(pk=self.producto.pk).update(stock_actual=0)
+        AlertaStock.objects.all().delete()
+        AlertaStock.objects.create(producto=self.crear('SKU3', punto_reorden=-1))
+        sincronizar_alertas([self.producto.pk])
+        self.assertEqual(AlertaStock.objects.count(), 2)
+        sincronizar_alertas()
+        self.assertEqual(
+            sorted(AlertaStock.objects.values_list('producto__sku', flat=True)), ['SKU1', otro.sku],
+        )
+
+    @override_settings(MANAGERS=[('Compras', 'compras@example.com')])
+    def test_notificar_bajo_stock_una_sola_vez(self):
+        self.salida(self.producto, 4)
+        out = io.StringIO()
+        call_command('notificar_bajo_stock', stdout=out)
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, ['compras@example.com'])
+        self.assertIn('SKU1 Producto SKU1: stock 1, punto de reorden 3', mail.outbox[0].body)
+        self.assertIsNotNone(AlertaStock.objects.get().notificada_en)
+
+        call_command('notificar_bajo_stock', stdout=out)
+        self.assertIn('Sin alertas por notificar.', out.getvalue())
+        self.assertEqual(len(mail.outbox), 1)
+
+        self.client.force_login(get_user_model().objects.create_user('cajero', 'c@example.com', 'x'))
+        response = self.client.get(reverse('inventario:alertas'))
+        self.assertEqual([a.faltante for a in response.context['alertas']], [2])
+
+
+class ValuacionTests(TestCase):
+
+    def setUp(self):
+        self.proveedor = Proveedor.objects.create(nombre='Proveedor A')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.producto = Producto.objects.create(
+                sku='SKU1', sku_proveedor='PRV1', nombre='Producto', tipo_producto=Producto.TipoProducto.REPUESTO,
+                descripcion_corta='d', ubicacion_principal='A-01', unidad_medida=Producto.UnidadMedida.PZA,
+                proveedor_principal=self.proveedor, costo_unitario=Decimal('2.50'),
+            )
+            MovimientoStock.registrar(self.producto, 10, MovimientoStock.TipoMovimiento.ENTRADA)
+        self.clave = (self.proveedor.pk, Producto.TipoProducto.REPUESTO, Producto.Estado.DISPONIBLE)
+
+    def test_movimientos_suman_cantidad_por_costo_al_confirmar(self):
+        self.assertEqual(valuacion.actual(), {self.clave: (1, 10, Decimal('25.00'))})
+        with self.captureOnCommitCallbacks() as callbacks:
+            MovimientoStock.registrar(self.producto, -4, MovimientoStock.TipoMovimiento.SALIDA)
+            self.assertEqual(valuacion.actual()[self.clave], (1, 10, Decimal('25.00')))  # aún sin confirmar
+        for callback in callbacks:
+            callback()
+        self.assertEqual(valuacion.actual()[self.clave], (1, 6, Decimal('15.00')))
+        self.assertEqual(reconstruir(corregir=False), [])
+
+    def test_cambios_de_costo_clave_y_borrado_mueven_la_contribucion(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.producto.costo_unitario = Decimal('3.00')
+            self.producto.save()
+        self.assertEqual(valuacion.actual()[self.clave], (1, 10, Decimal('30.00')))
+
+        danado = (self.proveedor.pk, Producto.TipoProducto.REPUESTO, Producto.Estado.DANADO)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.producto.estado = Producto.Estado.DANADO
+            self.producto.save(update_fields=['estado'])
+        self.assertEqual(valuacion.actual()[self.clave], (0, 0, Decimal('0.00')))
+        self.assertEqual(valuacion.actual()[danado], (1, 10, Decimal('30.00')))
+
+        with mock.patch('inventario.models.registrar_deltas_valuacion') as registrar:
+            self.producto.nombre = 'Renombrado'
+            self.producto.save(update_fields=['nombre'])
+        registrar.assert_not_called()  # sin campos de valuación no hay delta
+        with self.captureOnCommitCallbacks(execute=True):
+            Producto.objects.get(pk=self.producto.pk).delete()
+        self.assertEqual(valuacion.actual()[danado], (0, 0, Decimal('0.00')))
+        self.assertEqual(reconstruir(corregir=False), [])
+
+    def test_reconstruir_reporta_y_corrige_la_deriva(self):
+        ValuacionInventario.objects.update(unidades=99)
+        out = io.StringIO()
+        call_command('reconciliar_valuacion', '--solo-reportar', stdout=out)
+        self.assertIn('1 clave(s) con deriva, reportada.', out.getvalue())
+        self.assertEqual(
+            reconstruir(), [(self.clave, (1, 99, Decimal('25.00')), (1, 10, Decimal('25.00')))],
+        )
+        self.assertEqual(reconstruir(corregir=False), [])
+
+    def test_tablero_solo_para_gestion(self):
+        self.client.force_login(get_user_model().objects.create_user('cajero', 'c@example.com', 'x'))
+        self.assertEqual(self.client.get(reverse('inventario:valuacion')).status_code, 403)
+        self.client.force_login(get_user_model().objects.create_superuser('admin', 'a@example.com', 'x'))
+        response = self.client.get(reverse('inventario:valuacion'), {'por': 'estado'})
+        self.assertEqual(response.context['por'], 'estado')
+        self.assertEqual(response.context['total_valor'], Decimal('25.00'))
+        self.assertEqual(
+            [(f['etiqueta'], f['unidades']) for f in response.context['filas']], [('Disponible', 10)],
+        )
+
+
+class HuellaTests(TestCase):
+
+    def test_ignora_literales(self):
+        self.assertEqual(
+            huella("SELECT * FROM t WHERE id = 15 AND nombre = 'x'"),
+            huella("SELECT * FROM t WHERE id = 16 AND nombre = 'y'"),
+        )
+        self.assertEqual(
+            huella('SELECT * FROM t WHERE id IN (1, 2, 3)'),
+            huella('SELECT * FROM t WHERE id IN (4)'),
+        )
+
+
+class CargaTests(TestCase):
+
+    def test_generacion_determinista_y_coherente(self):
+        totales = carga.generar(60, 500, usuarios=10, proveedores=3, bloque=25)
+        self.assertEqual(totales['movimientos'], 500)
+        productos = Producto.objects.filter(sku__startswith='CARGA-')
+        self.assertEqual(
+            productos.aggregate(s=Sum('stock_actual'))['s'],
+            MovimientoStock.objects.aggregate(s=Sum('cantidad'))['s'],
+        )
+        self.assertFalse(productos.filter(stock_actual__lt=0).exists())
+        self.assertEqual(reconstruir(corregir=False), [])
+        self.assertEqual(ubicaciones.diferencias(), [])
+        antes = list(productos.order_by('sku').values_list('sku', 'nombre', 'codigo_identificador', 'stock_actual'))
+
+        self.assertEqual(carga.limpiar(bloque=25), 60)
+        carga.generar(60, 500, usuarios=10, proveedores=3, bloque=25)
+        despues = list(productos.order_by('sku').values_list('sku', 'nombre', 'codigo_identificador', 'stock_actual'))
+        self.assertEqual(antes, despues)
+
+    def test_medicion(self):
+        usuario = get_user_model().objects.create_superuser('admin', 'admin@example.com', 'x')
+        carga.generar(20, 40, usuarios=2, proveedores=1)
+        cliente = Client()
+        cliente.force_login(usuario)
+        resultado = rendimiento.resultado(cliente, ['scan', 'ajuste_post'], repeticiones=3, calentamiento=1)
+        self.assertEqual(resultado['escenarios']['scan']['estados'], {'200': 3})
+        self.assertEqual(resultado['escenarios']['ajuste_post']['estados'], {'302': 3})
+        self.assertFalse(MovimientoStock.objects.filter(motivo='medición de rendimiento').exists())
+        self.assertEqual(rendimiento.comparar(resultado, resultado), [])
+
+
+class ImportarTests(TestCase):
+    encabezados = 'sku,sku_proveedor,nombre,tipo_producto,descripcion_corta,ubicacion_principal,cantidad_inicial,' \
+                  'unidad_medida,codigo_identificador'
+
+    def setUp(self):
+        Producto.objects.create(
+            sku='SKU0', sku_proveedor='PRV0', codigo_identificador='036000291452', nombre='Banda',
+            tipo_producto=Producto.TipoProducto.REPUESTO, descripcion_corta='Banda', ubicacion_principal='A-01',
+            unidad_medida=Producto.UnidadMedida.PZA,
+        )
+        directorio = tempfile.TemporaryDirectory()
+        self.addCleanup(directorio.cleanup)
+        self.ruta = os.path.join(directorio.name, 'productos.csv')
+        self.checkpoint = self.ruta + '.checkpoint.json'
+
+    def escribir(self, filas):
+        with open(self.ruta, 'w', encoding='utf-8') as f:
+            f.write('\n'.join([self.encabezados] + [
+                f'{sku},P{sku},{nombre},Repuesto,d,B-01,{cantidad},pza,{codigo}'
+                for sku, nombre, cantidad, codigo in filas
+            ]) + '\n')
+
+    def importar(self, **kwargs):
+        importador = ImportadorProductos(tamano_bloque=2, **kwargs)
+        return importador.importar(leer_filas(self.ruta, self.ruta))
+
+    def test_valida_por_bloques_y_detecta_repetidos(self):
+        self.escribir([
+            ('A1', 'Uno', 1, '7501234567893'),
+            ('A4', 'Cuatro', 1, '07501234567893'),  # el código de A1 en otra forma, mismo bloque
+            ('A1', 'Otro', 1, ''),                  # A1 ya se insertó con el bloque anterior
+            ('A2', '', 1, ''),                      # sin nombre
+            ('A3', 'Tres', 1, '0036000291452'),     # el mismo artículo que SKU0, como EAN-13
+            ('SKU0', 'Cero', 1, ''),
+            ('A5', 'Cinco', 4, ''),
+        ])
+        resultado = self.importar()
+        self.assertEqual((resultado.leidas, resultado.validas, resultado.creadas), (7, 2, 2))
+        errores = dict(resultado.errores)
+        self.assertEqual(sorted(errores), [3, 4, 5, 6, 7])
+        self.assertIn('repetido en el archivo', errores[3][0])
+        self.assertIn('ya existe', errores[4][0])
+        self.assertIn('nombre', errores[5][0])
+        self.assertIn('codigo_identificador: "0036000291452" ya existe', errores[6][0])
+        self.assertIn('ya existe', errores[7][0])
+        self.assertEqual(Producto.objects.get(sku='A5').stock_actual, 4)
+        self.assertEqual(Producto.objects.get(sku='A1').codigos.get().clave, '07501234567893')
+
+        # la simulación valida igual pero no escribe
+        self.escribir([('B1', 'Uno', 1, ''), ('A1', 'Uno', 1, '')])
+        resultado = self.importar(simulacion=True)
+        self.assertEqual((resultado.validas, resultado.creadas, len(resultado.errores)), (1, 0, 1))
+        self.assertFalse(Producto.objects.filter(sku='B1').exists())
+
+    def test_reanuda_desde_el_checkpoint_del_mismo_archivo(self):
+        self.escribir([(f'A{i}', f'Producto {i}', 1, '') for i in range(5)])
+        origen = huella_archivo(self.ruta)
+        insertar, llamadas = ImportadorProductos._insertar, []
+
+        def cortar_en_el_segundo_bloque(importador, productos):
+            llamadas.append(len(productos))
+            if len(llamadas) == 2:
+                raise RuntimeError('corte')
+            return insertar(importador, productos)
+
+        with mock.patch.object(ImportadorProductos, '_insertar', cortar_en_el_segundo_bloque):
+            with self.assertRaises(RuntimeError):
+                self.importar(checkpoint=self.checkpoint, origen=origen)
+        with open(self.checkpoint, encoding='utf-8') as f:
+            self.assertEqual(json.load(f)['fila'], 3)
+
+        # la simulación ignora el checkpoint y no lo toca
+        resultado = self.importar(simulacion=True, checkpoint=self.checkpoint, origen=origen)
+        self.assertEqual((resultado.leidas, resultado.omitidas, len(resultado.errores)), (5, 0, 2))
+        self.assertTrue(os.path.exists(self.checkpoint))
+
+        # otro contenido en la misma ruta: no se reanuda
+        with self.assertRaises(ErrorImportacion):
+            self.importar(checkpoint=self.checkpoint, origen='otra huella')
+
+        resultado = self.importar(checkpoint=self.checkpoint, origen=origen)
+        self.assertEqual((resultado.omitidas, resultado.creadas, resultado.errores), (2, 3, []))
+        self.assertFalse(os.path.exists(self.checkpoint))
+        self.assertEqual(Producto.objects.filter(sku__startswith='A').count(), 5)
+        # mismo lote de movimientos en las dos ejecuciones
+        self.assertEqual(MovimientoStock.objects.values('lote').distinct().count(), 1)
+
+        # terminado: volver a correrlo empieza desde el principio (y todo ya existe)
+        resultado = self.importar(checkpoint=self.checkpoint, origen=origen)
+        self.assertEqual((resultado.omitidas, resultado.creadas, len(resultado.errores)), (0, 0, 5))
+
+
+class UbicacionesTests(TestCase):
+
+    def setUp(self):
+        self.producto = Producto.objects.create(
+            sku='SKU1', codigo_identificador='7501', nombre='Balero', tipo_producto=Producto.TipoProducto.REPUESTO,
+            descripcion_corta='Balero', ubicacion_principal='A-01', unidad_medida=Producto.UnidadMedida.PZA,
+            stock_actual=0,
+        )
+        MovimientoStock.registrar(self.producto, 10, MovimientoStock.TipoMovimiento.ENTRADA)
+        self.principal = Ubicacion.objects.get(codigo='A-01')
+        self.anden = Ubicacion.objects.create(codigo='ANDEN')
+
+    def cantidad_en(self, ubicacion):
+        return ExistenciaUbicacion.objects.get(producto=self.producto, ubicacion=ubicacion).cantidad
+
+    def test_transferencia_no_cambia_el_total(self):
+        MovimientoStock.transferir(self.producto, 4, self.principal, self.anden)
+        self.producto.refresh_from_db()
+        self.assertEqual(self.producto.stock_actual, 10)
+        self.assertEqual((self.cantidad_en(self.principal), self.cantidad_en(self.anden)), (6, 4))
+        self.assertEqual(MovimientoStock.objects.aggregate(s=Sum('cantidad'))['s'], 10)
+        self.assertEqual(ubicaciones.diferencias(), [])
+
+    def test_faltante_en_origen(self):
+        MovimientoStock.registrar_lote([(self.producto, 3)], ubicacion=self.anden)
+        with self.assertRaises(StockInsuficiente):
+            MovimientoStock.transferir(self.producto, 5, self.anden, self.principal)
+        with self.assertRaises(StockInsuficiente):
+            MovimientoStock.registrar(
+                self.producto, -5, MovimientoStock.TipoMovimiento.SALIDA, permitir_negativo=False,
+                ubicacion=self.anden,
+            )
+        self.assertEqual((self.cantidad_en(self.principal), self.cantidad_en(self.anden)), (10, 3))
+
+    def test_sin_negativos_se_revisa_la_ubicacion_que_baja(self):
+        MovimientoStock.transferir(self.producto, 8, self.principal, self.anden)
+        salida = MovimientoStock.TipoMovimiento.SALIDA
+        # sin ubicación basta el total del producto, aunque la principal no tenga
+        MovimientoStock.registrar(self.producto, -5, salida, permitir_negativo=False)
+        MovimientoStock.registrar_lote([(self.producto, -1)], permitir_negativo=False)
+        self.assertEqual((self.cantidad_en(self.principal), self.cantidad_en(self.anden)), (-4, 8))
+        with self.assertRaises(StockInsuficiente):
+            MovimientoStock.registrar(self.producto, -5, salida, permitir_negativo=False)  # quedan 4 en total
+
+        with self.assertRaises(StockInsuficiente):
+            MovimientoStock.registrar(self.producto, -1, salida, permitir_negativo=False, ubicacion=self.principal)
+        with self.assertRaises(StockInsuficiente):
+            MovimientoStock.registrar_lote([(self.producto, -1)], permitir_negativo=False, ubicacion=self.principal)
+        MovimientoStock.registrar(self.producto, -3, salida, permitir_negativo=False, ubicacion=self.anden)
+        self.producto.refresh_from_db()
+        self.assertEqual(self.producto.stock_actual, 1)
+        self.assertEqual((self.cantidad_en(self.principal), self.cantidad_en(self.anden)), (-4, 5))
+
+    def test_reconciliacion(self):
+        Producto.objects.filter(pk=self.producto.pk).update(stock_actual=12)
+        filas = ubicaciones.diferencias()
+        self.assertEqual(filas, [(self.producto.pk, 'A-01', 12, 10)])
+        ubicaciones.corregir(filas)
+        self.assertEqual(self.cantidad_en(self.principal), 12)
+        self.assertEqual(ubicaciones.diferencias(), [])
+
+    def test_cambiar_la_ubicacion_principal_lleva_el_stock(self):
+        usuario = get_user_model().objects.create_superuser('admin', 'a@example.com', 'x')
+        self.client.force_login(usuario)
+        url = reverse('inventario:editar', args=[self.producto.internal_id])
+        datos = {
+            campo: valor for campo, valor in self.client.get(url).context['form'].initial.items()
+            if campo in ProductoUpdateForm.base_fields and valor not in (None, '') and campo != 'manual_tecnico_pdf'
+        }
+        datos.update(sku_proveedor='PRV1', ubicacion_principal='ANDEN', cantidad_inicial=0)
+        response = self.client.post(url, datos)
+        self.assertRedirects(response, url, fetch_redirect_response=False)
+        self.assertEqual(self.cantidad_en(self.principal), 0)
+        self.assertEqual(self.cantidad_en(self.anden), 10)
+        self.assertEqual(ubicaciones.diferencias(), [])
+        # las salidas sin ubicación ya toman de la nueva principal
+        self.producto.refresh_from_db()
+        MovimientoStock.registrar(
+            self.producto, -4, MovimientoStock.TipoMovimiento.SALIDA, permitir_negativo=False,
+        )
+        self.assertEqual(self.cantidad_en(self.anden), 6)
+        self.assertEqual(ubicaciones.cambiar_principal(self.producto, 'ANDEN'), [])
+
+
+class FragmentoStockTests(TestCase):
+
+    def setUp(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.producto = Producto.objects.create(
+                sku='SKU1', codigo_identificador='7501', nombre='Cinta', tipo_producto=Producto.TipoProducto.NUEVO,
+                descripcion_corta='Cinta', ubicacion_principal='A-01', unidad_medida=Producto.UnidadMedida.PZA,
+                punto_reorden=5, costo_unitario=Decimal('2'), fragmentos_stock=4,
+            )
+
+    def total(self):
+        return Producto.objects.con_stock_total().get(pk=self.producto.pk).stock_total
+
+    def test_movimientos_van_a_los_contadores_hasta_plegar(self):
+        for _ in range(10):
+            MovimientoStock.registrar(self.producto, 3, MovimientoStock.TipoMovimiento.ENTRADA)
+        MovimientoStock.registrar(self.producto, -2, MovimientoStock.TipoMovimiento.SALIDA)
+        self.producto.refresh_from_db()
+        self.assertEqual(self.producto.stock_actual, 0)
+        self.assertEqual(self.total(), 28)
+        self.assertLessEqual(self.producto.fragmentos.count(), 4)
+        self.assertEqual(historico.stock_en(self.producto, timezone.now()), 28)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(plegar_fragmentos(), 1)
+        self.producto.refresh_from_db()
+        self.assertEqual((self.producto.stock_actual, self.total()), (28, 28))
+        self.assertFalse(self.producto.fragmentos.exclude(cantidad=0).exists())
+        self.assertFalse(AlertaStock.objects.filter(producto=self.producto).exists())
+        self.assertEqual(ubicaciones.diferencias(), [])
+        self.assertEqual(reconstruir(corregir=False), [])
+
+    def test_retiro_sin_negativos_pliega_antes(self):
+        MovimientoStock.registrar(self.producto, 5, MovimientoStock.TipoMovimiento.ENTRADA)
+        with self.assertRaises(StockInsuficiente):
+            MovimientoStock.registrar(
+                self.producto, -6, MovimientoStock.TipoMovimiento.SALIDA, permitir_negativo=False,
+            )
+        MovimientoStock.registrar(self.producto, -5, MovimientoStock.TipoMovimiento.SALIDA, permitir_negativo=False)
+        self.producto.refresh_from_db()
+        self.assertEqual((self.producto.stock_actual, self.total()), (0, 0))
+
+
+class CodigosProductoTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        cache_codigos.limpiar()
+        self.producto = Producto.objects.create(
+            sku='SKU1', sku_proveedor='PRV1', codigo_identificador='036000291452', nombre='Banda',
+            tipo_producto=Producto.TipoProducto.REPUESTO, descripcion_corta='Banda', ubicacion_principal='A-01',
+            unidad_medida=Producto.UnidadMedida.PZA,
+        )
+
+    def datos_formulario(self, codigo):
+        return {
+            'codigo_identificador': codigo, 'sku': 'SKU2', 'sku_proveedor': 'PRV2', 'nombre': 'Banda',
+            'tipo_producto': Producto.TipoProducto.REPUESTO, 'descripcion_corta': 'Banda',
+            'estado': Producto.Estado.DISPONIBLE, 'ubicacion_principal': 'A-01', 'cantidad_inicial': 0,
+            'unidad_medida': Producto.UnidadMedida.PZA,
+        }
+
+    def test_formas_equivalentes(self):
+        self.assertEqual(codigos.normalizar('036000291452'), codigos.normalizar(' 0036000291452'))
+        self.assertEqual(codigos.analizar('04252614'), ('00042100005264', codigos.UPCE))
+        self.assertEqual(codigos.normalizar('042100005264'), '00042100005264')
+        self.assertEqual(codigos.analizar('CAJA-0042'), ('CAJA-0042', codigos.OTRO))
+        # dígito verificador inválido: no es un GTIN, se guarda tal cual
+        self.assertEqual(codigos.normalizar('0036000291453'), '0036000291453')
+        self.assertTrue(codigos.verificador_invalido('0036000291453'))
+
+    def test_cualquier_forma_resuelve_el_mismo_producto(self):
+        CodigoProducto.objects.create(producto=self.producto, codigo='04252614')
+        # por pares, la misma clave: la segunda forma ya no consulta la base
+        for i, codigo in enumerate(('0036000291452', '036000291452', '042100005264', '04252614')):
+            with self.assertNumQueries(1 - i % 2):
+                self.assertEqual(cache_codigos.obtener(codigo).pk, self.producto.pk, codigo)
+            self.assertEqual(buscar_productos(codigo, Producto.objects.all()).first().pk, self.producto.pk)
+        encontrados = resolver_codigos(['0036000291452', '04252614', 'SKU1', 'NADA'])
+        self.assertEqual({c: p.pk for c, p in encontrados.items()}, dict.fromkeys(
+            ['0036000291452', '04252614', 'SKU1'], self.producto.pk,
+        ))
+
+    def test_cambio_de_codigo_y_duplicados(self):
+        self.assertIsNone(cache_codigos.obtener('7501234567893'))
+        self.producto.codigo_identificador = '7501234567893'
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.producto.save()
+        # la caché se invalida al confirmar: hasta entonces sigue la entrada negativa
+        self.assertIsNone(cache_codigos.obtener('7501234567893'))
+        for callback in callbacks:
+            callback()
+        self.assertEqual(list(self.producto.codigos.values_list('clave', flat=True)), ['07501234567893'])
+        self.assertIsNone(cache_codigos.obtener('036000291452'))
+        self.assertEqual(cache_codigos.obtener('07501234567893').pk, self.producto.pk)
+
+        form = ProductoCreateForm(data=self.datos_formulario('07501234567893'))
+        self.assertIn('ya está asignado', form.errors['codigo_identificador'][0])
+        form = ProductoCreateForm(data=self.datos_formulario('7501234567890'))
+        self.assertIn('dígito verificador', form.errors['codigo_identificador'][0])
+        self.assertTrue(ProductoCreateForm(data=self.datos_formulario('036000291452')).is_valid())
+
+    def test_admin_y_save_validan_el_alias(self):
+        otro = Producto.objects.create(
+            sku='SKU3', sku_proveedor='PRV3', codigo_identificador='CAJA-3', nombre='Polea',
+            tipo_producto=Producto.TipoProducto.REPUESTO, descripcion_corta='Polea', ubicacion_principal='A-01',
+            unidad_medida=Producto.UnidadMedida.PZA,
+        )
+        otro.codigo_identificador = '0036000291452'
+        with self.assertRaises(ValidationError) as error:
+            otro.full_clean()
+        self.assertIn('ya está asignado', error.exception.message_dict['codigo_identificador'][0])
+        with self.assertRaises(ValidationError):
+            otro.save()
+        self.assertEqual(list(otro.codigos.values_list('codigo', flat=True)), ['CAJA-3'])
+
+        request = RequestFactory().get('/')
+        request.user = get_user_model().objects.create_superuser('admin', 'a@example.com', 'x')
+        Formulario = ProductoAdmin(Producto, admin.site).get_form(request, otro)
+        datos = {**self.datos_formulario('0036000291452'), 'sku': 'SKU3', 'sku_proveedor': 'PRV3'}
+        form = Formulario(data=datos, instance=Producto.objects.get(pk=otro.pk))
+        self.assertIn('ya está asignado', form.errors['codigo_identificador'][0])
+
+    def test_migracion_lista_los_codigos_repetidos(self):
+        filas = [(1, '036000291452'), (2, '0036000291452'), (3, 'CAJA-3'), (4, ' CAJA-3'), (5, '7501234567893')]
+        self.assertEqual(codigos.repetidos(filas), {
+            '00036000291452': [(1, '036000291452'), (2, '0036000291452')],
+            'CAJA-3': [(3, 'CAJA-3'), (4, ' CAJA-3')],
+        })
+        self.assertEqual(codigos.repetidos([(1, 'A'), (1, ' A')]), {})
+
+
+class KitsTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.tornillo, self.tuerca = self.producto('SKU1', 10), self.producto('SKU2', 7)
+        self.juego_tuercas = self.producto('KIT1', tipo=Producto.TipoProducto.KIT)
+        self.kit = self.producto('KIT2', tipo=Producto.TipoProducto.KIT)
+        with self.captureOnCommitCallbacks(execute=True):
+            ComponenteKit.objects.bulk_create([
+                ComponenteKit(kit=self.juego_tuercas, componente=self.tuerca, cantidad=2),
+                ComponenteKit(kit=self.kit, componente=self.tornillo, cantidad=1),
+                ComponenteKit(kit=self.kit, componente=self.juego_tuercas, cantidad=1),
+            ])
+
+    def producto(self, sku, stock=0, tipo=Producto.TipoProducto.REPUESTO):
+        producto = Producto.objects.create(
+            sku=sku, sku_proveedor=sku, nombre=sku, tipo_producto=tipo, descripcion_corta=sku,
+            ubicacion_principal='A-01', unidad_medida=Producto.UnidadMedida.PZA,
+        )
+        if stock:
+            MovimientoStock.registrar(producto, stock, MovimientoStock.TipoMovimiento.ENTRADA)
+        return producto
+
+    def test_disponibilidad_en_cache_e_invalidada_por_movimientos(self):
+        ids = [self.kit.pk, self.juego_tuercas.pk, self.tornillo.pk]
+        self.assertEqual(kits.disponibles(ids), {self.kit.pk: 3, self.juego_tuercas.pk: 3})
+        with self.assertNumQueries(0):
+            kits.disponibles(ids)
+        with self.captureOnCommitCallbacks(execute=True):
+            MovimientoStock.registrar(self.tuerca, 4, MovimientoStock.TipoMovimiento.ENTRADA)
+        self.assertEqual(kits.disponibles(ids), {self.kit.pk: 5, self.juego_tuercas.pk: 5})
+
+    def test_venta_saca_los_componentes_en_un_lote(self):
+        movimientos = kits.vender_kit(self.kit, 2)
+        self.assertEqual(
+            sorted((m.producto_id, m.cantidad) for m in movimientos),
+            [(self.tornillo.pk, -2), (self.tuerca.pk, -4)],
+        )
+        self.assertEqual(len({m.lote for m in movimientos}), 1)
+        with self.assertRaises(StockInsuficiente):
+            kits.vender_kit(self.kit, 2)
+        stock = dict(
+            Producto.objects.filter(pk__in=[self.tornillo.pk, self.tuerca.pk]).values_list('pk', 'stock_actual')
+        )
+        self.assertEqual(stock, {self.tornillo.pk: 8, self.tuerca.pk: 3})
+
+    def test_referencia_circular(self):
+        with self.assertRaises(ValidationError):
+            ComponenteKit(kit=self.juego_tuercas, componente=self.kit).clean()
+        with self.assertRaises(ValidationError):
+            ComponenteKit(kit=self.tornillo, componente=self.tuerca).clean()
+
+    def stock(self):
+        return dict(
+            Producto.objects.filter(pk__in=[self.tornillo.pk, self.tuerca.pk])
+            .values_list('sku', 'stock_actual')
+        )
+
+    def test_lotes_y_escaneo_sacan_los_componentes(self):
+        self.client.force_login(get_user_model().objects.create_superuser('admin', 'a@example.com', 'x'))
+
+        def escanear(accion):
+            return self.client.post(
+                reverse('inventario:scan_lote'),
+                json.dumps({'lote': str(uuid.uuid4()), 'accion': accion, 'codigos': {'KIT2': 1, 'SKU1': 1}}),
+                content_type='application/json',
+            ).json()
+
+        self.assertEqual(escanear('remove')['aplicados'], {'KIT2': 1, 'SKU1': 1})
+        self.assertEqual(self.stock(), {'SKU1': 8, 'SKU2': 5})
+        respuesta = escanear('add')
+        self.assertEqual((respuesta['kits'], respuesta['aplicados']), (['KIT2'], {'SKU1': 1}))
+        self.assertEqual(self.stock(), {'SKU1': 9, 'SKU2': 5})
+        self.assertFalse(MovimientoStock.objects.filter(producto__tipo_producto=Producto.TipoProducto.KIT).exists())
+
+        response = self.client.post(reverse('inventario:lote'), {'accion': 'remove', 'codigos': 'KIT2'}, follow=True)
+        self.assertEqual(
+            [str(m) for m in response.context['messages']],
+            ['Lote aplicado: 1 producto(s), 1 unidad(es), 2 movimiento(s).'],
+        )
+        self.assertEqual(self.stock(), {'SKU1': 8, 'SKU2': 3})
+
+        with self.assertRaises(ValidationError):
+            kits.registrar_lote([(self.kit, 1)])
+        # los componentes no quedan en negativo aunque el resto del lote sí pueda
+        with self.assertRaises(StockInsuficiente):
+            kits.registrar_lote([(self.kit, -3)])
+        self.assertEqual(self.stock(), {'SKU1': 8, 'SKU2': 3})
+
+        self.kit.codigo_identificador = 'CAJA-KIT2'
+        self.kit.save(update_fields=['codigo_identificador'])
+        response = self.client.post(
+            reverse('inventario:scan_result'), {'action': 'agregar_existencia', 'code': 'CAJA-KIT2'},
+        )
+        self.assertRedirects(response, reverse('inventario:ajuste', args=[self.kit.internal_id]),
+                             fetch_redirect_response=False)
+        self.kit.refresh_from_db()
+        self.assertEqual(self.kit.stock_actual, 0)
+
+    def test_reserva_de_kit_aparta_los_componentes(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            reserva = reservas.reservar(self.kit, 2)
+        reservado = dict(
+            Producto.objects.filter(pk__in=[self.tornillo.pk, self.tuerca.pk, self.kit.pk])
+            .values_list('sku', 'stock_reservado')
+        )
+        self.assertEqual(reservado, {'SKU1': 2, 'SKU2': 4, 'KIT2': 0})
+        self.assertEqual(kits.disponibles([self.kit.pk]), {self.kit.pk: 1})
+        with self.assertRaises(StockInsuficiente):
+            reservas.reservar(self.kit, 2)
+        with self.assertRaises(StockInsuficiente):
+            kits.vender_kit(self.kit, 2)
+
+        movimiento = reservas.convertir(reserva)
+        self.assertEqual(MovimientoStock.objects.filter(lote=movimiento.lote).count(), 2)
+        self.assertEqual(self.stock(), {'SKU1': 8, 'SKU2': 3})
+        self.assertEqual(sum(Producto.objects.values_list('stock_reservado', flat=True)), 0)
+
+        reservas.reservar(self.kit, 1, minutos=1)
+        self.assertEqual(reservas.vencer(timezone.now() + datetime.timedelta(minutes=5)), 1)
+        self.assertEqual(sum(Producto.objects.values_list('stock_reservado', flat=True)), 0)
+
+
+class ReservasTests(TestCase):
+
+    def setUp(self):
+        self.producto = self.crear('SKU1')
+        MovimientoStock.registrar(self.producto, 10, MovimientoStock.TipoMovimiento.ENTRADA)
+
+    def crear(self, sku):
+        return Producto.objects.create(
+            sku=sku, sku_proveedor=sku, nombre=sku, tipo_producto=Producto.TipoProducto.REPUESTO,
+            descripcion_corta=sku, ubicacion_principal='A-01', unidad_medida=Producto.UnidadMedida.PZA,
+        )
+
+    def disponible(self, producto=None):
+        return Producto.objects.con_disponible().values_list('disponible', flat=True).get(
+            pk=(producto or self.producto).pk,
+        )
+
+    def test_lo_reservado_no_se_puede_vender_ni_reservar_otra_vez(self):
+        reservas.reservar(self.producto, 6, referencia='COT-1')
+        self.assertEqual(self.disponible(), 4)
+        with self.assertRaises(StockInsuficiente):
+            reservas.reservar(self.producto, 5)
+        with self.assertRaises(StockInsuficiente):
+            MovimientoStock.registrar(self.producto, -5, MovimientoStock.TipoMovimiento.SALIDA, permitir_negativo=False)
+        MovimientoStock.registrar(self.producto, -4, MovimientoStock.TipoMovimiento.SALIDA, permitir_negativo=False)
+        self.assertEqual(self.disponible(), 0)
+
+    def test_convertir_y_liberar(self):
+        reserva = reservas.reservar(self.producto, 3)
+        movimiento = reservas.convertir(reserva)
+        self.assertEqual((movimiento.cantidad, reserva.estado), (-3, Reserva.EstadoReserva.CONVERTIDA))
+        self.assertEqual(Reserva.objects.get(pk=reserva.pk).movimiento_id, movimiento.pk)
+        self.producto.refresh_from_db()
+        self.assertEqual((self.producto.stock_actual, self.producto.stock_reservado), (7, 0))
+        with self.assertRaises(ValidationError):
+            reservas.convertir(reserva)
+
+        reservas.liberar(reservas.reservar(self.producto, 2))
+        self.assertEqual(self.disponible(), 7)
+        vencida = reservas.reservar(self.producto, 2, minutos=1)
+        Reserva.objects.filter(pk=vencida.pk).update(vence_en=timezone.now() - datetime.timedelta(minutes=1))
+        with self.assertRaises(ValidationError):
+            reservas.convertir(vencida)
+
+    def test_guardar_una_copia_vieja_no_pisa_los_contadores(self):
+        vieja = Producto.objects.get(pk=self.producto.pk)
+        MovimientoStock.registrar(self.producto, 5, MovimientoStock.TipoMovimiento.ENTRADA)
+        reservas.reservar(self.producto, 4)
+        vieja.nombre = 'Renombrado'
+        vieja.save()
+        self.producto.refresh_from_db()
+        self.assertEqual(
+            (self.producto.nombre, self.producto.stock_actual, self.producto.stock_reservado), ('Renombrado', 15, 4),
+        )
+        self.assertEqual(ExistenciaUbicacion.objects.get(producto=self.producto).cantidad, 15)
+        self.assertEqual(ubicaciones.diferencias(), [])
+
+    def test_barrido_de_vencidas_por_bloques(self):
+        otro = self.crear('SKU2')
+        MovimientoStock.registrar(otro, 5, MovimientoStock.TipoMovimiento.ENTRADA)
+        for producto, cantidad in ((self.producto, 2), (self.producto, 3), (otro, 5)):
+            reservas.reservar(producto, cantidad, minutos=10)
+        vigente = reservas.reservar(self.producto, 1, minutos=120)
+
+        self.assertEqual(reservas.vencer(timezone.now() + datetime.timedelta(minutes=30), bloque=2), 3)
+        self.assertEqual((self.disponible(), self.disponible(otro)), (9, 5))
+        self.assertEqual(Reserva.objects.filter(estado=Reserva.EstadoReserva.VENCIDA).count(), 3)
+        self.assertEqual(Reserva.objects.get(pk=vigente.pk).estado, Reserva.EstadoReserva.ACTIVA)
+        self.assertEqual(reservas.vencer(timezone.now() + datetime.timedelta(minutes=30)), 0)
+
+
+class CatalogoTests(TestCase):
+
+    def setUp(self):
+        self.productos = [
+            Producto.objects.create(
+                sku=f'SKU{i}', sku_proveedor=f'PRV{i}', nombre=f'Producto {i}',
+                tipo_producto=Producto.TipoProducto.NUEVO, descripcion_corta='d', ubicacion_principal='A-01',
+                unidad_medida=Producto.UnidadMedida.PZA,
+                visibilidad_online=Producto.VisibilidadOnline.VENTA, precio_publico=Decimal('10.00') + i,
+            )
+            for i in range(3)
+        ]
+        self.url = reverse('inventario:catalogo_api') + '?por_pagina=2'
+
+    def test_304_con_etag_y_sin_last_modified(self):
+        response = self.client.get(self.url)
+        etag = response.headers['ETag']
+        self.assertEqual([p['sku'] for p in response.json()['resultados']], ['SKU0', 'SKU1'])
+        self.assertNotIn('Last-Modified', response.headers)
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        comprimida = self.client.get(self.url, HTTP_ACCEPT_ENCODING='gzip')
+        self.assertNotEqual(comprimida.headers['ETag'], etag)
+
+        # un producto sale de la página: cambia la ventana aunque ningún updated_at avance
+        oculto = Producto.VisibilidadOnline.OCULTO
+        Producto.objects.filter(pk=self.productos[1].pk).update(visibilidad_online=oculto)
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([p['sku'] for p in response.json()['resultados']], ['SKU0', 'SKU2'])
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=response.headers['ETag']).status_code, 304)
+
+
+@override_settings(INVENTARIO_REPLICAS=['replica'], INVENTARIO_REPLICAS_FIJAR=30)
+class ReplicasTests(SimpleTestCase):
+
+    def setUp(self):
+        self.router = replicas.RouterReplicas()
+
+    def test_solo_lo_marcado_lee_de_la_replica(self):
+        self.assertIsNone(self.router.db_for_read(Producto))
+        with replicas.en_replica():
+            self.assertEqual(self.router.db_for_read(Producto), 'replica')
+            with replicas.en_primaria():
+                self.assertIsNone(self.router.db_for_read(Producto))
+        self.assertFalse(self.router.allow_migrate('replica', 'inventario'))
+
+    def test_streaming_sigue_en_la_replica(self):
+        class Exportacion:
+            def dispatch(vista, request):
+                return StreamingHttpResponse(self.router.db_for_read(Producto) for _ in range(2))
+
+        class Vista(replicas.LecturaReplicaMixin, Exportacion):
+            pass
+
+        response = Vista().dispatch(RequestFactory().get('/'))
+        self.assertEqual(b''.join(response.streaming_content), b'replicareplica')
+
+    def test_quien_escribe_queda_en_la_primaria(self):
+        def escribe(request):
+            self.router.db_for_write(Producto)
+            return HttpResponse()
+
+        def lee(request):
+            return HttpResponse(replicas.elegir_replica() or 'default')
+
+        response = replicas.ReplicasMiddleware(escribe)(RequestFactory().post('/'))
+        cookie = response.cookies[replicas.COOKIE]
+        self.assertEqual(cookie['max-age'], 30)
+
+        factory = RequestFactory()
+        self.assertEqual(replicas.ReplicasMiddleware(lee)(factory.get('/')).content, b'replica')
+        factory.cookies[replicas.COOKIE] = cookie.value
+        self.assertEqual(replicas.ReplicasMiddleware(lee)(factory.get('/')).content, b'default')
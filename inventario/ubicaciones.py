@@ -0,0 +1,86 @@
+"""
+Existencias por ubicación (``Ubicacion`` / ``ExistenciaUbicacion``).
+
+``Producto.stock_actual`` es el total mantenido de las existencias del producto: los
+movimientos cambian ambos en la misma transacción y las transferencias solo mueven
+existencias. ``diferencias`` / ``corregir`` revisan ese invariante
+(``manage.py reconciliar_existencias``).
+
+Al cambiar ``ubicacion_principal`` de un producto, ``cambiar_principal`` transfiere lo que
+había en la ubicación anterior: los movimientos sin ubicación siguen encontrando el stock.
+"""
+from django.db import transaction
+from django.db.models import F, IntegerField, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+from .models import (
+    ExistenciaUbicacion, MovimientoStock, Producto, Ubicacion, codigo_ubicacion, incrementar_existencias,
+    plegar_fragmentos,
+)
+
+
+def existencias_en(ubicacion):
+    """Existencias no nulas de ``ubicacion`` (instancia o id), en orden de producto (índice)."""
+    return (
+        ExistenciaUbicacion.objects.filter(ubicacion=ubicacion).exclude(cantidad=0)
+        .order_by('producto_id')
+    )
+
+
+def existencias_de(producto):
+    return (
+        ExistenciaUbicacion.objects.filter(producto=producto).exclude(cantidad=0)
+        .select_related('ubicacion').order_by('ubicacion__codigo')
+    )
+
+
+def con_total_ubicaciones(queryset=None):
+    """Anota ``en_ubicaciones``: suma de las existencias de cada producto."""
+    qs = Producto.objects.all() if queryset is None else queryset
+    suma = (
+        ExistenciaUbicacion.objects.filter(producto=OuterRef('pk'))
+        .order_by().values('producto').annotate(total=Sum('cantidad')).values('total')[:1]
+    )
+    return qs.annotate(en_ubicaciones=Coalesce(Subquery(suma, output_field=IntegerField()), Value(0)))
+
+
+def diferencias():
+    """``[(producto_id, ubicacion_principal, stock_actual, en_ubicaciones)]`` que no cuadran."""
+    return list(
+        con_total_ubicaciones().exclude(stock_actual=F('en_ubicaciones'))
+        .order_by('pk').values_list('pk', 'ubicacion_principal', 'stock_actual', 'en_ubicaciones')
+    )
+
+
+def corregir(filas):
+    """Lleva la diferencia de cada fila de ``diferencias()`` a la ubicación principal del producto."""
+    with transaction.atomic():
+        ids = Ubicacion.ids_por_codigo([codigo for _, codigo, _, _ in filas])
+        incrementar_existencias({
+            (pk, ids[codigo_ubicacion(codigo)]): stock - en_ubicaciones
+            for pk, codigo, stock, en_ubicaciones in filas
+        }, permitir_negativo=True, using=None)
+
+
+def cambiar_principal(producto, anterior, usuario=None, ip=None):
+    """
+    Transfiere la existencia de la ubicación principal ``anterior`` (código) a la actual de
+    ``producto``, ya guardada. Devuelve los movimientos (``[]`` si no había nada que mover).
+    """
+    if codigo_ubicacion(anterior) == codigo_ubicacion(producto.ubicacion_principal):
+        return []
+    with transaction.atomic():
+        # primero el producto, como los movimientos; luego sus contadores y la existencia
+        list(Producto.objects.select_for_update().filter(pk=producto.pk).values_list('pk', flat=True))
+        plegar_fragmentos([producto.pk])
+        ids = Ubicacion.ids_por_codigo([anterior, producto.ubicacion_principal])
+        origen, destino = ids[codigo_ubicacion(anterior)], ids[codigo_ubicacion(producto.ubicacion_principal)]
+        cantidad = (
+            ExistenciaUbicacion.objects.select_for_update().filter(producto=producto, ubicacion_id=origen)
+            .values_list('cantidad', flat=True).first()
+        )
+        if not cantidad or cantidad < 0:
+            return []
+        return MovimientoStock.transferir(
+            producto, cantidad, origen, destino, usuario, ip, motivo='Cambio de ubicación principal',
+        )
@@ -12,5 +12,16 @@ urlpatterns = [
     path('<uuid:internal_id>/editar/', views.ProductoEditarView.as_view(), name='editar'),
     path('<uuid:internal_id>/imagenes/', views.ProductoImagenesView.as_view(), name='imagenes'),
     path('<uuid:internal_id>/ajuste/', views.AjusteStockView.as_view(), name='ajuste'),
+    path('<uuid:internal_id>/transferir/', views.TransferenciaView.as_view(), name='transferir'),
+    path('ubicaciones/', views.UbicacionesView.as_view(), name='ubicaciones'),
+    path('ubicaciones/<int:pk>/', views.UbicacionDetalleView.as_view(), name='ubicacion'),
+    path('alertas/', views.AlertasStockView.as_view(), name='alertas'),
+    path('valuacion/', views.ValuacionView.as_view(), name='valuacion'),
+    path('lote/', views.MovimientoLoteView.as_view(), name='lote'),
     path('scan/result/', views.ScanResultView.as_view(), name='scan_result'),
+    path('scan/lote/', views.ScanLoteView.as_view(), name='scan_lote'),
+    path('exportar/productos/', views.ExportarProductosView.as_view(), name='exportar_productos'),
+    path('exportar/movimientos/', views.ExportarMovimientosView.as_view(), name='exportar_movimientos'),
+    path('api/catalogo/', views.CatalogoApiView.as_view(), name='catalogo_api'),
+    path('metricas/', views.MetricasView.as_view(), name='metricas'),
 ]
\ No newline at end of file
@@ -0,0 +1,84 @@
+"""
+Valuación del inventario por proveedor / tipo / estado.
+
+``ValuacionInventario`` se mantiene con deltas (``registrar_deltas_valuacion`` en models.py):
+los movimientos suman ``cantidad * costo`` y ``Producto.save`` / el borrado mueven la
+contribución completa del producto cuando cambian costo, proveedor, tipo o estado. El tablero
+lee esa tabla chica; ``reconstruir`` recalcula desde ``Producto`` y reporta la deriva.
+"""
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Count, DecimalField, ExpressionWrapper, F, Sum, Value
+from django.db.models.functions import Coalesce
+
+from .models import Producto, ValuacionInventario
+
+DIMENSIONES = {
+    'proveedor': 'proveedor__nombre',
+    'tipo': 'tipo_producto',
+    'estado': 'estado',
+}
+
+
+def calcular():
+    """``{(proveedor_id, tipo, estado): (productos, unidades, valor)}`` agregando ``Producto`` completo."""
+    valor = ExpressionWrapper(
+        F('stock_actual') * Coalesce('costo_unitario', Value(Decimal('0'))),
+        output_field=DecimalField(max_digits=18, decimal_places=2),
+    )
+    filas = (
+        Producto.objects.order_by()
+        .values('proveedor_principal_id', 'tipo_producto', 'estado')
+        .annotate(n=Count('id'), unidades=Sum('stock_actual'), valor=Sum(valor))
+    )
+    return {
+        (f['proveedor_principal_id'], f['tipo_producto'], f['estado']):
+            (f['n'], f['unidades'] or 0, Decimal(f['valor'] or 0).quantize(Decimal('0.01')))
+        for f in filas
+    }
+
+
+def actual():
+    return {
+        (v.proveedor_id, v.tipo_producto, v.estado): (v.productos, v.unidades, v.valor)
+        for v in ValuacionInventario.objects.all()
+    }
+
+
+def reconstruir(corregir=True):
+    """
+    Compara la tabla con el cálculo completo. Devuelve ``[(clave, guardado, esperado)]`` con
+    las claves que difieren; con ``corregir`` reemplaza la tabla por el cálculo.
+    """
+    with transaction.atomic():
+        # bloquea la tabla de valuación: ningún delta se aplica a medias durante el reemplazo
+        list(ValuacionInventario.objects.select_for_update().values_list('pk'))
+        esperado = calcular()
+        guardado = actual()
+        vacio = (0, 0, Decimal('0.00'))
+        diferencias = [
+            (clave, guardado.get(clave, vacio), esperado.get(clave, vacio))
+            for clave in sorted(set(esperado) | set(guardado), key=lambda c: tuple(str(x) for x in c))
+            if guardado.get(clave, vacio) != esperado.get(clave, vacio)
+        ]
+        if corregir and diferencias:
+            ValuacionInventario.objects.all().delete()
+            ValuacionInventario.objects.bulk_create([
+                ValuacionInventario(
+                    proveedor_id=proveedor, tipo_producto=tipo, estado=estado,
+                    productos=productos, unidades=unidades, valor=valor,
+                )
+                for (proveedor, tipo, estado), (productos, unidades, valor) in esperado.items()
+            ])
+    return diferencias
+
+
+def resumen(por='proveedor'):
+    """Totales de la tabla agrupados por una dimensión de ``DIMENSIONES``."""
+    campo = DIMENSIONES[por]
+    return list(
+        ValuacionInventario.objects.values(etiqueta=F(campo))
+        .annotate(productos=Sum('productos'), unidades=Sum('unidades'), valor=Sum('valor'))
+        .order_by('-valor', 'etiqueta')
+    )
@@ -1,16 +1,37 @@
 # C:\Users\acant\Documents\XPYME\inventario\views.py
 
+import datetime
+import json
+import uuid
+
+from django.conf import settings
 from django.contrib import messages
 from django.contrib.auth.mixins import LoginRequiredMixin
-from django.db.models import Q
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError, router, transaction
+from django.db.models import F, Prefetch, Sum
+from django.http import Http404, HttpResponse, HttpResponseForbidden, JsonResponse, StreamingHttpResponse
 from django.shortcuts import get_object_or_404, redirect
 from django.urls import reverse
-from django.views.generic import TemplateView, ListView, CreateView, UpdateView, FormView
+from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.text import compress_string
+from django.utils.crypto import constant_time_compare
+from django.utils.functional import cached_property
+from django.views.generic import TemplateView, ListView, CreateView, UpdateView, FormView, View
 
-from .models import Producto, ImagenProducto, MovimientoStock
+from . import catalogo, exportar, kits, media, ubicaciones, valuacion
+from .busqueda import buscar_productos
+from .cache_codigos import cache_codigos
+from .codigos import normalizar
+from .models import (
+    AlertaStock, CodigoProducto, LoteAplicado, Producto, ImagenProducto, MovimientoStock, StockInsuficiente, Ubicacion,
+)
+from .paginacion import CursorInvalido, KeysetPaginator
+from .replicas import LecturaReplicaMixin
 from .forms import (
     ProductoCreateForm, ProductoUpdateForm,
-    ImagenProductoFormSet, AjusteStockForm
+    ImagenProductoFormSet, AjusteStockForm, MovimientoLoteForm, TransferenciaForm, ExportarForm, user_is_manager
 )
 
 def client_ip(request):
@@ -19,26 +40,74 @@ def client_ip(request):
         return xff.split(',')[0].strip()
     return request.META.get('REMOTE_ADDR')
 
+def resolver_codigos(codigos):
+    """
+    Resuelve muchos códigos (o SKUs) en bloque. Devuelve {código: Producto}. Los códigos de
+    barras (por clave normalizada, cualquier alias) tienen prioridad sobre un SKU igual; solo
+    los que no resuelven así se buscan como SKU, en una segunda consulta.
+    """
+    claves = {codigo: normalizar(codigo) for codigo in set(codigos)}
+    campos = ('id', 'internal_id', 'nombre', 'sku', 'codigo_identificador')
+    por_clave = {}
+    alias = (
+        CodigoProducto.objects.filter(clave__in=set(claves.values()))
+        .select_related('producto').only('clave', *(f'producto__{c}' for c in campos))
+    )
+    for a in alias:
+        por_clave[a.clave] = a.producto
+    encontrados = {c: por_clave[k] for c, k in claves.items() if k in por_clave}
+    faltan = set(claves) - set(encontrados)
+    if faltan:
+        for p in Producto.objects.filter(sku__in=faltan).only(*campos):
+            encontrados[p.sku] = p
+    return encontrados
+
 class SeleccionView(LoginRequiredMixin, TemplateView):
     template_name = 'inventario/seleccion.html'
 
-class ProductoBuscarView(LoginRequiredMixin, ListView):
+class ProductoBuscarView(LoginRequiredMixin, LecturaReplicaMixin, ListView):
     model = Producto
     template_name = 'inventario/buscar.html'
     context_object_name = 'productos'
+    # solo las columnas que muestra la tabla de resultados
+    campos_listado = ('id', 'internal_id', 'sku', 'nombre', 'estado', 'stock_actual', 'ubicacion_principal')
 
     def get_queryset(self):
-        q = self.request.GET.get('q', '').strip()
-        qs = Producto.objects.all()
-        if q:
-            qs = qs.filter(
-                Q(nombre__icontains=q) |
-                Q(sku__icontains=q) |
-                Q(sku_proveedor__icontains=q) |
-                Q(codigo_identificador__icontains=q) |
-                Q(palabras_clave__icontains=q)
-            )
-        return qs.order_by('nombre')
+        # exactos (SKU / código) primero y luego por relevancia; ver inventario/busqueda.py
+        # ícono de la primera imagen: una consulta extra por página, no una por fila
+        portada = Prefetch(
+            'imagenes',
+            queryset=ImagenProducto.objects.only('id', 'producto_id', 'secuencia', 'imagen', 'icono').order_by('secuencia'),
+            to_attr='portada',
+        )
+        qs = Producto.objects.only(*self.campos_listado).prefetch_related(portada)
+        return buscar_productos(self.request.GET.get('q', ''), qs)
+
+    def get_paginate_by(self, queryset):
+        por_pagina = getattr(settings, 'INVENTARIO_BUSQUEDA_POR_PAGINA', 50)
+        maximo = getattr(settings, 'INVENTARIO_BUSQUEDA_POR_PAGINA_MAX', 200)
+        try:
+            por_pagina = int(self.request.GET.get('por_pagina', por_pagina))
+        except ValueError:
+            pass
+        return max(1, min(por_pagina, maximo))
+
+    def paginate_queryset(self, queryset, page_size):
+        # paginación por cursor (nombre, id) en lugar de OFFSET; sin COUNT(*) en modo 'estimado'
+        paginator = KeysetPaginator(
+            queryset, page_size,
+            modo_conteo=getattr(settings, 'INVENTARIO_BUSQUEDA_CONTEO', 'estimado'),
+        )
+        try:
+            page = paginator.pagina(self.request.GET.get('cursor') or None)
+        except CursorInvalido:
+            raise Http404('Cursor de paginación inválido.')
+        return paginator, page, page.object_list, page.has_other_pages()
+
+    def get_context_data(self, **kwargs):
+        ctx = super().get_context_data(**kwargs)
+        ctx['total'], ctx['total_aproximado'] = ctx['paginator'].conteo()
+        return ctx
 
 class ProductoCrearView(LoginRequiredMixin, CreateView):
     model = Producto
@@ -59,20 +128,24 @@ class ProductoCrearView(LoginRequiredMixin, CreateView):
         producto = form.save(commit=False)
         producto.created_by = self.request.user
         producto.updated_by = self.request.user
-        producto.stock_actual = form.cleaned_data.get('cantidad_inicial') or 0
-        producto.save()
-        form.save_m2m()
-
-        cant = producto.cantidad_inicial or 0
-        if cant > 0:
-            MovimientoStock.registrar(
-                producto=producto,
-                cantidad_signed=cant,
-                tipo=MovimientoStock.TipoMovimiento.ENTRADA,
-                usuario=self.request.user,
-                ip=client_ip(self.request),
-                motivo='Alta de producto (inicial)'
-            )
+        # el movimiento inicial es el que fija el stock (antes se sumaba dos veces)
+        producto.stock_actual = 0
+        with transaction.atomic():
+            diferidos = media.diferir(producto, 'manual_tecnico_pdf')
+            producto.save()
+            media.encolar(producto, diferidos)
+            form.save_m2m()
+
+            cant = producto.cantidad_inicial or 0
+            if cant > 0:
+                MovimientoStock.registrar(
+                    producto=producto,
+                    cantidad_signed=cant,
+                    tipo=MovimientoStock.TipoMovimiento.ENTRADA,
+                    usuario=self.request.user,
+                    ip=client_ip(self.request),
+                    motivo='Alta de producto (inicial)'
+                )
         messages.success(self.request, 'Producto creado correctamente.')
         return redirect('inventario:imagenes', internal_id=producto.internal_id)
 
@@ -91,9 +164,23 @@ class ProductoEditarView(LoginRequiredMixin, UpdateView):
     def form_valid(self, form):
         producto = form.save(commit=False)
         producto.updated_by = self.request.user
-        producto.save()
-        form.save_m2m()
+        with transaction.atomic():
+            diferidos = media.diferir(producto, 'manual_tecnico_pdf')
+            producto.save()
+            media.encolar(producto, diferidos)
+            form.save_m2m()
+            movidos = []
+            if 'ubicacion_principal' in form.changed_data:
+                movidos = ubicaciones.cambiar_principal(
+                    producto, form.initial.get('ubicacion_principal'), self.request.user, client_ip(self.request),
+                )
         messages.success(self.request, 'Producto actualizado correctamente.')
+        if movidos:
+            messages.info(
+                self.request,
+                f'Se transfirieron {movidos[1].cantidad} unidad(es) de {form.initial.get("ubicacion_principal")} '
+                f'a {producto.ubicacion_principal}.',
+            )
         return redirect('inventario:editar', internal_id=producto.internal_id)
 
 class ProductoImagenesView(LoginRequiredMixin, UpdateView):
@@ -115,7 +202,8 @@ class ProductoImagenesView(LoginRequiredMixin, UpdateView):
         self.object = self.get_object()
         formset = ImagenProductoFormSet(request.POST, request.FILES, instance=self.object)
         if formset.is_valid():
-            formset.save()
+            with transaction.atomic():
+                formset.save()
             messages.success(request, 'Imágenes actualizadas.')
             return redirect('inventario:editar', internal_id=self.object.internal_id)
         return self.render_to_response(self.get_context_data())
@@ -125,11 +213,19 @@ class AjusteStockView(LoginRequiredMixin, FormView):
     form_class = AjusteStockForm
 
     def get_product(self):
-        return get_object_or_404(Producto, internal_id=self.kwargs['internal_id'])
+        return get_object_or_404(Producto.objects.con_stock_total(), internal_id=self.kwargs['internal_id'])
+
+    @staticmethod
+    def kit_disponibles(producto):
+        """Kits armables con el stock de los componentes; ``None`` si no es un kit con componentes."""
+        if producto.tipo_producto != Producto.TipoProducto.KIT:
+            return None
+        return kits.disponibles([producto.pk]).get(producto.pk)
 
     def get_context_data(self, **kwargs):
         ctx = super().get_context_data(**kwargs)
         ctx['producto'] = self.get_product()
+        ctx['kit_disponibles'] = self.kit_disponibles(ctx['producto'])
         return ctx
 
     def form_valid(self, form):
@@ -139,33 +235,281 @@ class AjusteStockView(LoginRequiredMixin, FormView):
         motivo = form.cleaned_data.get('motivo') or accion
         ip = client_ip(self.request)
 
-        if accion == 'add':
-            MovimientoStock.registrar(producto, cantidad, MovimientoStock.TipoMovimiento.ENTRADA,
-                                      self.request.user, ip,
-                                      motivo='Ingreso manual' if motivo == 'add' else motivo)
-        elif accion == 'remove':
-            MovimientoStock.registrar(producto, -cantidad, MovimientoStock.TipoMovimiento.SALIDA,
-                                      self.request.user, ip,
-                                      motivo='Salida manual' if motivo == 'remove' else motivo)
-        else:
-            MovimientoStock.registrar(producto, cantidad, MovimientoStock.TipoMovimiento.AJUSTE,
-                                      self.request.user, ip, motivo=motivo)
+        if self.kit_disponibles(producto) is not None:
+            # el stock de un kit es el de sus componentes: solo se vende (salen los componentes)
+            if accion != 'remove':
+                form.add_error('accion', 'El stock de un kit se calcula con sus componentes; ajusta los componentes.')
+                return self.form_invalid(form)
+            try:
+                kits.vender_kit(producto, cantidad, self.request.user, ip,
+                                motivo=None if motivo == 'remove' else motivo)
+            except StockInsuficiente as exc:
+                form.add_error('cantidad', exc)
+                return self.form_invalid(form)
+            messages.success(self.request, f'Se registró la salida de los componentes de {cantidad} kit(s).')
+            return redirect('inventario:editar', internal_id=producto.internal_id)
+
+        try:
+            if accion == 'add':
+                MovimientoStock.registrar(producto, cantidad, MovimientoStock.TipoMovimiento.ENTRADA,
+                                          self.request.user, ip,
+                                          motivo='Ingreso manual' if motivo == 'add' else motivo)
+            elif accion == 'remove':
+                MovimientoStock.registrar(producto, -cantidad, MovimientoStock.TipoMovimiento.SALIDA,
+                                          self.request.user, ip,
+                                          motivo='Salida manual' if motivo == 'remove' else motivo)
+            else:
+                MovimientoStock.registrar(producto, cantidad, MovimientoStock.TipoMovimiento.AJUSTE,
+                                          self.request.user, ip, motivo=motivo)
+        except StockInsuficiente as exc:
+            form.add_error('cantidad', exc)
+            return self.form_invalid(form)
 
         if (producto.stock_actual or 0) == 0:
             messages.warning(self.request, f'Atención: el stock del producto {producto} llegó a CERO.')
+        elif producto.punto_reorden is not None and producto.stock_actual <= producto.punto_reorden:
+            messages.warning(
+                self.request,
+                f'El stock de {producto} ({producto.stock_actual}) está en o bajo su punto de reorden '
+                f'({producto.punto_reorden}).'
+            )
 
         messages.success(self.request, 'Movimiento de stock aplicado.')
         return redirect('inventario:editar', internal_id=producto.internal_id)
 
+class TransferenciaView(LoginRequiredMixin, FormView):
+    """Mueve existencias de un producto entre ubicaciones; no cambia su stock total."""
+    template_name = 'inventario/transferencia.html'
+    form_class = TransferenciaForm
+
+    @cached_property
+    def producto(self):
+        return get_object_or_404(
+            Producto.objects.only('id', 'internal_id', 'nombre', 'sku', 'stock_actual', 'ubicacion_principal'),
+            internal_id=self.kwargs['internal_id'],
+        )
+
+    def get_form_kwargs(self):
+        kwargs = super().get_form_kwargs()
+        kwargs['producto'] = self.producto
+        return kwargs
+
+    def get_context_data(self, **kwargs):
+        ctx = super().get_context_data(**kwargs)
+        ctx['producto'] = self.producto
+        ctx['existencias'] = ubicaciones.existencias_de(self.producto)
+        return ctx
+
+    def form_valid(self, form):
+        datos = form.cleaned_data
+        try:
+            MovimientoStock.transferir(
+                self.producto, datos['cantidad'], datos['origen'], datos['destino'],
+                self.request.user, client_ip(self.request), datos.get('motivo') or 'Transferencia',
+            )
+        except StockInsuficiente as exc:
+            form.add_error('cantidad', exc)
+            return self.form_invalid(form)
+        messages.success(
+            self.request, f"Transferidas {datos['cantidad']} unidad(es) de {datos['origen']} a {datos['destino']}."
+        )
+        return redirect('inventario:transferir', internal_id=self.producto.internal_id)
+
+
+class UbicacionesView(LoginRequiredMixin, LecturaReplicaMixin, ListView):
+    """Ubicaciones por código (prefijo) y sucursal."""
+    template_name = 'inventario/ubicaciones.html'
+    context_object_name = 'ubicaciones'
+    paginate_by = 100
+
+    def get_queryset(self):
+        qs = Ubicacion.objects.order_by('codigo')
+        if self.request.GET.get('q'):
+            qs = qs.filter(codigo__startswith=self.request.GET['q'].strip())
+        if self.request.GET.get('sucursal'):
+            qs = qs.filter(sucursal=self.request.GET['sucursal'])
+        return qs
+
+class UbicacionDetalleView(LoginRequiredMixin, LecturaReplicaMixin, ListView):
+    """Qué hay en una ubicación: sus existencias, paginadas por cursor sobre (ubicacion, producto)."""
+    template_name = 'inventario/ubicacion_detalle.html'
+    context_object_name = 'existencias'
+
+    def get_queryset(self):
+        self.ubicacion = get_object_or_404(Ubicacion, pk=self.kwargs['pk'])
+        return ubicaciones.existencias_en(self.ubicacion).select_related('producto').only(
+            'id', 'cantidad', 'producto_id', 'ubicacion_id',
+            'producto__internal_id', 'producto__sku', 'producto__nombre', 'producto__unidad_medida',
+        )
+
+    def get_paginate_by(self, queryset):
+        return getattr(settings, 'INVENTARIO_BUSQUEDA_POR_PAGINA', 50)
+
+    def paginate_queryset(self, queryset, page_size):
+        paginator = KeysetPaginator(queryset, page_size, modo_conteo='ninguno')
+        try:
+            page = paginator.pagina(self.request.GET.get('cursor') or None)
+        except CursorInvalido:
+            raise Http404('Cursor de paginación inválido.')
+        return paginator, page, page.object_list, page.has_other_pages()
+
+    def get_context_data(self, **kwargs):
+        ctx = super().get_context_data(**kwargs)
+        ctx['ubicacion'] = self.ubicacion
+        ctx['unidades'] = ubicaciones.existencias_en(self.ubicacion).aggregate(t=Sum('cantidad'))['t'] or 0
+        return ctx
+
+class AlertasStockView(LoginRequiredMixin, LecturaReplicaMixin, ListView):
+    """Productos en o bajo su punto de reorden (lee ``AlertaStock``, no recorre ``Producto``)."""
+    template_name = 'inventario/alertas.html'
+    context_object_name = 'alertas'
+    paginate_by = 100
+
+    def get_queryset(self):
+        return (
+            AlertaStock.objects.select_related('producto', 'producto__proveedor_principal')
+            .only(
+                'desde', 'notificada_en', 'producto__internal_id', 'producto__sku', 'producto__nombre',
+                'producto__stock_actual', 'producto__punto_reorden', 'producto__ubicacion_principal',
+                'producto__proveedor_principal__nombre',
+            )
+            .annotate(faltante=F('producto__punto_reorden') - F('producto__stock_actual'))
+            .order_by('desde', 'pk')
+        )
+
+class ValuacionView(LoginRequiredMixin, LecturaReplicaMixin, TemplateView):
+    """Valor del inventario por proveedor / tipo / estado (tabla ``ValuacionInventario``)."""
+    template_name = 'inventario/valuacion.html'
+
+    def dispatch(self, request, *args, **kwargs):
+        # el costo es un dato sensible (ver forms.CAMPOS_SENSIBLES)
+        if request.user.is_authenticated and not user_is_manager(request.user):
+            return HttpResponseForbidden()
+        return super().dispatch(request, *args, **kwargs)
+
+    def get_context_data(self, **kwargs):
+        ctx = super().get_context_data(**kwargs)
+        por = self.request.GET.get('por', 'proveedor')
+        if por not in valuacion.DIMENSIONES:
+            por = 'proveedor'
+        filas = valuacion.resumen(por)
+        ctx.update({
+            'por': por,
+            'dimensiones': list(valuacion.DIMENSIONES),
+            'filas': filas,
+            'total_valor': sum((f['valor'] or 0 for f in filas), 0),
+            'total_unidades': sum(f['unidades'] or 0 for f in filas),
+        })
+        return ctx
+
+class MovimientoLoteView(LoginRequiredMixin, FormView):
+    """Recepción / despacho de un embarque completo en una sola transacción."""
+    template_name = 'inventario/lote.html'
+    form_class = MovimientoLoteForm
+
+    def form_valid(self, form):
+        cantidades = form.cleaned_data['codigos']
+        productos = resolver_codigos(cantidades)
+        faltantes = sorted(set(cantidades) - set(productos))
+        if faltantes:
+            form.add_error('codigos', f"Códigos no encontrados: {', '.join(faltantes)}")
+            return self.form_invalid(form)
+
+        entrada = form.cleaned_data['accion'] == 'add'
+        signo = 1 if entrada else -1
+        motivo = form.cleaned_data.get('motivo') or ('Recepción por lote' if entrada else 'Despacho por lote')
+        try:
+            # los kits salen como sus componentes; su entrada se rechaza
+            movimientos = kits.registrar_lote(
+                [(productos[code], signo * cant) for code, cant in cantidades.items()],
+                self.request.user, client_ip(self.request), motivo,
+            )
+        except ValidationError as exc:
+            form.add_error('codigos', exc)
+            return self.form_invalid(form)
+
+        # productos escaneados, no movimientos: un kit genera uno por componente y varios
+        # códigos pueden ser del mismo producto
+        escaneados = len({p.pk for p in productos.values()})
+        unidades = sum(cantidades.values())
+        messages.success(
+            self.request,
+            f'Lote aplicado: {escaneados} producto(s), {unidades} unidad(es), {len(movimientos)} movimiento(s).'
+        )
+        return redirect('inventario:lote')
+
+class ScanLoteView(LoginRequiredMixin, View):
+    """
+    Endpoint JSON del modo de escaneo continuo (seleccion.html). Recibe la cola de códigos
+    acumulada en el navegador (también sin conexión) y la aplica con ``registrar_lote``::
+
+        {"lote": "<uuid del cliente>", "accion": "add" | "remove",
+         "codigos": {"7501234567890": 3, "ABC-1": 1}}
+
+    ``lote`` hace el envío idempotente: si el cliente reintenta un lote ya aplicado
+    (p. ej. se perdió la respuesta) no se vuelve a mover el stock. Un kit sale como sus
+    componentes; su entrada no se aplica y se informa en ``kits``.
+    """
+    raise_exception = True
+    max_codigos = 2000
+
+    def post(self, request, *args, **kwargs):
+        try:
+            datos = json.loads(request.body)
+            lote = uuid.UUID(str(datos['lote']))
+            accion = datos.get('accion', 'add')
+            codigos = {str(c).strip(): int(n) for c, n in datos['codigos'].items()}
+        except (ValueError, KeyError, TypeError, AttributeError):
+            return JsonResponse({'error': 'Solicitud inválida.'}, status=400)
+        codigos = {c: n for c, n in codigos.items() if c and n > 0}
+        if accion not in ('add', 'remove') or not codigos or len(codigos) > self.max_codigos:
+            return JsonResponse({'error': 'Solicitud inválida.'}, status=400)
+
+        respuesta = {'lote': str(lote), 'duplicado': False}
+        productos = resolver_codigos(codigos)
+        respuesta['desconocidos'] = sorted(set(codigos) - set(productos))
+        if accion == 'add':
+            # el stock de un kit es el de sus componentes: su entrada no se aplica
+            con_componentes = kits.con_componentes({p.pk for p in productos.values()})
+            respuesta['kits'] = sorted(c for c, p in productos.items() if p.pk in con_componentes)
+            productos = {c: p for c, p in productos.items() if p.pk not in con_componentes}
+        signo = 1 if accion == 'add' else -1
+        items = [(productos[c], signo * n) for c, n in codigos.items() if c in productos]
+        using = router.db_for_write(MovimientoStock)
+        try:
+            with transaction.atomic(using=using):
+                # el lote se reclama en la misma transacción que sus movimientos: un reintento
+                # concurrente espera a esta y falla por la restricción única
+                try:
+                    with transaction.atomic(using=using):
+                        LoteAplicado.objects.using(using).create(lote=lote, usuario=request.user)
+                except IntegrityError:
+                    respuesta['duplicado'] = True
+                    return JsonResponse(respuesta)
+                kits.registrar_lote(
+                    items, request.user, client_ip(request),
+                    'Ingreso por escaneo (lote)' if accion == 'add' else 'Salida por escaneo (lote)',
+                    lote=lote,
+                )
+        # cualquier rechazo deshace también el reclamo del lote; 4xx: el cliente no lo reintenta
+        except StockInsuficiente as exc:
+            return JsonResponse({'lote': str(lote), 'error': ' '.join(exc.messages)}, status=409)
+        except Producto.DoesNotExist:
+            error = 'Un producto del lote se eliminó mientras se aplicaba; vuelve a escanearlo.'
+            return JsonResponse({'lote': str(lote), 'error': error}, status=409)
+        except ValidationError as exc:
+            return JsonResponse({'lote': str(lote), 'error': ' '.join(exc.messages)}, status=400)
+
+        respuesta['aplicados'] = {c: n for c, n in codigos.items() if c in productos}
+        return JsonResponse(respuesta)
+
 class ScanResultView(LoginRequiredMixin, TemplateView):
     template_name = 'inventario/scan_result.html'
 
     def get_context_data(self, **kwargs):
         ctx = super().get_context_data(**kwargs)
         code = self.request.GET.get('code', '').strip()
-        producto = None
-        if code:
-            producto = Producto.objects.filter(Q(codigo_identificador=code)).first()
+        producto = cache_codigos.obtener(code)
         ctx['code'] = code
         ctx['producto'] = producto
         return ctx
@@ -173,9 +517,12 @@ class ScanResultView(LoginRequiredMixin, TemplateView):
     def post(self, request, *args, **kwargs):
         action = request.POST.get('action')
         code = request.POST.get('code')
-        producto = Producto.objects.filter(Q(codigo_identificador=code)).first()
+        producto = cache_codigos.obtener(code)
 
         if action == 'agregar_existencia' and producto:
+            if kits.con_componentes([producto.pk]):
+                messages.error(request, 'El stock de un kit se calcula con sus componentes; escanea los componentes.')
+                return redirect('inventario:ajuste', internal_id=producto.internal_id)
             MovimientoStock.registrar(producto, 1, MovimientoStock.TipoMovimiento.ENTRADA,
                                       request.user, client_ip(request),
                                       motivo='Ingreso por escaneo')
@@ -191,4 +538,141 @@ class ScanResultView(LoginRequiredMixin, TemplateView):
         if action == 'crear_nuevo':
             return redirect(f"{reverse('inventario:nuevo')}?code={code}")
 
-        return redirect('inventario:seleccion')
\ No newline at end of file
+        return redirect('inventario:seleccion')
+
+class MetricasView(View):
+    """
+    Contadores en formato de texto de Prometheus (por proceso).
+    Acceso: usuarios staff o ``Authorization: Bearer <INVENTARIO_METRICAS_TOKEN>``.
+    """
+
+    def get(self, request, *args, **kwargs):
+        token = getattr(settings, 'INVENTARIO_METRICAS_TOKEN', None)
+        autorizado = request.user.is_authenticated and request.user.is_staff
+        if not autorizado and token:
+            autorizado = constant_time_compare(request.headers.get('Authorization', ''), f'Bearer {token}')
+        if not autorizado:
+            return HttpResponseForbidden()
+
+        lineas = [
+            '# HELP inventario_cache_codigos_total Consultas a la caché de códigos escaneados.',
+            '# TYPE inventario_cache_codigos_total counter',
+        ]
+        estadisticas = dict(cache_codigos.estadisticas)
+        for evento in ('acierto_local', 'acierto_compartido', 'fallo', 'negativo', 'desalojo', 'invalidacion'):
+            lineas.append(f'inventario_cache_codigos_total{{evento="{evento}"}} {estadisticas.get(evento, 0)}')
+        lineas += [
+            '# HELP inventario_cache_codigos_entradas Entradas en la LRU local.',
+            '# TYPE inventario_cache_codigos_entradas gauge',
+            f'inventario_cache_codigos_entradas {cache_codigos.tamano()}',
+        ]
+        return HttpResponse('\n'.join(lineas) + '\n', content_type='text/plain; version=0.0.4')
+
+
+class CatalogoApiView(LecturaReplicaMixin, View):
+    """
+    Catálogo público en JSON (ver ``inventario/catalogo.py``). Parámetros GET: campos,
+    orden (id | precio | -precio | actualizado), cursor, por_pagina, visibilidad, tipo, marca,
+    precio_min, precio_max, modificado_desde.
+
+    El ETag fuerte sale de (id, updated_at) de la página: con If-None-Match vigente se
+    responde 304 sin leer ni serializar los productos. Sin Last-Modified (ver catalogo.py).
+    """
+
+    def get_por_pagina(self):
+        por_pagina = getattr(settings, 'INVENTARIO_CATALOGO_POR_PAGINA', 24)
+        maximo = getattr(settings, 'INVENTARIO_CATALOGO_POR_PAGINA_MAX', 100)
+        try:
+            por_pagina = int(self.request.GET.get('por_pagina', por_pagina))
+        except ValueError:
+            pass
+        return max(1, min(por_pagina, maximo))
+
+    def get(self, request, *args, **kwargs):
+        try:
+            consulta = catalogo.ConsultaCatalogo(request.GET, self.get_por_pagina())
+            etag_base = consulta.firma()
+        except ValidationError as exc:
+            return JsonResponse({'error': ' '.join(exc.messages)}, status=400)
+        except CursorInvalido:
+            return JsonResponse({'error': 'Cursor inválido.'}, status=400)
+
+        # ETag fuerte: distinto por codificación porque el cuerpo cambia
+        comprimir = 'gzip' in request.headers.get('Accept-Encoding', '')
+        etag = f'"{etag_base}{"-gz" if comprimir else ""}"'
+
+        respuesta = get_conditional_response(request, etag=etag)
+        if respuesta is None:
+            cuerpo = json.dumps(
+                consulta.serializar(consulta.pagina()), ensure_ascii=False, separators=(',', ':')
+            ).encode('utf-8')
+            respuesta = HttpResponse(cuerpo, content_type='application/json; charset=utf-8')
+            if comprimir:
+                respuesta.content = compress_string(cuerpo)
+                respuesta.headers['Content-Encoding'] = 'gzip'
+        respuesta.headers['ETag'] = etag
+        patch_vary_headers(respuesta, ('Accept-Encoding',))
+        patch_cache_control(respuesta, public=True, max_age=getattr(settings, 'INVENTARIO_CATALOGO_MAX_AGE', 60))
+        return respuesta
+
+
+class ExportarBaseView(LoginRequiredMixin, LecturaReplicaMixin, View):
+    """
+    Descarga en streaming. Parámetros GET: formato=csv|jsonl, gzip=1, desde/hasta (AAAA-MM-DD,
+    ambos inclusive), proveedor (id), tipo.
+    """
+    raise_exception = True
+    nombre = None
+    queryset = None  # QuerySet base; los filtros se aplican con exportar.filtrar
+    columnas = None
+
+    def get_queryset(self, filtros):
+        return exportar.filtrar(self.queryset.all(), **filtros)
+
+    def get_columnas(self):
+        return list(self.columnas)
+
+    def get(self, request, *args, **kwargs):
+        form = ExportarForm(request.GET)
+        if not form.is_valid():
+            return JsonResponse({'errores': form.errors}, status=400)
+        datos = form.cleaned_data
+        filtros = {
+            'desde': _inicio_del_dia(datos['desde']),
+            'hasta': _inicio_del_dia(datos['hasta'], siguiente=True),
+            'proveedor': datos['proveedor'],
+            'tipo': datos['tipo'],
+        }
+        formato, comprimir = datos['formato'], datos['gzip']
+        contenido = exportar.stream(self.get_queryset(filtros), self.get_columnas(), formato, comprimir)
+        extension = formato + ('.gz' if comprimir else '')
+        response = StreamingHttpResponse(
+            contenido,
+            content_type='application/gzip' if comprimir else exportar.FORMATOS[formato][1],
+        )
+        fecha = timezone.localdate().isoformat()
+        response['Content-Disposition'] = f'attachment; filename="{self.nombre}-{fecha}.{extension}"'
+        return response
+
+class ExportarProductosView(ExportarBaseView):
+    nombre = 'productos'
+    queryset = Producto.objects.con_stock_total()
+    columnas = exportar.COLUMNAS_PRODUCTO
+
+    def get_columnas(self):
+        columnas = super().get_columnas()
+        if user_is_manager(self.request.user):
+            columnas += exportar.COLUMNAS_PRODUCTO_SENSIBLES
+        return columnas
+
+class ExportarMovimientosView(ExportarBaseView):
+    nombre = 'movimientos'
+    queryset = MovimientoStock.objects.all()
+    columnas = exportar.COLUMNAS_MOVIMIENTO
+
+def _inicio_del_dia(fecha, siguiente=False):
+    if fecha is None:
+        return None
+    if siguiente:
+        fecha += datetime.timedelta(days=1)
+    return timezone.make_aware(datetime.datetime.combine(fecha, datetime.time.min))
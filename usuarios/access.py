@@ -0,0 +1,150 @@
+"""
+Per-user role and permission resolution, loaded once and cached.
+
+``for_user(user)`` returns an ``Access``: role id and name, superuser flag and the effective
+permission set (direct + group + ``Role.permissions``, as ``'app_label.codename'``). It is
+memoized on the user object for the rest of the request and kept in the Django cache across
+requests. The cache key holds the user's role id and flags, so changing ``role_obj``,
+``is_superuser`` or ``is_active`` (even with ``update()``) simply misses the old entry. It
+also holds a global version, bumped on commit (``usuarios/signals.py``) by any change to a
+``Role``, to ``Role.permissions``, to group permissions or to a user's groups / direct
+permissions: every entry goes stale at once, which is fine for data edited this rarely.
+
+Optional wiring in settings::
+
+    AUTHENTICATION_BACKENDS = ['usuarios.access.RoleBackend']  # has_perm() reads the cache
+    TEMPLATES[0]['OPTIONS']['context_processors'] += ['usuarios.access.context']  # {{ access }}
+
+    USERS_ACCESS_CACHE = 'default'  # CACHES alias
+    USERS_ACCESS_TTL = 300          # seconds
+"""
+import time
+
+from django.conf import settings
+from django.contrib.auth.backends import ModelBackend
+from django.contrib.auth.models import Permission
+from django.core.cache import caches
+from django.db.models import Q
+from django.utils.functional import SimpleLazyObject
+
+from .models import Role
+
+MANAGEMENT_ROLES = frozenset({'Administrador', 'Supervisor', 'Boss'})
+
+VERSION_KEY = 'usuarios:access:version'
+_MEMO_ATTR = '_access_cache'
+
+
+class Access:
+    __slots__ = ('user_id', 'role_id', 'role_name', 'is_superuser', 'permissions')
+
+    def __init__(self, user_id, role_id, role_name, is_superuser, permissions):
+        self.user_id = user_id
+        self.role_id = role_id
+        self.role_name = role_name
+        self.is_superuser = is_superuser
+        self.permissions = frozenset(permissions)
+
+    def __repr__(self):
+        return f'<Access user={self.user_id} role={self.role_name!r} perms={len(self.permissions)}>'
+
+    @property
+    def is_manager(self):
+        return self.is_superuser or self.role_name in MANAGEMENT_ROLES
+
+    def has_perm(self, perm):
+        return self.is_superuser or perm in self.permissions
+
+    def has_module_perms(self, app_label):
+        return self.is_superuser or any(p.startswith(f'{app_label}.') for p in self.permissions)
+
+    def as_tuple(self):
+        return self.user_id, self.role_id, self.role_name, self.is_superuser, tuple(sorted(self.permissions))
+
+
+ANONYMOUS = Access(None, None, None, False, ())
+
+
+def _cache():
+    return caches[getattr(settings, 'USERS_ACCESS_CACHE', 'default')]
+
+
+def _version(cache):
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        # a clock-based start never repeats a version whose entries may still be cached
+        cache.add(VERSION_KEY, time.time_ns(), None)
+        version = cache.get(VERSION_KEY)
+    return version
+
+
+def _key(user, version):
+    return f'usuarios:access:{version}:{user.pk}:{user.role_obj_id}:{user.is_superuser:d}{user.is_active:d}'
+
+
+def load(user):
+    """Reads the user's access from the database: at most one query for the role, one for permissions."""
+    role_name = None
+    if user.role_obj_id:
+        if user._meta.get_field('role_obj').is_cached(user):
+            role_name = user.role_obj.name if user.role_obj else None
+        else:
+            role_name = Role.objects.filter(pk=user.role_obj_id).values_list('name', flat=True).first()
+    permissions = ()
+    if user.is_active and not user.is_superuser:
+        match = Q(user=user) | Q(group__user=user)
+        if user.role_obj_id:
+            match |= Q(role=user.role_obj_id)
+        permissions = {
+            f'{app_label}.{codename}'
+            for app_label, codename in Permission.objects.filter(match)
+            .values_list('content_type__app_label', 'codename').distinct()
+        }
+    return Access(user.pk, user.role_obj_id, role_name, user.is_active and user.is_superuser, permissions)
+
+
+def for_user(user):
+    if user is None or not user.is_authenticated:
+        return ANONYMOUS
+    access = getattr(user, _MEMO_ATTR, None)
+    if access is not None:
+        return access
+    cache = _cache()
+    key = _key(user, _version(cache))
+    data = cache.get(key)
+    if data is None:
+        access = load(user)
+        cache.set(key, access.as_tuple(), getattr(settings, 'USERS_ACCESS_TTL', 300))
+    else:
+        access = Access(*data)
+    setattr(user, _MEMO_ATTR, access)
+    return access
+
+
+def clear_memo(user):
+    user.__dict__.pop(_MEMO_ATTR, None)
+
+
+def bump_version():
+    """Invalidates every cached access."""
+    cache = _cache()
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        _version(cache)
+
+
+class RoleBackend(ModelBackend):
+    """``ModelBackend`` whose permission checks read ``for_user`` and include ``Role.permissions``."""
+
+    def get_all_permissions(self, user_obj, obj=None):
+        if not user_obj.is_active or user_obj.is_anonymous or obj is not None:
+            return set()
+        if user_obj.is_superuser:
+            return super().get_all_permissions(user_obj, obj)
+        return set(for_user(user_obj).permissions)
+
+
+def context(request):
+    """Template context processor: ``access`` for the current user, resolved on first use."""
+    return {'access': SimpleLazyObject(lambda: for_user(getattr(request, 'user', None)))}
@@ -21,6 +21,7 @@ class CustomUserAdmin(UserAdmin):
     )
     search_fields = ('username', 'email', 'phone', 'first_name', 'paternal_last_name')
     ordering = ('username',)
+    list_select_related = ('role_obj',)
 
     fieldsets = (
         (None, {'fields': ('username', 'password')}),
@@ -0,0 +1,109 @@
+"""
+HR directory listings (users and collaborators).
+
+- Each list reads only the columns it renders (``list_fields``) plus the role in the same query.
+- ``?q=`` matches every word against names, email and phone. On PostgreSQL those columns
+  have trigram indexes (``SQL_POSTGRES``) so the ``ILIKE '%..%'`` filters stay indexed.
+- ``?role=<id>`` filters by ``Role``.
+- Keyset pagination (``inventario.paginacion.KeysetPaginator``) ordered by
+  ``DIRECTORY_ORDER``, which matches the expression indexes on ``CustomUser``.
+"""
+import re
+
+from django.conf import settings
+from django.db.models import Q, Value
+from django.db.models.functions import Coalesce
+from django.http import Http404
+
+from inventario.paginacion import CursorInvalido, KeysetPaginator
+from inventario.replicas import LecturaReplicaMixin
+
+from .models import Role
+
+SEARCH_FIELDS = ('first_name', 'paternal_last_name', 'maternal_last_name', 'email', 'phone')
+
+# nullable name columns are sorted as '' so the keyset cursor never compares against NULL
+DIRECTORY_ORDER = ('sort_last_name', 'sort_first_name', 'id')
+
+SQL_POSTGRES = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+] + [
+    f"CREATE INDEX IF NOT EXISTS usuarios_customuser_{field}_trgm "
+    f"ON usuarios_customuser USING gin ({field} gin_trgm_ops)"
+    for field in SEARCH_FIELDS
+]
+
+SQL_POSTGRES_REVERSE = [
+    f"DROP INDEX IF EXISTS usuarios_customuser_{field}_trgm" for field in SEARCH_FIELDS
+]
+
+_WORD_RE = re.compile(r'\S+')
+
+
+def install_indexes(connection):
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            for sql in SQL_POSTGRES:
+                cursor.execute(sql)
+
+
+def uninstall_indexes(connection):
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            for sql in SQL_POSTGRES_REVERSE:
+                cursor.execute(sql)
+
+
+def search_users(queryset, q='', role=None):
+    """Filters ``queryset`` by every word of ``q`` and by role id, in directory order."""
+    for word in _WORD_RE.findall(q or ''):
+        match = Q()
+        for field in SEARCH_FIELDS:
+            match |= Q(**{f'{field}__icontains': word})
+        queryset = queryset.filter(match)
+    if role:
+        queryset = queryset.filter(role_obj_id=role)
+    return queryset.annotate(
+        sort_last_name=Coalesce('paternal_last_name', Value('')),
+        sort_first_name=Coalesce('first_name', Value('')),
+    ).order_by(*DIRECTORY_ORDER)
+
+
+class DirectoryListMixin(LecturaReplicaMixin):
+    """For a ``ListView`` of users: projected, searchable, filterable and keyset-paginated."""
+    list_fields = ('id', 'username', 'email', 'first_name', 'paternal_last_name', 'phone')
+
+    def get_role(self):
+        try:
+            return int(self.request.GET.get('role', ''))
+        except ValueError:
+            return None
+
+    def get_queryset(self):
+        qs = (
+            super().get_queryset()
+            .select_related('role_obj')
+            .only(*self.list_fields, 'role_obj__id', 'role_obj__name')
+        )
+        return search_users(qs, self.request.GET.get('q', ''), self.get_role())
+
+    def get_paginate_by(self, queryset):
+        return getattr(settings, 'USERS_DIRECTORY_PAGE_SIZE', 50)
+
+    def paginate_queryset(self, queryset, page_size):
+        paginator = KeysetPaginator(
+            queryset, page_size,
+            modo_conteo=getattr(settings, 'USERS_DIRECTORY_COUNT', 'estimado'),
+        )
+        try:
+            page = paginator.pagina(self.request.GET.get('cursor') or None)
+        except CursorInvalido:
+            raise Http404('Cursor de paginación inválido.')
+        return paginator, page, page.object_list, page.has_other_pages()
+
+    def get_context_data(self, **kwargs):
+        ctx = super().get_context_data(**kwargs)
+        ctx['total'], ctx['total_aproximado'] = ctx['paginator'].conteo()
+        ctx['roles'] = Role.objects.order_by('name')
+        ctx['role_actual'] = self.get_role()
+        return ctx
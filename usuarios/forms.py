@@ -59,6 +59,10 @@ class CustomUserUpdateForm(forms.ModelForm):
         for f in self.fields.values():
             if f.required:
                 f.label = f"{f.label} *"
+        # each permission label shows its content type: load them in the same query
+        self.fields['user_permissions'].queryset = (
+            self.fields['user_permissions'].queryset.select_related('content_type')
+        )
 
 
 class CustomUserChangeForm(UserChangeForm):
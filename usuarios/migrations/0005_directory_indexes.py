@@ -0,0 +1,34 @@
+# Generated by Django 5.2.5 on 2026-10-18 09:03
+
+import django.db.models.functions.comparison
+from django.db import migrations, models
+
+from usuarios import directory
+
+
+def install(apps, schema_editor):
+    directory.install_indexes(schema_editor.connection)
+
+
+def uninstall(apps, schema_editor):
+    directory.uninstall_indexes(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('usuarios', '0004_remove_customuser_role_alter_customuser_blood_type_and_more'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='customuser',
+            index=models.Index(django.db.models.functions.comparison.Coalesce('paternal_last_name', models.Value('')), django.db.models.functions.comparison.Coalesce('first_name', models.Value('')), models.F('id'), name='customuser_directory_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='customuser',
+            index=models.Index(models.F('role_obj'), django.db.models.functions.comparison.Coalesce('paternal_last_name', models.Value('')), django.db.models.functions.comparison.Coalesce('first_name', models.Value('')), models.F('id'), name='customuser_role_directory_idx'),
+        ),
+        migrations.RunPython(install, uninstall),
+    ]
@@ -1,5 +1,7 @@
 from django.contrib.auth.models import AbstractUser
 from django.db import models
+from django.db.models import F, Value
+from django.db.models.functions import Coalesce
 from django.utils import timezone
 from django.core.validators import RegexValidator
 
@@ -78,6 +80,19 @@ class CustomUser(AbstractUser):
 
     created_at = models.DateTimeField('Fecha y hora de creación', default=timezone.now, editable=False)
 
+    class Meta(AbstractUser.Meta):
+        # directory order (see usuarios/directory.py), overall and within a role
+        indexes = [
+            models.Index(
+                Coalesce('paternal_last_name', Value('')), Coalesce('first_name', Value('')), F('id'),
+                name='customuser_directory_idx',
+            ),
+            models.Index(
+                F('role_obj'), Coalesce('paternal_last_name', Value('')), Coalesce('first_name', Value('')), F('id'),
+                name='customuser_role_directory_idx',
+            ),
+        ]
+
     def save(self, *args, **kwargs):
         if self.rfc:
             self.rfc = self.rfc.upper()
@@ -0,0 +1,39 @@
+"""Cache invalidation for ``usuarios.access``; it takes effect when the transaction commits."""
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from . import access
+from .models import Role
+
+User = get_user_model()
+
+
+def _bump_on_commit(using):
+    transaction.on_commit(access.bump_version, using=using)
+
+
+@receiver(post_save, sender=Role, dispatch_uid='usuarios_access_role_saved')
+@receiver(post_delete, sender=Role, dispatch_uid='usuarios_access_role_deleted')
+def role_changed(sender, instance, using, **kwargs):
+    _bump_on_commit(using)
+
+
+@receiver(m2m_changed, sender=Role.permissions.through, dispatch_uid='usuarios_access_role_permissions')
+@receiver(m2m_changed, sender=Group.permissions.through, dispatch_uid='usuarios_access_group_permissions')
+@receiver(m2m_changed, sender=User.user_permissions.through, dispatch_uid='usuarios_access_user_permissions')
+@receiver(m2m_changed, sender=User.groups.through, dispatch_uid='usuarios_access_user_groups')
+def permissions_changed(sender, instance, action, reverse, using, **kwargs):
+    if not action.startswith('post_'):
+        return
+    if isinstance(instance, User):
+        access.clear_memo(instance)
+    _bump_on_commit(using)
+
+
+@receiver(post_save, sender=User, dispatch_uid='usuarios_access_user_saved')
+def user_saved(sender, instance, **kwargs):
+    # role and flags are part of the cache key; only this instance's memo can be stale
+    access.clear_memo(instance)
@@ -1,3 +1,123 @@
-from django.test import TestCase
+from django.contrib.auth.models import Permission
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
 
-# Create your tests here.
+from inventario.consultas import PresupuestoConsultasMixin
+from inventario.forms import ProductoCreateForm
+
+from . import access
+from .models import CustomUser, Role
+
+
+def create_users(n=150):
+    """Realistic volume: ``n`` users spread across a few roles."""
+    roles = Role.objects.bulk_create([Role(name=name) for name in ('Administrador', 'Ventas', 'Almacén')])
+    CustomUser.objects.bulk_create([
+        CustomUser(
+            username=f'user{i}', email=f'user{i}@example.com', phone=f'55{i:08d}',
+            first_name=f'Nombre {i}', paternal_last_name='Pérez', role_obj=roles[i % 3],
+        )
+        for i in range(n)
+    ])
+    return CustomUser.objects.create_superuser('admin', 'admin@example.com', 'x', role_obj=roles[0])
+
+
+class QueryBudgetTests(PresupuestoConsultasMixin, TestCase):
+    """User views run a bounded number of queries regardless of how many users exist."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = create_users()
+        cls.user = CustomUser.objects.get(username='user1')
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+
+    def test_list(self):
+        self.get_con_presupuesto(reverse('usuarios:list'), 4)
+
+    def test_forms(self):
+        self.get_con_presupuesto(reverse('usuarios:crear'), 4)
+        self.get_con_presupuesto(reverse('usuarios:editar', args=[self.user.pk]), 6)
+
+    def test_admin(self):
+        self.get_con_presupuesto(reverse('admin:usuarios_customuser_changelist'), 8)
+        self.get_con_presupuesto(reverse('admin:usuarios_customuser_change', args=[self.user.pk]), 12)
+
+
+class DirectoryTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = create_users(120)
+        cls.sales = Role.objects.get(name='Ventas')
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+
+    def walk(self, url):
+        seen, cursor = [], ''
+        while True:
+            response = self.client.get(url, {'cursor': cursor} if cursor else {})
+            seen += [u.pk for u in response.context['usuarios']]
+            cursor = response.context['page_obj'].siguiente
+            if not cursor:
+                return seen
+
+    def test_keyset_pages_cover_every_user_once(self):
+        with self.settings(USERS_DIRECTORY_PAGE_SIZE=25):
+            seen = self.walk(reverse('usuarios:list'))
+        self.assertEqual(len(seen), CustomUser.objects.count())
+        self.assertEqual(len(set(seen)), len(seen))
+
+    def test_search_every_word(self):
+        response = self.client.get(reverse('usuarios:list'), {'q': 'pérez user7@'})
+        self.assertEqual([u.username for u in response.context['usuarios']], ['user7'])
+        response = self.client.get(reverse('usuarios:list'), {'q': '5500000042'})
+        self.assertEqual([u.username for u in response.context['usuarios']], ['user42'])
+
+    def test_role_filter(self):
+        response = self.client.get(reverse('usuarios:list'), {'role': self.sales.pk})
+        self.assertTrue(response.context['usuarios'])
+        self.assertTrue(all(u.role_obj_id == self.sales.pk for u in response.context['usuarios']))
+
+    def test_invalid_cursor(self):
+        self.assertEqual(self.client.get(reverse('usuarios:list'), {'cursor': 'x'}).status_code, 404)
+
+
+@override_settings(AUTHENTICATION_BACKENDS=['usuarios.access.RoleBackend'])
+class AccessTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.ventas = Role.objects.create(name='Ventas')
+        self.user = CustomUser.objects.create_user('ana', 'ana@example.com', 'x', role_obj=self.ventas)
+        self.perm = Permission.objects.get(codename='view_producto')
+
+    def fresh(self):
+        return CustomUser.objects.get(pk=self.user.pk)
+
+    def test_resolved_once_then_cached(self):
+        user = self.fresh()
+        with self.assertNumQueries(2):
+            self.assertFalse(access.for_user(user).is_manager)
+        with self.assertNumQueries(0):
+            ProductoCreateForm(user=user)
+            self.assertFalse(user.has_perm('inventario.view_producto'))
+        next_request = self.fresh()
+        with self.assertNumQueries(0):
+            self.assertFalse(access.for_user(next_request).is_manager)
+
+    def test_role_permissions_invalidate(self):
+        access.for_user(self.fresh())
+        with self.captureOnCommitCallbacks(execute=True):
+            self.ventas.permissions.add(self.perm)
+        self.assertTrue(self.fresh().has_perm('inventario.view_producto'))
+
+    def test_role_change_misses_old_entry(self):
+        form = ProductoCreateForm(user=self.fresh())
+        self.assertNotIn('costo_unitario', form.fields)
+        CustomUser.objects.filter(pk=self.user.pk).update(role_obj=Role.objects.create(name='Supervisor'))
+        form = ProductoCreateForm(user=self.fresh())
+        self.assertIn('costo_unitario', form.fields)
@@ -2,6 +2,7 @@ from django.urls import reverse_lazy
 from django.views.generic import CreateView, ListView, UpdateView
 from django.contrib import messages
 
+from .directory import DirectoryListMixin
 from .forms import CustomUserCreationForm, CustomUserUpdateForm
 from .models import CustomUser
 
@@ -20,8 +21,9 @@ class UserCreateView(CreateView):
         return super().form_invalid(form)
 
 
-class UserListView(ListView):
+class UserListView(DirectoryListMixin, ListView):
     model = CustomUser
+    list_fields = ('id', 'email', 'first_name', 'paternal_last_name')
     template_name = 'usuarios/list.html'
     context_object_name = 'usuarios'
 